@@ -0,0 +1,180 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.activity import Activity
+from app.models.tenant import current_tenant_schema, active_tenant_id, tenant_scope
+
+logger = logging.getLogger(__name__)
+
+# Записи аудита (Activity), которые пишутся вместе с изменением сделки.
+#
+#   sync     - строки добавляются в текущую транзакцию и коммитятся вместе
+#              с изменением, без отдельного commit
+#   buffered - строки попадают в очередь после commit и вставляются пачками
+#              фоновым потоком (по размеру пачки или по интервалу)
+
+def _stamp(values: dict) -> dict:
+    now = datetime.utcnow()
+    values.setdefault("created_at", now)
+    values.setdefault("activity_date", now)
+    # Фоновый поток пишет вне запроса - компанию фиксируем сразу
+    values.setdefault("tenant_id", active_tenant_id())
+    return values
+
+class SyncActivitySink:
+    """Запись в той же транзакции, что и изменение данных"""
+
+    def record(self, db: Session, **values) -> None:
+        self.record_many(db, [values])
+
+    def record_many(self, db: Session, rows: List[dict]) -> None:
+        if rows:
+            db.execute(insert(Activity), [_stamp(dict(row)) for row in rows])
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+class BufferedActivitySink:
+    """Отложенная пакетная запись фоновым потоком
+
+    Записи ставятся в очередь только после успешного commit сессии
+    (при rollback отбрасываются). Очередь ограничена: если она полна,
+    запись выполняется синхронно в вызывающем потоке. При остановке
+    (shutdown приложения или выход процесса) очередь дописывается целиком.
+    """
+
+    def __init__(self, batch_size: int, interval: float, max_queue: int):
+        self.batch_size = batch_size
+        self.interval = interval
+        # (схема компании, строка): в режиме схем строки пишутся в схему компании
+        self._queue: "queue.Queue[Tuple[Optional[str], dict]]" = queue.Queue(maxsize=max_queue)
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def record(self, db: Session, **values) -> None:
+        self.record_many(db, [values])
+
+    def record_many(self, db: Session, rows: List[dict]) -> None:
+        # Без открытой транзакции rollback не вызовет after_rollback,
+        # и записи ушли бы со следующим commit
+        db.connection()
+        pending = db.info.setdefault("pending_activities", [])
+        schema = current_tenant_schema()
+        pending.extend((schema, _stamp(dict(row))) for row in rows)
+
+    def enqueue(self, rows: List[Tuple[Optional[str], dict]]) -> None:
+        self.start()
+        overflow = []
+        for row in rows:
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                overflow.append(row)
+        if overflow:
+            self._write(overflow)
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="activity-sink", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Остановить поток и дописать всё, что осталось в очереди"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            thread.join()
+        self._drain(final=True)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self._drain()
+
+    def _drain(self, final: bool = False) -> None:
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            failed = self._write(batch)
+            if failed and not final:
+                # БД недоступна - вернём записи в очередь и попробуем позже
+                for row in failed:
+                    try:
+                        self._queue.put_nowait(row)
+                    except queue.Full:
+                        logger.error("Activity queue full, dropped record: %s", row)
+                time.sleep(self.interval)
+                return
+
+    def _write(self, rows: List[Tuple[Optional[str], dict]]) -> list:
+        """Вставить строки, по транзакции на компанию; вернуть незаписанные"""
+        groups: Dict[Tuple[int, Optional[str]], list] = {}
+        for schema, values in rows:
+            groups.setdefault((values["tenant_id"], schema), []).append((schema, values))
+        failed = []
+        db = SessionLocal()
+        try:
+            for (tenant_id, schema), group in groups.items():
+                try:
+                    with tenant_scope(tenant_id, schema):
+                        db.execute(insert(Activity), [values for _, values in group])
+                        db.commit()
+                except Exception:
+                    db.rollback()
+                    logger.exception("Failed to write %d activities", len(group))
+                    failed.extend(group)
+        finally:
+            db.close()
+        return failed
+
+def _create_sink():
+    if settings.ACTIVITY_SINK == "buffered":
+        return BufferedActivitySink(
+            batch_size=settings.ACTIVITY_FLUSH_SIZE,
+            interval=settings.ACTIVITY_FLUSH_INTERVAL,
+            max_queue=settings.ACTIVITY_QUEUE_MAX,
+        )
+    return SyncActivitySink()
+
+activity_sink = _create_sink()
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_pending_activities(session):
+    rows = session.info.pop("pending_activities", None)
+    if rows and isinstance(activity_sink, BufferedActivitySink):
+        activity_sink.enqueue(rows)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_activities(session):
+    session.info.pop("pending_activities", None)
+
+atexit.register(activity_sink.stop)
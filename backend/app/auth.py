@@ -1,21 +1,23 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from jose import JWTError
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, set_request_user
 from app.models.user import User
 from app.config import settings
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.password_hasher import password_hasher, pwd_context
+from app.tokens import decode_token, key_ring, redeem_once, revocation_list, token_tenant
+from app.user_cache import UserPrincipal, user_cache
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
 def get_password_hash(password: str) -> str:
+    """Блокирующее хэширование - для скриптов; в роутах только через password_hasher"""
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -28,36 +30,83 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    return key_ring.encode(to_encode)
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-) -> User:
+) -> UserPrincipal:
+    return await _principal(token, db)
+
+async def get_stream_user(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    ticket: Optional[str] = None,
+    db: Session = Depends(get_db)
+) -> UserPrincipal:
+    """Как get_current_user, но вместо заголовка - ?ticket=
+
+    EventSource в браузере не умеет слать заголовок Authorization, а
+    access токен в URL оседает в логах. Тикет (POST /api/auth/stream-ticket)
+    живёт STREAM_TICKET_TTL секунд и гасится при открытии потока: при
+    переподключении клиент берёт новый.
+    """
+    if token:
+        return await _principal(token, db)
+    return await _principal(ticket or "", db, typ="stream")
+
+async def _principal(token: str, db: Session, typ: str = "access") -> UserPrincipal:
+    """Пользователь по токену
+
+    Выполняется в event loop. Токен из issue_tokens несёт роль и статус -
+    БД не нужна (кроме редкого попадания в фильтр отозванных). Для токенов
+    без роли пользователь берётся из кэша или из БД в пуле потоков.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: int = payload.get("user_id")
-        if user_id is None:
-            raise credentials_exception
+        payload = decode_token(token, typ=typ)
     except JWTError:
         raise credentials_exception
+    user_id: int = payload["user_id"]
+    # Для read-your-writes: после своей записи пользователь читает с основной БД
+    set_request_user(token_tenant(payload), user_id)
+    
+    if "role" in payload:
+        revoked = revocation_list.is_revoked(payload)
+        if revoked is None:
+            revoked = await run_in_threadpool(revocation_list.confirm, db, payload)
+        if revoked:
+            raise credentials_exception
+        if typ == "stream" and not await run_in_threadpool(redeem_once, db, payload):
+            raise credentials_exception
+        if not payload.get("active", True):
+            raise HTTPException(status_code=400, detail="Inactive user")
+        return UserPrincipal(id=user_id, username=payload.get("username", ""), role=payload["role"], is_active=True)
     
-    user = db.query(User).filter(User.id == user_id).first()
+    # Кэш: без запроса к БД на каждый вызов API
+    principal = user_cache.get(user_id, token)
+    if principal is not None:
+        return principal
+    
+    user = await run_in_threadpool(_load_user, db, user_id)
     if user is None:
         raise credentials_exception
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return user
+    
+    principal = UserPrincipal.from_user(user)
+    user_cache.set(user_id, token, principal)
+    return principal
+
+def _load_user(db: Session, user_id: int) -> Optional[User]:
+    return db.query(User).filter(User.id == user_id).first()
 
 async def get_current_admin_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: UserPrincipal = Depends(get_current_user)
+) -> UserPrincipal:
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -65,10 +114,27 @@ async def get_current_admin_user(
         )
     return current_user
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
-    user = db.query(User).filter(User.username == username).first()
-    if not user:
+async def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+    """Проверить логин и пароль, не блокируя event loop
+
+    Если хэш пароля устарел (меньше BCRYPT_ROUNDS), новый хэш
+    записывается в user - сохранится вместе с last_login.
+    """
+    row = await run_in_threadpool(_find_login, db, username)
+    if row is None:
         return None
-    if not verify_password(password, user.hashed_password):
+    ok, new_hash = await password_hasher.verify(password, row.hashed_password)
+    if not ok:
         return None
+    user = await run_in_threadpool(_load_user, db, row.id)
+    if user is not None and new_hash:
+        user.hashed_password = new_hash
+        # Тот же пароль, только дороже хэш - выданные токены не отзываем
+        db.info.setdefault("rehashed_users", set()).add(user.id)
     return user
+
+def _find_login(db: Session, username: str):
+    row = db.query(User.id, User.hashed_password).filter(User.username == username).first()
+    # Соединение не держим, пока проверка ждёт своей очереди в пуле bcrypt
+    db.rollback()
+    return row
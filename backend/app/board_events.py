@@ -0,0 +1,218 @@
+import asyncio
+import json
+import logging
+import threading
+from typing import Dict, List, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.deal import Deal, deal_values
+from app.models.tenant import DEFAULT_TENANT_ID, active_tenant_id
+from app.user_cache import UserPrincipal
+
+logger = logging.getLogger(__name__)
+
+# События Kanban доски: дельты по сделкам для подписчиков воронки.
+#
+# Изменения сделок собираются при flush и публикуются только после
+# commit (rollback их отбрасывает). Подписчик получает событие, если
+# видит сделку по тому же правилу, что и в list_deals: админ - все,
+# менеджер - только свои. Подписки и события разделены по компаниям:
+# в режиме схем id воронок разных компаний совпадают.
+#
+#   memory - подписчики в памяти процесса (один воркер)
+#   redis  - события рассылаются всем воркерам через Redis pub/sub
+
+CARD_FIELDS = (
+    "id", "title", "amount", "currency", "client_id", "manager_id",
+    "pipeline_id", "stage_id", "status",
+)
+
+def deal_event(type: str, deal: dict, **extra) -> dict:
+    """Событие доски: created, updated, moved, deleted или reload"""
+    return {
+        "type": type,
+        "pipeline_id": deal["pipeline_id"],
+        "deal": {field: deal.get(field) for field in CARD_FIELDS},
+        **extra,
+    }
+
+def reload_event(pipeline_id: int) -> dict:
+    """Изменений слишком много (импорт, переполнение) - перечитать доску"""
+    return {"type": "reload", "pipeline_id": pipeline_id}
+
+def visible(event: dict, user: UserPrincipal) -> bool:
+    if user.role != "manager" or event["type"] == "reload":
+        return True
+    return user.id in (event["deal"]["manager_id"], event.get("previous_manager_id"))
+
+def _channel(event: dict) -> Tuple[int, int]:
+    return event.get("tenant_id", DEFAULT_TENANT_ID), event["pipeline_id"]
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop, pipeline_id: int, user: UserPrincipal, max_size: int):
+        self.loop = loop
+        self.pipeline_id = pipeline_id
+        self.channel = (active_tenant_id(), pipeline_id)
+        self.user = user
+        self.queue: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=max_size)
+
+    def put(self, event: dict) -> None:
+        # Вызывается в цикле событий подписчика
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Клиент не успевает читать: заменяем очередь одним reload
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(reload_event(self.pipeline_id))
+
+class MemoryBoardBroker:
+    """Рассылка подписчикам в памяти процесса
+
+    publish вызывается из потоков sync роутов, поэтому события передаются
+    в цикл событий подписчика через call_soon_threadsafe.
+    """
+
+    def __init__(self, queue_max: int):
+        self.queue_max = queue_max
+        self._subscribers: Dict[Tuple[int, int], Set[_Subscriber]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, pipeline_id: int, user: UserPrincipal) -> _Subscriber:
+        subscriber = _Subscriber(asyncio.get_running_loop(), pipeline_id, user, self.queue_max)
+        with self._lock:
+            self._subscribers.setdefault(subscriber.channel, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: _Subscriber) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.channel)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.channel]
+
+    def publish(self, events: List[dict]) -> None:
+        self.dispatch(events)
+
+    def dispatch(self, events: List[dict]) -> None:
+        for event in events:
+            with self._lock:
+                subscribers = list(self._subscribers.get(_channel(event), ()))
+            for subscriber in subscribers:
+                if not visible(event, subscriber.user):
+                    continue
+                try:
+                    subscriber.loop.call_soon_threadsafe(subscriber.put, event)
+                except RuntimeError:
+                    # Цикл уже закрыт - подписчик отвалился
+                    self.unsubscribe(subscriber)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+class RedisBoardBroker(MemoryBoardBroker):
+    """Рассылка через Redis pub/sub: событие из любого воркера доходит
+    до подписчиков всех воркеров
+    """
+
+    def __init__(self, url: str, queue_max: int, channel: str = "nocto:board"):
+        import redis  # опциональная зависимость
+
+        super().__init__(queue_max)
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+        self._pubsub = None
+        self._thread = None
+
+    def publish(self, events: List[dict]) -> None:
+        self.client.publish(self.channel, json.dumps(events))
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self.channel: self._on_message})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+    def _on_message(self, message: dict) -> None:
+        try:
+            self.dispatch(json.loads(message["data"]))
+        except (TypeError, ValueError):
+            logger.exception("Malformed board message")
+
+def _create_broker():
+    if settings.BOARD_BROKER == "redis":
+        return RedisBoardBroker(settings.REDIS_URL, settings.BOARD_QUEUE_MAX)
+    return MemoryBoardBroker(settings.BOARD_QUEUE_MAX)
+
+board_broker = _create_broker()
+
+def collect(session: Session, events: List[dict]) -> None:
+    """Добавить события к текущей транзакции (для записи в обход ORM)"""
+    tenant_id = active_tenant_id()
+    for event in events:
+        event.setdefault("tenant_id", tenant_id)
+    session.info.setdefault("board_events", []).extend(events)
+
+# ================== СБОР ИЗМЕНЕНИЙ ==================
+
+def _card(deal: Deal, old: bool = False) -> dict:
+    return deal_values(deal, CARD_FIELDS, old)
+
+@event.listens_for(Session, "after_flush")
+def _collect_deal_events(session, flush_context):
+    events = []
+    for obj in session.new:
+        if isinstance(obj, Deal):
+            events.append(deal_event("created", _card(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, Deal):
+            events.append(deal_event("deleted", _card(obj, old=True)))
+    for obj in session.dirty:
+        if not isinstance(obj, Deal) or not session.is_modified(obj, include_collections=False):
+            continue
+        old, new = _card(obj, old=True), _card(obj)
+        if old == new:
+            continue
+        extra = {}
+        if old["manager_id"] != new["manager_id"]:
+            extra["previous_manager_id"] = old["manager_id"]
+        if old["pipeline_id"] != new["pipeline_id"]:
+            # Сделка ушла в другую воронку: в старой её больше нет
+            events.append(deal_event("deleted", old))
+            events.append(deal_event("created", new))
+        elif old["stage_id"] != new["stage_id"]:
+            events.append(deal_event("moved", new, from_stage_id=old["stage_id"], **extra))
+        else:
+            events.append(deal_event("updated", new, **extra))
+    if events:
+        collect(session, events)
+
+@event.listens_for(Session, "after_commit")
+def _publish_deal_events(session):
+    events = session.info.pop("board_events", None)
+    if events:
+        try:
+            board_broker.publish(events)
+        except Exception:
+            # Доска - не источник истины: потерянное событие не ломает запись
+            logger.exception("Failed to publish %d board events", len(events))
+
+@event.listens_for(Session, "after_rollback")
+def _discard_deal_events(session):
+    session.info.pop("board_events", None)
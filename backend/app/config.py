@@ -5,10 +5,85 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./nocto_crm.db"
     
+    # Пул соединений (для SQLite игнорируется, кроме pre-ping)
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # секунд ожидания свободного соединения
+    DB_POOL_RECYCLE: int = 1800  # пересоздавать соединения старше N секунд
+    DB_POOL_PRE_PING: bool = True
+    
+    # Реплики для чтения (через запятую) и правила ротации
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_MAX_LAG: float = 5.0  # секунд; больше - реплика выводится из ротации
+    REPLICA_CHECK_INTERVAL: float = 2.0
+    REPLICA_STICKY_SECONDS: float = 10.0  # чтение с основной БД после своей записи
+    
+    # Async движок (asyncpg / aiosqlite) для async роутов
+    DB_ASYNC_ENABLED: bool = False
+    
+    # Потоки для sync роутов FastAPI (по умолчанию в anyio - 40)
+    THREADPOOL_SIZE: int = 40
+    
+    # Компании (workspaces): MULTI_TENANT=false - одна компания DEFAULT_TENANT
+    MULTI_TENANT: bool = False
+    TENANT_HEADER: str = "X-Tenant"
+    TENANT_DOMAIN: str = ""  # например crm.example.com: acme.crm.example.com -> acme
+    DEFAULT_TENANT: str = "default"
+    TENANT_SCHEMAS: bool = False  # PostgreSQL: данные компании в своей схеме
+    TENANT_CACHE_TTL: float = 30.0  # секунд; кэш компаний по slug
+    
     # Security
     SECRET_KEY: str = "change-this-secret-key-in-production"
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 10080  # 7 days
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    
+    # Кольцо ключей подписи: "kid1:secret1,kid2:secret2" (пусто - SECRET_KEY)
+    JWT_KEYS: str = ""
+    JWT_ACTIVE_KID: str = ""  # по умолчанию первый ключ кольца
+    
+    # Отозванные токены: сверка с БД раз в N секунд, доля ложных срабатываний фильтра
+    REVOCATION_SYNC_INTERVAL: float = 5.0
+    REVOCATION_ERROR_RATE: float = 0.001
+    
+    # Пароли: стоимость bcrypt (хэши дешевле перехэшируются при входе)
+    # и пул для проверки при входе: thread или process
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 200  # больше проверок в очереди - 503
+    LOGIN_CACHE_TTL: int = 300  # секунд; 0 - каждый вход через bcrypt
+    LOGIN_CACHE_MAXSIZE: int = 10000
+    
+    # Кэш текущего пользователя: memory, redis или none
+    USER_CACHE_BACKEND: str = "memory"
+    USER_CACHE_TTL: int = 60  # секунд
+    USER_CACHE_MAXSIZE: int = 10000
+    REDIS_URL: str = "redis://localhost:6379/0"
+    
+    # Запись активностей: sync (в транзакции изменения) или buffered (пачками в фоне)
+    ACTIVITY_SINK: str = "sync"
+    ACTIVITY_FLUSH_SIZE: int = 500
+    ACTIVITY_FLUSH_INTERVAL: float = 1.0  # секунд
+    ACTIVITY_QUEUE_MAX: int = 50000
+    
+    # Справочники воронок и стадий: как часто сверять версию с БД (секунд)
+    REFERENCE_CHECK_INTERVAL: float = 1.0
+    
+    # События Kanban доски: memory (один воркер) или redis (все воркеры)
+    BOARD_BROKER: str = "memory"
+    BOARD_QUEUE_MAX: int = 1000  # событий в очереди одного подписчика
+    BOARD_HEARTBEAT: float = 15.0  # секунд между keep-alive в потоке событий
+    STREAM_TICKET_TTL: int = 30  # секунд жизни одноразового тикета потока событий
+    
+    # Профилирование: Server-Timing, /metrics, выборочный профиль одного роута
+    SERVER_TIMING_ENABLED: bool = True
+    METRICS_ENABLED: bool = False  # /metrics раскрывает роуты и задержки - включать явно
+    METRICS_TOKEN: str = ""  # задан - /metrics только с "Authorization: Bearer <токен>"
+    PROFILE_ROUTE: str = ""  # например "GET /api/deals/"
+    PROFILE_SAMPLE_RATE: float = 0.01
+    PROFILER: str = "cprofile"  # cprofile или pyinstrument
+    PROFILE_DIR: str = "./profiles"
     
     # CORS
     CORS_ORIGINS: str = "http://localhost:3000,http://127.0.0.1:3000"
@@ -1,22 +1,198 @@
-from sqlalchemy import create_engine
+import itertools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-import os
-from dotenv import load_dotenv
+from sqlalchemy.orm import Session, sessionmaker
+from app.config import settings
+
+logger = logging.getLogger(__name__)
 
-load_dotenv()
+DATABASE_URL = settings.DATABASE_URL
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./nocto_crm.db")
+def _engine_options(url: str) -> dict:
+    """Параметры пула из настроек"""
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if url.startswith("sqlite"):
+        return options
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    return options
 
 # Create engine
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
-    echo=False
+    echo=False,
+    **_engine_options(DATABASE_URL)
+)
+
+# ================== РЕПЛИКИ ==================
+# Чтение аналитики и списков - с реплик (DATABASE_REPLICA_URLS), запись и
+# всё остальное - с основной БД.
+#
+#   get_read_db    - сессия, которая отправляет SELECT на реплику; flush,
+#                    insert/update/delete и session.connection() идут в
+#                    основную БД. Реплика выбирается один раз на сессию.
+#   read-your-writes - после commit с изменениями пользователь
+#                    REPLICA_STICKY_SECONDS читает с основной БД
+#                    (в пределах процесса).
+#   проверка отставания - фоновый поток раз в REPLICA_CHECK_INTERVAL;
+#                    реплика с отставанием больше REPLICA_MAX_LAG или
+#                    недоступная выводится из ротации до следующей проверки.
+
+# Пользователь текущего запроса (ставит get_current_user): (tid, user_id) -
+# id пользователей у разных компаний совпадают
+_request_user: ContextVar[Optional[Tuple[int, int]]] = ContextVar("request_user", default=None)
+
+def set_request_user(tenant_id: int, user_id: int) -> None:
+    _request_user.set((tenant_id, user_id))
+
+_LAG_SQL = {
+    "postgresql": (
+        "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+        "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    ),
+}
+
+class ReplicaRouter:
+    def __init__(self, engines: List[Engine], max_lag: float, check_interval: float, sticky_seconds: float):
+        self.engines = engines
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.sticky_seconds = sticky_seconds
+        # До первой проверки считаем все реплики живыми
+        self._healthy: List[Engine] = list(engines)
+        self._next = itertools.count()
+        self._writes: Dict[Tuple[int, int], float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def pick(self) -> Optional[Engine]:
+        """Реплика для чтения или None - читать с основной БД"""
+        healthy = self._healthy
+        if not healthy:
+            return None
+        user = _request_user.get()
+        if user is not None:
+            written = self._writes.get(user)
+            if written is not None and time.monotonic() - written < self.sticky_seconds:
+                return None
+        return healthy[next(self._next) % len(healthy)]
+
+    def mark_write(self, user: Tuple[int, int]) -> None:
+        if not self.engines:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._writes[user] = now
+            if len(self._writes) > 10000:
+                self._writes = {key: at for key, at in self._writes.items() if now - at < self.sticky_seconds}
+
+    def lag(self, replica: Engine) -> float:
+        """Отставание реплики в секундах (для СУБД без репликации - 0)"""
+        with replica.connect() as conn:
+            sql = _LAG_SQL.get(replica.dialect.name, "SELECT 0")
+            return float(conn.execute(text(sql)).scalar() or 0)
+
+    def check(self) -> None:
+        healthy = []
+        for replica in self.engines:
+            try:
+                lag = self.lag(replica)
+            except Exception as exc:
+                lag = None
+                logger.warning("Replica %s is unavailable: %s", replica.url.render_as_string(), exc)
+            if lag is not None and lag <= self.max_lag:
+                healthy.append(replica)
+            elif lag is not None:
+                logger.warning("Replica %s lags %.1fs, out of rotation", replica.url.render_as_string(), lag)
+        self._healthy = healthy
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            self.check()
+
+    def start(self) -> None:
+        if not self.engines or self._thread is not None:
+            return
+        self.check()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-check", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        for replica in self.engines:
+            replica.dispose()
+
+replica_engines = [
+    create_engine(
+        url,
+        connect_args={"check_same_thread": False} if "sqlite" in url else {},
+        echo=False,
+        **_engine_options(url)
+    )
+    for url in (item.strip() for item in settings.DATABASE_REPLICA_URLS.split(","))
+    if url
+]
+
+replica_router = ReplicaRouter(
+    replica_engines, settings.REPLICA_MAX_LAG, settings.REPLICA_CHECK_INTERVAL, settings.REPLICA_STICKY_SECONDS
 )
 
+_READ_ONLY = "read_only"
+
+class RoutingSession(Session):
+    """Сессия, которая в режиме read_only читает с реплики"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.info.get(_READ_ONLY) and not self._flushing and getattr(clause, "is_select", False):
+            if "replica" not in self.info:
+                self.info["replica"] = replica_router.pick()
+            if self.info["replica"] is not None:
+                return self.info["replica"]
+        return super().get_bind(mapper, clause=clause, **kw)
+
+@event.listens_for(RoutingSession, "after_flush")
+def _note_flush(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _note_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(RoutingSession, "after_commit")
+def _stick_to_primary(session):
+    user = _request_user.get()
+    if session.info.pop("wrote", False) and user is not None:
+        replica_router.mark_write(user)
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _discard_write(session):
+    session.info.pop("wrote", None)
+
 # Session
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+
+def read_session() -> Session:
+    """Сессия только для чтения: SELECT уходят на реплику (если есть)"""
+    return SessionLocal(info={_READ_ONLY: True})
 
 # Base class for models
 Base = declarative_base()
@@ -28,3 +204,47 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """Сессия для GET аналитики и списков: чтение с реплики"""
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# ================== ASYNC ==================
+
+def async_database_url(url: str) -> str:
+    """URL с async драйвером: asyncpg для PostgreSQL, aiosqlite для SQLite"""
+    if url.startswith("postgresql://") or url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url.split("://", 1)[1]
+    return url
+
+def create_async_database(url: str):
+    """AsyncEngine и фабрика AsyncSession для url (нужен asyncpg или aiosqlite)"""
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+    async_url = async_database_url(url)
+    async_engine = create_async_engine(async_url, echo=False, **_engine_options(async_url))
+    return async_engine, async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+async_engine = None
+AsyncSessionLocal = None
+
+if settings.DB_ASYNC_ENABLED:
+    async_engine, AsyncSessionLocal = create_async_database(DATABASE_URL)
+
+async def get_async_db():
+    """Async сессия для `async def` роутов (нужен DB_ASYNC_ENABLED=true)
+
+    Существующие сервисы на sync Session можно вызывать через
+    `await db.run_sync(lambda session: ...)` - запросы пойдут через
+    async драйвер без занятия потока из пула.
+    """
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database is disabled: set DB_ASYNC_ENABLED=true")
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,64 @@
+import hashlib
+from datetime import date
+from typing import Dict, Optional
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+
+from app.auth import get_current_user
+from app.config import settings
+from app.database import get_read_db
+from app.models.change_counter import table_versions
+from app.user_cache import UserPrincipal
+
+# Условные GET для эндпоинтов, которые опрашивают открытые вкладки.
+#
+# ETag = хэш(URL с параметрами, пользователь, дата, версии таблиц).
+# Версии таблиц читаются одним запросом к change_counters; если ETag
+# совпал с If-None-Match, отвечаем 304 до запуска запросов роута.
+# Сессия та же, что у роута (get_read_db): версии и данные читаются с
+# одной реплики, иначе ETag новой версии мог бы достаться старым данным.
+
+def _matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in {tag.strip() for tag in header.split(",")}
+
+def conditional(*tables: str, expand: Optional[Dict[str, str]] = None):
+    """Зависимость роута: ETag по версиям таблиц tables
+
+    expand - таблицы связей для ?expand=name (имя -> таблица).
+    Пример: dependencies=[Depends(conditional("deals", "deal_stages"))]
+    """
+    def dependency(
+        request: Request,
+        response: Response,
+        db: Session = Depends(get_read_db),
+        current_user: UserPrincipal = Depends(get_current_user)
+    ):
+        names = set(tables)
+        if expand and request.query_params.get("expand"):
+            for name in request.query_params["expand"].split(","):
+                if name.strip() in expand:
+                    names.add(expand[name.strip()])
+
+        versions = table_versions(db, names)
+        key = "|".join([
+            settings.API_VERSION,
+            request.url.path,
+            str(sorted(request.query_params.multi_items())),
+            f"{current_user.id}:{current_user.role}",
+            # "сегодня", "просроченные" и т.п. зависят от даты
+            date.today().isoformat(),
+            ",".join(f"{name}={versions.get(name, 0)}" for name in sorted(names)),
+        ])
+        etag = '"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+        if _matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    return dependency
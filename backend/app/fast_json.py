@@ -0,0 +1,41 @@
+import json
+from datetime import date, datetime
+from typing import Iterable, List, Type
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson  # опциональная зависимость
+except ImportError:
+    orjson = None
+
+# Быстрый путь для больших списков (?fast=true):
+# из БД выбираются только колонки схемы ответа, строки превращаются
+# в словари без валидации Pydantic и кодируются orjson (если установлен).
+# Данные из своей БД считаем доверенными - формат тот же, что у схемы.
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+def schema_columns(model, schema: Type[BaseModel]) -> list:
+    """Колонки модели для полей схемы ответа (в порядке схемы)"""
+    return [getattr(model, name) for name in schema.model_fields]
+
+def fast_response(rows: Iterable, schema: Type[BaseModel], response: Response = None) -> FastJSONResponse:
+    """Ответ из строк-кортежей; заголовки (ETag, X-Next-Cursor) переносим
+    из Response зависимостей - при прямом возврате FastAPI их не добавит
+    """
+    fields: List[str] = list(schema.model_fields)
+    content = [dict(zip(fields, row)) for row in rows]
+    headers = dict(response.headers) if response is not None else None
+    return FastJSONResponse(content, headers=headers)
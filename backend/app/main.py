@@ -1,23 +1,69 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import Optional
+import hmac
+import anyio.to_thread
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from app import database
 from app.database import engine, Base
 from app.config import settings
+from app.activity_sink import activity_sink
+from app.board_events import board_broker
+from app.password_hasher import password_hasher
+from app.tokens import revocation_list
+from app.profiling import ProfilingMiddleware, metrics
+from app.tenancy import TenantMiddleware, ensure_default_tenant
 
 # Импортируем модели для создания таблиц
-from app.models import User, Client, Contact, Deal, DealStage, Pipeline, Task, Activity
+from app.models import Tenant, User, Client, Contact, Deal, DealStage, Pipeline, Task, Activity, ActivityArchive, StageRollup, DealDailyFact, ChangeCounter, RevokedToken
+from app.models.change_counter import ensure_change_counters
 
 # Импортируем роутеры
-from app.routers import auth_router, pipelines_router, deals_router, dashboard_router, clients_router
+from app.routers import auth_router, pipelines_router, deals_router, dashboard_router, clients_router, tasks_router, activities_router, export_router
+
+from app.services.client_search import ensure_client_search_index
 
 # Создание таблиц
 Base.metadata.create_all(bind=engine)
 
+# Компания по умолчанию - владелец данных при MULTI_TENANT=false
+ensure_default_tenant(engine)
+
+# Счётчики изменений таблиц для ETag
+ensure_change_counters(engine)
+
+# Поисковый индекс клиентов (tsvector в PostgreSQL, FTS5 в SQLite)
+ensure_client_search_index(engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sync роуты выполняются в пуле потоков anyio - подгоняем его под пул БД
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    activity_sink.start()
+    board_broker.start()
+    revocation_list.start()
+    database.replica_router.start()
+    yield
+    revocation_list.stop()
+    board_broker.stop()
+    password_hasher.stop()
+    # Дописать отложенные активности до закрытия соединений
+    activity_sink.stop()
+    database.replica_router.stop()
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
+    engine.dispose()
+
 app = FastAPI(
     title=settings.API_TITLE,
     description="🚀 Simple and affordable CRM for small business",
-    version=settings.API_VERSION
+    version=settings.API_VERSION,
+    lifespan=lifespan
 )
 
+# Компания запроса (внутри CORS: ответ 404 получает CORS заголовки)
+app.add_middleware(TenantMiddleware)
+
 # CORS
 origins = settings.CORS_ORIGINS.split(",")
 app.add_middleware(
@@ -26,14 +72,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing"],
 )
 
+# Server-Timing и метрики запросов (снаружи CORS - учитывает всё время)
+app.add_middleware(ProfilingMiddleware)
+
 # Подключаем роутеры
 app.include_router(auth_router)
 app.include_router(pipelines_router)
 app.include_router(deals_router)
 app.include_router(clients_router)
+app.include_router(tasks_router)
+app.include_router(activities_router)
 app.include_router(dashboard_router)
+app.include_router(export_router)
 
 @app.get("/")
 def root():
@@ -47,3 +100,13 @@ def root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics(authorization: Optional[str] = Header(None)):
+    """Метрики в текстовом формате Prometheus (METRICS_ENABLED, METRICS_TOKEN)"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    if settings.METRICS_TOKEN and not hmac.compare_digest((authorization or "").encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
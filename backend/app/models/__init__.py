@@ -1,10 +1,15 @@
+from .tenant import Tenant
 from .user import User
 from .client import Client, Contact
 from .deal import Deal, DealStage, Pipeline
 from .task import Task
-from .activity import Activity
+from .activity import Activity, ActivityArchive
+from .rollup import StageRollup, DealDailyFact
+from .change_counter import ChangeCounter
+from .revoked_token import RevokedToken
 
 __all__ = [
+    'Tenant',
     'User',
     'Client',
     'Contact',
@@ -13,4 +18,9 @@ __all__ = [
     'Pipeline',
     'Task',
     'Activity',
+    'ActivityArchive',
+    'StageRollup',
+    'DealDailyFact',
+    'ChangeCounter',
+    'RevokedToken',
 ]
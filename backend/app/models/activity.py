@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
+from app.models.tenant import TenantScoped
 
-class Activity(Base):
+class Activity(TenantScoped, Base):
     """История взаимодействий (звонки, письма, встречи)"""
     __tablename__ = "activities"
 
@@ -31,3 +32,38 @@ class Activity(Base):
     
     # Relationships
     deal = relationship("Deal", back_populates="activities")
+    
+    __table_args__ = (
+        # Ленты: общая, по сделке, по клиенту, по пользователю (новые сверху)
+        Index("ix_activities_tenant_created_id", "tenant_id", "created_at", "id"),
+        Index("ix_activities_deal_created", "deal_id", "created_at", "id"),
+        Index("ix_activities_client_created", "client_id", "created_at", "id"),
+        Index("ix_activities_user_created", "user_id", "created_at", "id"),
+    )
+
+class ActivityArchive(TenantScoped, Base):
+    """Архив старых активностей
+
+    Горячая таблица activities хранит только последние месяцы
+    (см. archive_activities.py), ленты читают только её. Старые записи
+    доступны в таймлайнах сделки/клиента с include_archive=true.
+    Внешних ключей нет: архив не мешает удалять сделки и клиентов.
+    """
+    __tablename__ = "activities_archive"
+
+    id = Column(Integer, primary_key=True)
+    type = Column(String, nullable=False)
+    deal_id = Column(Integer, nullable=True)
+    client_id = Column(Integer, nullable=True)
+    user_id = Column(Integer, nullable=False)
+    subject = Column(String, nullable=True)
+    content = Column(Text, nullable=True)
+    duration = Column(Integer, nullable=True)
+    activity_date = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_activities_archive_deal_created", "deal_id", "created_at", "id"),
+        Index("ix_activities_archive_client_created", "client_id", "created_at", "id"),
+    )
@@ -0,0 +1,116 @@
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import Column, String, BigInteger, event, insert, select, update
+from sqlalchemy.orm import Session
+from app.database import Base
+from app.models.tenant import current_tenant_id, tenant_scoped_tables
+
+class ChangeCounter(Base):
+    """Счётчик изменений таблицы: растёт с каждой транзакцией, которая
+    пишет в таблицу. По нему строятся ETag для условных GET.
+    """
+    __tablename__ = "change_counters"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+_SKIP = {"change_counters"}
+
+# Таблицы компаний считаются отдельно по каждой компании ("deals@7"):
+# запись одной компании не сбрасывает ETag остальных. Запись вне
+# компании (скрипты) увеличивает общий счётчик "deals", версия для
+# компании - сумма общего и её собственного.
+
+@lru_cache(maxsize=None)
+def _tenant_tables() -> frozenset:
+    return frozenset(table.name for table in tenant_scoped_tables())
+
+def _counter_name(table: str, tenant_id: Optional[int]) -> str:
+    if tenant_id is None or table not in _tenant_tables():
+        return table
+    return f"{table}@{tenant_id}"
+
+def ensure_change_counters(engine) -> None:
+    """Создать строки счётчиков для всех таблиц (при старте)"""
+    names = set(Base.metadata.tables) - _SKIP
+    with engine.begin() as connection:
+        existing = {row[0] for row in connection.execute(select(ChangeCounter.table_name))}
+        missing = [{"table_name": name, "version": 0} for name in sorted(names - existing)]
+        if missing:
+            connection.execute(insert(ChangeCounter), missing)
+
+def table_versions(db: Session, tables: Iterable[str]) -> Dict[str, int]:
+    """Текущие версии таблиц одним запросом (для компании текущего запроса)"""
+    tables = list(tables)
+    tenant_id = current_tenant_id()
+    names = {name: {name, _counter_name(name, tenant_id)} for name in tables}
+    rows = dict(db.execute(
+        select(ChangeCounter.table_name, ChangeCounter.version)
+        .where(ChangeCounter.table_name.in_(set().union(*names.values())))
+    ).all())
+    return {
+        name: sum(rows[key] for key in keys if key in rows)
+        for name, keys in names.items()
+        if any(key in rows for key in keys)
+    }
+
+def _touch(session: Session, tables: Set[str]) -> None:
+    """Запомнить таблицы, в которые пишет транзакция (версии - при commit)"""
+    tables = tables - _SKIP
+    if tables:
+        tenant_id = current_tenant_id()
+        session.info.setdefault("touched_counters", set()).update(
+            _counter_name(table, tenant_id) for table in tables
+        )
+
+def _bump(connection, names: Set[str]) -> None:
+    """Увеличить версии счётчиков - в порядке имён
+
+    Строки счётчиков блокируются до конца транзакции: единый порядок
+    не даёт двум транзакциям взять их навстречу друг другу (deadlock).
+    """
+    for name in sorted(names):
+        result = connection.execute(
+            update(ChangeCounter)
+            .where(ChangeCounter.table_name == name)
+            .values(version=ChangeCounter.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(ChangeCounter).values(table_name=name, version=1))
+
+# Версия меняется в той же транзакции, что и данные: читатель никогда
+# не увидит новую версию со старыми данными. Каскадные удаления ORM
+# попадают в flush и тоже учитываются. Таблицы собираются по ходу
+# транзакции, а счётчики увеличиваются один раз перед commit: строки
+# счётчиков заблокированы только на время commit, а не всего запроса.
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_tables(session, flush_context):
+    _touch(session, {
+        obj.__table__.name
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if hasattr(obj, "__table__")
+    })
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_statements(orm_execute_state):
+    # Массовые insert/update/delete (импорт, move-batch, bulk задач)
+    # идут мимо flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            _touch(orm_execute_state.session, {table.name})
+
+@event.listens_for(Session, "before_commit")
+def _bump_touched_tables(session):
+    # before_commit срабатывает до финального flush - сбрасываем сами,
+    # чтобы его таблицы тоже попали в версии
+    session.flush()
+    names = session.info.pop("touched_counters", None)
+    if names:
+        _bump(session.connection(), names)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_touched_tables(session):
+    session.info.pop("touched_counters", None)
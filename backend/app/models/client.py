@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
+from app.models.tenant import TenantScoped
 
-class Client(Base):
+class Client(TenantScoped, Base):
     """Модель клиента (компании)"""
     __tablename__ = "clients"
 
@@ -39,8 +40,14 @@ class Client(Base):
     # Relationships
     contacts = relationship("Contact", back_populates="client", cascade="all, delete-orphan")
     deals = relationship("Deal", back_populates="client", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Keyset пагинация списка компании: WHERE tenant_id = ? ORDER BY created_at desc, id desc
+        Index("ix_clients_tenant_created_id", "tenant_id", "created_at", "id"),
+        Index("ix_clients_tenant_status", "tenant_id", "status"),
+    )
 
-class Contact(Base):
+class Contact(TenantScoped, Base):
     """Модель контактного лица"""
     __tablename__ = "contacts"
 
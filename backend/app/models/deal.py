@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text, Boolean, Index
+from sqlalchemy.orm import attributes, relationship
 from datetime import datetime
 from app.database import Base
+from app.models.tenant import TenantScoped
 
-class Pipeline(Base):
+class Pipeline(TenantScoped, Base):
     """Воронка продаж (например: 'Основная', 'Повторные продажи')"""
     __tablename__ = "pipelines"
 
@@ -24,7 +25,7 @@ class Pipeline(Base):
     stages = relationship("DealStage", back_populates="pipeline", cascade="all, delete-orphan")
     deals = relationship("Deal", back_populates="pipeline")
 
-class DealStage(Base):
+class DealStage(TenantScoped, Base):
     """Стадия сделки (например: 'Новый лид', 'Квалификация', 'Переговоры')"""
     __tablename__ = "deal_stages"
 
@@ -51,7 +52,7 @@ class DealStage(Base):
     pipeline = relationship("Pipeline", back_populates="stages")
     deals = relationship("Deal", back_populates="stage")
 
-class Deal(Base):
+class Deal(TenantScoped, Base):
     """Сделка - основная сущность CRM"""
     __tablename__ = "deals"
 
@@ -90,3 +91,30 @@ class Deal(Base):
     stage = relationship("DealStage", back_populates="deals")
     tasks = relationship("Task", back_populates="deal", cascade="all, delete-orphan")
     activities = relationship("Activity", back_populates="deal", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Колонки Kanban: карточки стадии в порядке id desc
+        Index("ix_deals_stage_status_id", "stage_id", "status", "id"),
+        # Keyset пагинация списка компании: WHERE tenant_id = ? ORDER BY created_at desc, id desc
+        Index("ix_deals_tenant_created_id", "tenant_id", "created_at", "id"),
+        # Фильтр списков и аналитики по статусу внутри компании
+        Index("ix_deals_tenant_status", "tenant_id", "status"),
+    )
+
+def deal_values(deal: Deal, fields, old: bool = False) -> dict:
+    """Поля сделки до (old=True) или после flush
+
+    Общая основа для дельт итогов (rollup) и событий доски: обе читают
+    состояние сделки в after_flush, в том числе удалённой.
+    """
+    state = attributes.instance_state(deal)
+    values = {}
+    for name in fields:
+        history = state.attrs[name].history
+        if old and history.deleted:
+            values[name] = history.deleted[0]
+        elif name in state.dict or state.deleted:
+            values[name] = state.dict.get(name)
+        else:
+            values[name] = getattr(deal, name)
+    return values
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from datetime import datetime
+from app.database import Base
+from app.models.tenant import DEFAULT_TENANT_ID
+
+class RevokedToken(Base):
+    """Отозванные токены
+
+    jti задан - отозван один токен (выход, использованный refresh).
+    jti пустой - отозваны все токены пользователя, выданные раньше
+    not_before (блокировка, смена роли или пароля).
+    Строка нужна только до expires_at: позже токен истёк и так.
+    Таблица общая для всех компаний (не TenantScoped): синхронизация
+    читает её целиком, а user_id различаются только вместе с tenant_id.
+    """
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String, nullable=True, index=True)
+    tenant_id = Column(Integer, nullable=False, default=DEFAULT_TENANT_ID)
+    user_id = Column(Integer, nullable=False)
+    not_before = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_revoked_tokens_user", "tenant_id", "user_id", "not_before"),
+    )
@@ -0,0 +1,237 @@
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Index, event, func, insert, update, and_
+from sqlalchemy.orm import Session
+from app.database import Base
+from app.models.tenant import TenantScoped, active_tenant_id
+from app.models.deal import Deal, deal_values
+
+class StageRollup(TenantScoped, Base):
+    """Материализованные итоги по стадиям: количество и сумма сделок
+    в разрезе воронки, стадии, менеджера и статуса.
+
+    Поддерживается автоматически при каждом flush сессии, поэтому
+    итоги меняются в той же транзакции, что и сами сделки.
+    """
+    __tablename__ = "stage_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    pipeline_id = Column(Integer, ForeignKey("pipelines.id"), nullable=False)
+    stage_id = Column(Integer, ForeignKey("deal_stages.id"), nullable=False)
+    manager_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    status = Column(String, nullable=False)
+
+    deals_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Float, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_stage_rollups_key", "tenant_id", "pipeline_id", "stage_id", "manager_id", "status"),
+    )
+
+class DealDailyFact(TenantScoped, Base):
+    """Закрытые сделки по дням: количество и сумма выигранных/проигранных
+    в разрезе воронки, стадии, менеджера и валюты.
+
+    Поддерживается так же, как StageRollup; для графиков продаж.
+    """
+    __tablename__ = "deal_daily_facts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    pipeline_id = Column(Integer, ForeignKey("pipelines.id"), nullable=False)
+    stage_id = Column(Integer, ForeignKey("deal_stages.id"), nullable=False)
+    manager_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    currency = Column(String, nullable=False)
+    status = Column(String, nullable=False)  # won, lost
+
+    deals_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Float, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_deal_daily_facts_status_day", "tenant_id", "status", "day"),
+        Index("ix_deal_daily_facts_key", "tenant_id", "day", "pipeline_id", "stage_id", "manager_id", "currency", "status"),
+    )
+
+CLOSED_STATUSES = ("won", "lost")
+
+_TRACKED_FIELDS = ("tenant_id", "pipeline_id", "stage_id", "manager_id", "status", "amount", "currency", "closed_at")
+
+def _upsert(connection, table, key: dict, count: int, amount: float) -> None:
+    """Прибавить count/amount к строке с ключом key (создать, если её нет)"""
+    condition = and_(*[
+        table.c[name] == value if value is not None else table.c[name].is_(None)
+        for name, value in key.items()
+    ])
+    result = connection.execute(
+        update(table).where(condition).values(
+            deals_count=table.c.deals_count + count,
+            total_amount=table.c.total_amount + amount,
+        )
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(deals_count=count, total_amount=amount, **key))
+
+def _tenant(row: dict) -> int:
+    # Строки из executemany (импорт, move-batch) могут быть без tenant_id:
+    # они пишутся в компании текущего запроса
+    tenant_id = row.get("tenant_id")
+    return active_tenant_id() if tenant_id is None else tenant_id
+
+def _stage_key(row: dict) -> Optional[tuple]:
+    if row.get("pipeline_id") is None or row.get("stage_id") is None:
+        return None
+    return (
+        ("tenant_id", _tenant(row)),
+        ("pipeline_id", row["pipeline_id"]),
+        ("stage_id", row["stage_id"]),
+        ("manager_id", row.get("manager_id")),
+        ("status", row.get("status") or "open"),
+    )
+
+def _fact_key(row: dict) -> Optional[tuple]:
+    closed_at = row.get("closed_at")
+    if row.get("status") not in CLOSED_STATUSES or closed_at is None or _stage_key(row) is None:
+        return None
+    if isinstance(closed_at, str):
+        closed_at = datetime.fromisoformat(closed_at)
+    return (
+        ("tenant_id", _tenant(row)),
+        ("day", closed_at.date() if isinstance(closed_at, datetime) else closed_at),
+        ("pipeline_id", row["pipeline_id"]),
+        ("stage_id", row["stage_id"]),
+        ("manager_id", row.get("manager_id")),
+        ("currency", row.get("currency") or "RUB"),
+        ("status", row["status"]),
+    )
+
+_AGGREGATES = (
+    (StageRollup.__table__, _stage_key),
+    (DealDailyFact.__table__, _fact_key),
+)
+
+def apply_deal_rows(connection, rows: list, sign: int = 1) -> None:
+    """Учесть пачку сделок в итогах (stage_rollups, deal_daily_facts).
+
+    Нужно для записи в обход ORM (executemany, bulk update): rows -
+    словари с полями сделки; sign=-1 вычитает их из итогов.
+    """
+    for table, make_key in _AGGREGATES:
+        totals = {}
+        for row in rows:
+            key = make_key(row)
+            if key is None:
+                continue
+            count, amount = totals.get(key, (0, 0.0))
+            totals[key] = (count + 1, amount + (row.get("amount") or 0))
+        for key, (count, amount) in totals.items():
+            if count:
+                _upsert(connection, table, dict(key), sign * count, sign * amount)
+
+def apply_deal_delta(connection, old: dict = None, new: dict = None) -> None:
+    """Перенести сделку из старых значений в новые (None - сделки нет)"""
+    if old == new:
+        return
+    if old is not None:
+        apply_deal_rows(connection, [old], sign=-1)
+    if new is not None:
+        apply_deal_rows(connection, [new])
+
+@event.listens_for(Session, "after_flush")
+def _maintain_deal_aggregates(session, flush_context):
+    connection = None
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, Deal):
+            continue
+        if connection is None:
+            connection = session.connection()
+        if obj in session.new:
+            apply_deal_delta(connection, new=deal_values(obj, _TRACKED_FIELDS))
+        elif obj in session.deleted:
+            apply_deal_delta(connection, old=deal_values(obj, _TRACKED_FIELDS, old=True))
+        elif session.is_modified(obj, include_collections=False):
+            apply_deal_delta(
+                connection,
+                old=deal_values(obj, _TRACKED_FIELDS, old=True),
+                new=deal_values(obj, _TRACKED_FIELDS),
+            )
+
+def stage_totals(db: Session, pipeline_id: int = None, manager_id: int = None, status: str = "open") -> dict:
+    """Итоги по стадиям из stage_rollups: {stage_id: (count, amount)}"""
+    query = db.query(
+        StageRollup.stage_id,
+        func.sum(StageRollup.deals_count),
+        func.sum(StageRollup.total_amount),
+    ).filter(StageRollup.status == status)
+    if pipeline_id is not None:
+        query = query.filter(StageRollup.pipeline_id == pipeline_id)
+    if manager_id is not None:
+        query = query.filter(StageRollup.manager_id == manager_id)
+    return {
+        stage_id: (int(count or 0), float(amount or 0))
+        for stage_id, count, amount in query.group_by(StageRollup.stage_id).all()
+    }
+
+def rebuild_stage_rollups(db: Session) -> int:
+    """Пересчитать stage_rollups с нуля по таблице deals
+
+    В запросе компании - только её итоги, в скрипте - по всем компаниям.
+    """
+    db.query(StageRollup).delete(synchronize_session=False)
+    rows = db.query(
+        Deal.tenant_id,
+        Deal.pipeline_id,
+        Deal.stage_id,
+        Deal.manager_id,
+        Deal.status,
+        func.count(Deal.id),
+        func.coalesce(func.sum(Deal.amount), 0),
+    ).group_by(Deal.tenant_id, Deal.pipeline_id, Deal.stage_id, Deal.manager_id, Deal.status).all()
+    if rows:
+        db.execute(insert(StageRollup.__table__), [{
+            "tenant_id": tenant_id,
+            "pipeline_id": pipeline_id,
+            "stage_id": stage_id,
+            "manager_id": manager_id,
+            "status": status or "open",
+            "deals_count": count,
+            "total_amount": float(amount),
+        } for tenant_id, pipeline_id, stage_id, manager_id, status, count, amount in rows])
+    db.commit()
+    return len(rows)
+
+def rebuild_deal_daily_facts(db: Session) -> int:
+    """Пересчитать deal_daily_facts с нуля по закрытым сделкам"""
+    db.query(DealDailyFact).delete(synchronize_session=False)
+    day = func.date(Deal.closed_at)
+    rows = db.query(
+        Deal.tenant_id,
+        day,
+        Deal.pipeline_id,
+        Deal.stage_id,
+        Deal.manager_id,
+        func.coalesce(Deal.currency, "RUB"),
+        Deal.status,
+        func.count(Deal.id),
+        func.coalesce(func.sum(Deal.amount), 0),
+    ).filter(
+        Deal.status.in_(CLOSED_STATUSES),
+        Deal.closed_at.isnot(None)
+    ).group_by(
+        Deal.tenant_id, day, Deal.pipeline_id, Deal.stage_id, Deal.manager_id, func.coalesce(Deal.currency, "RUB"), Deal.status
+    ).all()
+    if rows:
+        db.execute(insert(DealDailyFact.__table__), [{
+            "tenant_id": tenant_id,
+            # SQLite возвращает date() строкой
+            "day": date.fromisoformat(day) if isinstance(day, str) else day,
+            "pipeline_id": pipeline_id,
+            "stage_id": stage_id,
+            "manager_id": manager_id,
+            "currency": currency,
+            "status": status,
+            "deals_count": count,
+            "total_amount": float(amount),
+        } for tenant_id, day, pipeline_id, stage_id, manager_id, currency, status, count, amount in rows])
+    db.commit()
+    return len(rows)
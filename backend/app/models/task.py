@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Date, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Date, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
+from app.models.tenant import TenantScoped
 
-class Task(Base):
+class Task(TenantScoped, Base):
     """Задача"""
     __tablename__ = "tasks"
 
@@ -35,3 +36,10 @@ class Task(Base):
     
     # Relationships
     deal = relationship("Deal", back_populates="tasks")
+    
+    __table_args__ = (
+        # Очереди "мои просроченные / на сегодня / на неделю"
+        Index("ix_tasks_assignee_status_due", "assignee_id", "status", "due_date", "id"),
+        # Keyset пагинация списка компании: WHERE tenant_id = ? ORDER BY created_at desc, id desc
+        Index("ix_tasks_tenant_created_id", "tenant_id", "created_at", "id"),
+    )
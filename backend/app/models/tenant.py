@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from datetime import datetime
+from app.database import Base
+
+class Tenant(Base):
+    """Рабочее пространство (компания-клиент сервиса)
+
+    Данные всех компаний лежат в общих таблицах и различаются по
+    tenant_id (см. TenantScoped). schema_name задан - данные компании
+    в отдельной схеме PostgreSQL (TENANT_SCHEMAS=true).
+    """
+    __tablename__ = "tenants"
+
+    id = Column(Integer, primary_key=True, index=True)
+    slug = Column(String, unique=True, index=True, nullable=False)  # поддомен / X-Tenant
+    name = Column(String, nullable=False)
+    schema_name = Column(String, nullable=True)
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Компания, в которой существуют данные, созданные до разделения
+DEFAULT_TENANT_ID = 1
+
+# Компания текущего запроса (ставит TenantMiddleware); None - скрипты
+# и фоновые задачи, запросы не ограничиваются
+_current_tenant: ContextVar[Optional[int]] = ContextVar("current_tenant", default=None)
+_current_schema: ContextVar[Optional[str]] = ContextVar("current_schema", default=None)
+
+def current_tenant_id() -> Optional[int]:
+    return _current_tenant.get()
+
+def current_tenant_schema() -> Optional[str]:
+    return _current_schema.get()
+
+def active_tenant_id() -> int:
+    """Компания запроса; вне запроса - DEFAULT_TENANT_ID (для новых строк)"""
+    tenant_id = _current_tenant.get()
+    return DEFAULT_TENANT_ID if tenant_id is None else tenant_id
+
+@contextmanager
+def tenant_scope(tenant_id: int, schema: Optional[str] = None):
+    """Выполнить блок от имени компании (скрипты, фоновые задачи)"""
+    tenant_token = _current_tenant.set(tenant_id)
+    schema_token = _current_schema.set(schema)
+    try:
+        yield
+    finally:
+        _current_schema.reset(schema_token)
+        _current_tenant.reset(tenant_token)
+
+class TenantScoped:
+    """Примесь для таблиц с данными компании
+
+    Запросы ORM ограничиваются компанией текущего запроса автоматически
+    (app/tenancy.py), новые строки получают её tenant_id. Внешнего ключа
+    на tenants нет: в режиме схем таблицы компании лежат в её схеме,
+    а tenants - в public.
+    """
+    tenant_id = Column(Integer, nullable=False, default=active_tenant_id)
+
+def tenant_scoped_tables() -> set:
+    """Таблицы моделей TenantScoped; колонка tenant_id бывает и у общих
+    таблиц (revoked_tokens), по ней компанию не определить
+    """
+    return {mapper.local_table for mapper in Base.registry.mappers if issubclass(mapper.class_, TenantScoped)}
@@ -1,14 +1,16 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index
 from datetime import datetime
 from app.database import Base
+from app.models.tenant import TenantScoped
 
-class User(Base):
+class User(TenantScoped, Base):
     """Модель пользователя системы"""
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True, nullable=False)
-    username = Column(String, unique=True, index=True, nullable=False)
+    # Уникальны в пределах компании (см. __table_args__)
+    email = Column(String, nullable=False)
+    username = Column(String, nullable=False)
     full_name = Column(String, nullable=False)
     hashed_password = Column(String, nullable=False)
     
@@ -27,3 +29,9 @@ class User(Base):
     phone = Column(String, nullable=True)
     position = Column(String, nullable=True)
     avatar_url = Column(String, nullable=True)
+    
+    __table_args__ = (
+        # Вход: WHERE tenant_id = ? AND username = ?
+        Index("ux_users_tenant_username", "tenant_id", "username", unique=True),
+        Index("ux_users_tenant_email", "tenant_id", "email", unique=True),
+    )
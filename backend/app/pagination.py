@@ -0,0 +1,69 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Date, tuple_
+from sqlalchemy.orm import Query
+
+def encode_cursor(*values: Any) -> str:
+    """Непрозрачный курсор из значений ключа последней строки"""
+    raw = json.dumps(list(values), separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Разобрать курсор; 400 если он повреждён"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def paginate_keyset(
+    query: Query,
+    sort_column,
+    id_column,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    descending: bool = True
+) -> Tuple[list, Optional[str]]:
+    """Страница по ключу (sort_column, id) - по умолчанию (created_at, id desc).
+
+    Возвращает строки и курсор следующей страницы (None если она пуста).
+    Курсор не зависит от смещения, поэтому глубокие страницы такие же
+    быстрые, как первая, и не теряют строки при параллельных вставках.
+    skip оставлен для совместимости и игнорируется при наличии курсора.
+    """
+    parse = date.fromisoformat if _is_date_only(sort_column) else datetime.fromisoformat
+    if cursor:
+        last_value, last_id = decode_cursor(cursor, 2)
+        try:
+            last_value = parse(last_value)
+            last_id = int(last_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        key = tuple_(sort_column, id_column)
+        last_key = tuple_(last_value, last_id)
+        query = query.filter(key < last_key if descending else key > last_key)
+    
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+    if skip and not cursor:
+        query = query.offset(skip)
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, sort_column.key).isoformat(), last.id)
+
+def _is_date_only(column) -> bool:
+    return isinstance(column.type, Date)
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.config import settings
+
+# Проверка паролей вне event loop.
+#
+# bcrypt медленный намеренно (сотни миллисекунд при cost 12). Проверка
+# выполняется в своём ограниченном пуле, а не в пуле anyio: волна входов
+# не занимает потоки, на которых работают sync роуты.
+#
+#   thread  - пул потоков (bcrypt отпускает GIL на время хэширования)
+#   process - пул процессов
+#
+# Успешный вход запоминается на LOGIN_CACHE_TTL: повторный вход с тем же
+# паролем проверяется по HMAC без bcrypt. Ключ включает хэш пароля из БД,
+# поэтому после смены пароля старые записи просто не совпадут.
+
+# Хэши со стоимостью ниже BCRYPT_ROUNDS перехэшируются при входе
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+)
+
+def _verify(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Проверить пароль; вернуть (ok, новый хэш или None)"""
+    return pwd_context.verify_and_update(password, hashed)
+
+class VerifiedLoginCache:
+    """Недавно проверенные пары (пароль, хэш) - только HMAC, в памяти процесса"""
+
+    def __init__(self, ttl: int, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._secret = os.urandom(32)
+        self._items: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, password: str, hashed: str) -> bytes:
+        return hmac.new(self._secret, f"{hashed}\0{password}".encode(), hashlib.sha256).digest()
+
+    def check(self, password: str, hashed: str) -> bool:
+        if self.ttl <= 0:
+            return False
+        key = self._key(password, hashed)
+        with self._lock:
+            expires = self._items.get(key)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._items[key]
+                return False
+            return True
+
+    def remember(self, password: str, hashed: str) -> None:
+        if self.ttl <= 0:
+            return
+        key = self._key(password, hashed)
+        with self._lock:
+            self._items[key] = time.monotonic() + self.ttl
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+class PasswordHasher:
+    def __init__(self, executor: str, workers: int, max_pending: int, cache: VerifiedLoginCache):
+        self.executor = executor
+        self.workers = workers
+        self.max_pending = max_pending
+        self.cache = cache
+        self._pool: Optional[Executor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                if self.executor == "process":
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            return self._pool
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Проверить пароль в пуле; вернуть (ok, новый хэш при перехэшировании)
+
+        Если в очереди уже max_pending проверок - 503: лучше быстро
+        отказать, чем копить входы, которые всё равно не дождутся ответа.
+        """
+        if self.cache.check(password, hashed):
+            return True, None
+        if self._pending >= self.max_pending:
+            raise HTTPException(status_code=503, detail="Too many login attempts, retry later", headers={"Retry-After": "1"})
+
+        self._pending += 1
+        try:
+            ok, new_hash = await asyncio.wrap_future(self._get_pool().submit(_verify, password, hashed))
+        finally:
+            self._pending -= 1
+        if ok:
+            self.cache.remember(password, new_hash or hashed)
+        return ok, new_hash
+
+    def stop(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+password_hasher = PasswordHasher(
+    settings.PASSWORD_HASH_EXECUTOR,
+    settings.PASSWORD_HASH_WORKERS,
+    settings.PASSWORD_HASH_MAX_PENDING,
+    VerifiedLoginCache(settings.LOGIN_CACHE_TTL, settings.LOGIN_CACHE_MAXSIZE),
+)
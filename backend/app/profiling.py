@@ -0,0 +1,284 @@
+import cProfile
+import functools
+import inspect
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Профилирование запросов.
+#
+#   ProfilingMiddleware - на каждый запрос заводит RequestStats, по итогам
+#                         пишет заголовок Server-Timing и метрики /metrics
+#   события Engine      - число запросов к БД и время в БД
+#   ProfiledRoute       - время роута (handler) и сериализации ответа,
+#                         выборочный cProfile/pyinstrument для PROFILE_ROUTE
+#
+# RequestStats лежит в ContextVar: sync роуты выполняются в пуле потоков,
+# но anyio копирует контекст в поток, поэтому счётчики общие.
+
+class RequestStats:
+    __slots__ = ("started", "db_queries", "db_time", "handler_start", "handler_end", "route_end", "profile")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.handler_start: Optional[float] = None
+        self.handler_end: Optional[float] = None
+        self.route_end: Optional[float] = None
+        self.profile: Optional[str] = None  # путь роута, если запрос профилируется
+
+    def server_timing(self) -> str:
+        now = time.perf_counter()
+        parts = [f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"']
+        if self.handler_start is not None and self.handler_end is not None:
+            parts.append(f"handler;dur={(self.handler_end - self.handler_start) * 1000:.1f}")
+            if self.route_end is not None:
+                parts.append(f"serialize;dur={(self.route_end - self.handler_end) * 1000:.1f}")
+        parts.append(f"total;dur={(now - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def current_stats() -> Optional[RequestStats]:
+    return _stats.get()
+
+# ================== БД ==================
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _stats.get() is not None:
+        context._profiling_started = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    stats = _stats.get()
+    started = getattr(context, "_profiling_started", None)
+    if stats is not None and started is not None:
+        stats.db_queries += 1
+        stats.db_time += time.perf_counter() - started
+
+# ================== МЕТРИКИ ==================
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class Histogram:
+    """Гистограмма в формате Prometheus с метками (method, route)"""
+
+    def __init__(self, name: str, help: str, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, str], value: float) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Счётчики по корзинам + сумма + количество
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, [list(series[0]), series[1], series[2]]) for labels, series in self._series.items()]
+        for (method, route), (counts, total, count) in sorted(items):
+            labels = f'method="{method}",route="{route}"'
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+class Metrics:
+    def __init__(self):
+        self.duration = Histogram("http_request_duration_seconds", "Request duration", DURATION_BUCKETS)
+        self.db_time = Histogram("http_request_db_seconds", "Time spent in the database per request", DURATION_BUCKETS)
+        self.db_queries = Histogram("http_request_db_queries", "Database queries per request", QUERY_BUCKETS)
+        self._responses: Dict[Tuple[str, str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method: str, route: str, status: int, duration: float, stats: RequestStats) -> None:
+        labels = (method, route)
+        self.duration.observe(labels, duration)
+        self.db_time.observe(labels, stats.db_time)
+        self.db_queries.observe(labels, stats.db_queries)
+        with self._lock:
+            key = (method, route, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def render(self) -> str:
+        lines = []
+        for histogram in (self.duration, self.db_time, self.db_queries):
+            lines.extend(histogram.render())
+        lines.append("# HELP http_requests_total Requests by route and status")
+        lines.append("# TYPE http_requests_total counter")
+        with self._lock:
+            responses = sorted(self._responses.items())
+        for (method, route, status), count in responses:
+            lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+# ================== MIDDLEWARE ==================
+
+class ProfilingMiddleware:
+    """ASGI middleware: Server-Timing и метрики по шаблону пути роута"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _stats.set(stats)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.SERVER_TIMING_ENABLED:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", stats.server_timing().encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _stats.reset(token)
+            route = scope.get("route")
+            # Шаблон пути, а не сам путь: иначе /api/deals/1, /api/deals/2... - разные серии
+            path = getattr(route, "path", None) or "unmatched"
+            metrics.observe(scope["method"], path, status, time.perf_counter() - stats.started, stats)
+
+# ================== РОУТЫ ==================
+
+class _CProfile(cProfile.Profile):
+    def start(self) -> None:
+        self.enable()
+
+    def stop(self) -> None:
+        self.disable()
+
+    def save(self, path: str) -> None:
+        self.dump_stats(path + ".prof")
+
+class _Pyinstrument:
+    def __init__(self):
+        from pyinstrument import Profiler  # опциональная зависимость
+
+        self.profiler = Profiler()
+
+    def start(self) -> None:
+        self.profiler.start()
+
+    def stop(self) -> None:
+        self.profiler.stop()
+
+    def save(self, path: str) -> None:
+        with open(path + ".html", "w", encoding="utf-8") as f:
+            f.write(self.profiler.output_html())
+
+_profile_seq = itertools.count(1)
+
+def _save_profile(route: str, profiler) -> None:
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    name = route.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+    path = os.path.join(settings.PROFILE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_profile_seq)}")
+    profiler.save(path)
+    logger.info("Profile saved: %s", path)
+
+def _before_handler() -> Tuple[Optional[RequestStats], object]:
+    stats = _stats.get()
+    profiler = None
+    if stats is not None:
+        stats.handler_start = time.perf_counter()
+        if stats.profile:
+            profiler = _Pyinstrument() if settings.PROFILER == "pyinstrument" else _CProfile()
+            profiler.start()
+    return stats, profiler
+
+def _after_handler(stats: Optional[RequestStats], profiler) -> None:
+    if profiler is not None:
+        profiler.stop()
+        _save_profile(stats.profile, profiler)
+    if stats is not None:
+        stats.handler_end = time.perf_counter()
+
+def _timed(endpoint):
+    """Обёртка эндпоинта: время handler и профилирование в его потоке"""
+    if getattr(endpoint, "_profiled", False):
+        # include_router пересоздаёт роуты с уже обёрнутым эндпоинтом
+        return endpoint
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            stats, profiler = _before_handler()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _after_handler(stats, profiler)
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            # Sync эндпоинт выполняется в потоке пула - профилируем здесь
+            stats, profiler = _before_handler()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _after_handler(stats, profiler)
+    wrapper._profiled = True
+    return wrapper
+
+class ProfiledRoute(APIRoute):
+    """Роут с замером handler/serialize и выборочным профилированием
+
+    PROFILE_ROUTE="GET /api/deals/" включает профилирование одного роута
+    с вероятностью PROFILE_SAMPLE_RATE.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        keys = {f"{method} {self.path}" for method in self.methods or ()}
+
+        async def profiled_handler(request):
+            stats = _stats.get()
+            if stats is not None and settings.PROFILE_ROUTE in keys and random.random() < settings.PROFILE_SAMPLE_RATE:
+                stats.profile = self.path
+            response = await handler(request)
+            if stats is not None:
+                stats.route_end = time.perf_counter()
+            return response
+
+        return profiled_handler
@@ -0,0 +1,134 @@
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.change_counter import table_versions
+from app.models.deal import Pipeline, DealStage
+from app.models.tenant import current_tenant_id
+
+# Справочники воронок и стадий в памяти процесса.
+#
+# Меняются редко (админка), а читаются на каждой записи сделки и при
+# каждом открытии доски. Снимок перечитывается, когда меняется версия
+# таблиц pipelines/deal_stages в change_counters: так изменения из
+# другого воркера видны не позже чем через REFERENCE_CHECK_INTERVAL,
+# а из своего - сразу после commit. Снимки у каждой компании свои.
+
+_TABLES = ("pipelines", "deal_stages")
+
+@dataclass(frozen=True)
+class PipelineRef:
+    id: int
+    name: str
+    description: Optional[str]
+    sort_order: int
+    is_active: bool
+    created_at: datetime
+
+@dataclass(frozen=True)
+class StageRef:
+    id: int
+    pipeline_id: int
+    name: str
+    description: Optional[str]
+    color: str
+    sort_order: int
+    win_probability: int
+    is_final: bool
+    is_won: bool
+    created_at: datetime
+
+class ReferenceData:
+    """Неизменяемый снимок справочников"""
+
+    def __init__(self, pipelines: List[PipelineRef], stages: List[StageRef]):
+        self.pipelines: Dict[int, PipelineRef] = {p.id: p for p in pipelines}
+        self.stages: Dict[int, StageRef] = {s.id: s for s in stages}
+        self.active_pipelines: List[PipelineRef] = sorted(
+            (p for p in pipelines if p.is_active), key=lambda p: (p.sort_order, p.id)
+        )
+        self.ordered_stages: List[StageRef] = sorted(stages, key=lambda s: (s.sort_order, s.id))
+        self._pipeline_stages: Dict[int, List[StageRef]] = {}
+        for stage in self.ordered_stages:
+            self._pipeline_stages.setdefault(stage.pipeline_id, []).append(stage)
+
+    def stages_of(self, pipeline_id: int) -> List[StageRef]:
+        """Стадии воронки по порядку"""
+        return self._pipeline_stages.get(pipeline_id, [])
+
+def _pipeline_ref(p: Pipeline) -> PipelineRef:
+    return PipelineRef(
+        id=p.id, name=p.name, description=p.description,
+        sort_order=p.sort_order or 0, is_active=bool(p.is_active), created_at=p.created_at,
+    )
+
+def _stage_ref(s: DealStage) -> StageRef:
+    return StageRef(
+        id=s.id, pipeline_id=s.pipeline_id, name=s.name, description=s.description,
+        color=s.color, sort_order=s.sort_order or 0, win_probability=s.win_probability or 0,
+        is_final=bool(s.is_final), is_won=bool(s.is_won), created_at=s.created_at,
+    )
+
+class ReferenceCache:
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        # Компания -> (снимок, версия таблиц, время проверки)
+        self._entries: Dict[Optional[int], Tuple[ReferenceData, Tuple[int, ...], float]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> ReferenceData:
+        """Текущий снимок компании запроса; при смене версии перечитывается из БД"""
+        now = time.monotonic()
+        tenant_id = current_tenant_id()
+        with self._lock:
+            entry, generation = self._entries.get(tenant_id), self._generation
+            data, version, checked = entry if entry is not None else (None, None, 0.0)
+            if data is not None and now - checked < self.check_interval:
+                return data
+
+        versions = table_versions(db, _TABLES)
+        current = tuple(versions.get(name, 0) for name in _TABLES)
+        if data is None or current != version:
+            # Версию читаем до данных: если запись успеет между ними,
+            # следующая проверка просто перечитает снимок ещё раз
+            data = ReferenceData(
+                [_pipeline_ref(p) for p in db.query(Pipeline).all()],
+                [_stage_ref(s) for s in db.query(DealStage).all()],
+            )
+        with self._lock:
+            # Пока читали, снимок сбросили локальной записью - не сохраняем
+            if generation == self._generation:
+                self._entries[tenant_id] = (data, current, now)
+        return data
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+reference_cache = ReferenceCache(settings.REFERENCE_CHECK_INTERVAL)
+
+# ================== ИНВАЛИДАЦИЯ ==================
+
+@event.listens_for(Session, "after_flush")
+def _collect_reference_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (Pipeline, DealStage)):
+            session.info["reference_changed"] = True
+            return
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_reference(session):
+    if session.info.pop("reference_changed", False):
+        reference_cache.invalidate()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_reference_changes(session):
+    session.info.pop("reference_changed", None)
@@ -3,6 +3,9 @@ from .pipelines import router as pipelines_router
 from .deals import router as deals_router
 from .dashboard import router as dashboard_router
 from .clients import router as clients_router
+from .tasks import router as tasks_router
+from .activities import router as activities_router
+from .export import router as export_router
 
 __all__ = [
     'auth_router',
@@ -10,4 +13,7 @@ __all__ = [
     'deals_router',
     'dashboard_router',
     'clients_router',
+    'tasks_router',
+    'activities_router',
+    'export_router',
 ]
@@ -0,0 +1,103 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.database import get_db, get_read_db
+from app.profiling import ProfiledRoute
+from app.auth import get_current_user
+from app.user_cache import UserPrincipal
+from app.etag import conditional
+from app.models.activity import Activity
+from app.models.client import Client
+from app.models.deal import Deal
+from app.schemas.activity import ActivityCreate, ActivityResponse
+from app.services.activity_timeline import timeline
+from app.tenancy import require_own
+
+router = APIRouter(prefix="/api/activities", tags=["activities"], route_class=ProfiledRoute)
+
+def _set_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+@router.get("/", response_model=List[ActivityResponse], dependencies=[Depends(conditional("activities"))])
+def list_activities(
+    user_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    response: Response = None,
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Общая лента активностей (только горячая таблица, курсор в X-Next-Cursor)"""
+    # Менеджеры видят только свои активности
+    if current_user.role == "manager":
+        user_id = current_user.id
+
+    activities, next_cursor = timeline(db, user_id=user_id, limit=limit, cursor=cursor)
+    _set_cursor(response, next_cursor)
+    return activities
+
+@router.get("/deals/{deal_id}", response_model=List[ActivityResponse], dependencies=[Depends(conditional("activities", "activities_archive"))])
+def deal_timeline(
+    deal_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    include_archive: bool = False,
+    response: Response = None,
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """История сделки"""
+    deal = db.query(Deal.manager_id).filter(Deal.id == deal_id).first()
+    if not deal:
+        raise HTTPException(status_code=404, detail="Deal not found")
+    if current_user.role == "manager" and deal.manager_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    activities, next_cursor = timeline(
+        db, deal_id=deal_id, limit=limit, cursor=cursor, include_archive=include_archive
+    )
+    _set_cursor(response, next_cursor)
+    return activities
+
+@router.get("/clients/{client_id}", response_model=List[ActivityResponse], dependencies=[Depends(conditional("activities", "activities_archive"))])
+def client_timeline(
+    client_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    include_archive: bool = False,
+    response: Response = None,
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """История клиента"""
+    client = db.query(Client.manager_id).filter(Client.id == client_id).first()
+    if not client:
+        raise HTTPException(status_code=404, detail="Client not found")
+    if current_user.role == "manager" and client.manager_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    activities, next_cursor = timeline(
+        db, client_id=client_id, limit=limit, cursor=cursor, include_archive=include_archive
+    )
+    _set_cursor(response, next_cursor)
+    return activities
+
+@router.post("/", response_model=ActivityResponse)
+def create_activity(
+    activity: ActivityCreate,
+    db: Session = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Записать звонок, письмо, встречу или заметку"""
+    if activity.deal_id is None and activity.client_id is None:
+        raise HTTPException(status_code=400, detail="deal_id or client_id required")
+    require_own(db, Deal, activity.deal_id, "Deal not found")
+    require_own(db, Client, activity.client_id, "Client not found")
+
+    db_activity = Activity(**activity.dict(), user_id=current_user.id)
+    db.add(db_activity)
+    db.commit()
+    db.refresh(db_activity)
+    return db_activity
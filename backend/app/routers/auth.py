@@ -1,19 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from datetime import datetime
+from jose import JWTError
 
 from app.database import get_db
-from app.auth import authenticate_user, create_access_token, get_current_user
-from app.schemas.user import Token, UserResponse
+from app.profiling import ProfiledRoute
+from app.auth import authenticate_user, get_current_user, oauth2_scheme
+from app.models.tenant import active_tenant_id
+from app.tokens import (
+    decode_token, issue_stream_ticket, issue_tokens, revocation_list, revoke_token, revoke_user_tokens, token_tenant
+)
+from app.user_cache import UserPrincipal
+from app.schemas.user import Token, UserResponse, RefreshRequest, LogoutRequest, StreamTicket
 from app.models.user import User
-from app.config import settings
 
-router = APIRouter(prefix="/api/auth", tags=["auth"])
+router = APIRouter(prefix="/api/auth", tags=["auth"], route_class=ProfiledRoute)
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    # async: bcrypt ждёт в своём пуле, не занимая поток пула anyio
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -21,17 +29,74 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"user_id": user.id}, expires_delta=access_token_expires
-    )
+    # До commit: после него атрибуты user перечитываются из БД
+    tokens = issue_tokens(user)
     
     # Update last login
     user.last_login = datetime.utcnow()
-    db.commit()
+    await run_in_threadpool(db.commit)
+    
+    return tokens
+
+@router.post("/refresh", response_model=Token)
+def refresh(data: RefreshRequest, db: Session = Depends(get_db)):
+    """Обменять refresh токен на новую пару (старый refresh отзывается)"""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        claims = decode_token(data.refresh_token, typ="refresh")
+    except JWTError:
+        raise credentials_exception
+    
+    if revocation_list.confirm(db, claims):
+        # Повторное предъявление использованного refresh - похоже на кражу:
+        # отзываем все токены пользователя
+        revoke_user_tokens(db, token_tenant(claims), claims["user_id"])
+        db.commit()
+        raise credentials_exception
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    user = db.query(User).filter(User.id == claims["user_id"]).first()
+    if user is None or not user.is_active:
+        raise credentials_exception
+    
+    revoke_token(db, claims)
+    tokens = issue_tokens(user)
+    db.commit()
+    return tokens
+
+@router.post("/logout", status_code=204)
+def logout(
+    data: LogoutRequest = None,
+    token: str = Depends(oauth2_scheme),
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Отозвать текущий access токен и (если передан) refresh токен"""
+    claims = decode_token(token)
+    if "jti" in claims:
+        revoke_token(db, claims)
+    if data is not None and data.refresh_token:
+        try:
+            refresh_claims = decode_token(data.refresh_token, typ="refresh")
+        except JWTError:
+            refresh_claims = None
+        if refresh_claims is not None and refresh_claims["user_id"] == current_user.id:
+            revoke_token(db, refresh_claims)
+    db.commit()
+    return Response(status_code=204)
+
+@router.post("/stream-ticket", response_model=StreamTicket)
+def stream_ticket(current_user: UserPrincipal = Depends(get_current_user)):
+    """Одноразовый тикет для EventSource: GET .../events?ticket=..."""
+    return issue_stream_ticket(current_user, active_tenant_id())
 
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user: User = Depends(get_current_user)):
-    return current_user
+def get_me(current_user: UserPrincipal = Depends(get_current_user), db: Session = Depends(get_db)):
+    # Полный профиль нужен только здесь - в кэше лежит облегчённая запись
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
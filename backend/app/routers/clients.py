@@ -1,52 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
-from app.database import get_db
+from app.database import get_db, get_read_db
+from app.profiling import ProfiledRoute
 from app.auth import get_current_user
-from app.models.user import User
+from app.user_cache import UserPrincipal
+from app.etag import conditional
 from app.models.client import Client
+from app.models.user import User
 from app.schemas.client import ClientCreate, ClientUpdate, ClientResponse
+from app.schemas.deal import ClientExpandedResponse
+from app.services.dashboard import DashboardAggregator
+from app.services.client_search import search_clients
+from app.services.expand import CLIENT_EXPANSIONS, expand_tables, parse_expand, apply_expand, compose_clients
+from app.pagination import paginate_keyset
+from app.fast_json import fast_response, schema_columns
+from app.tenancy import require_own
 
-router = APIRouter(prefix="/api/clients", tags=["clients"])
+router = APIRouter(prefix="/api/clients", tags=["clients"], route_class=ProfiledRoute)
 
 # IMPORTANT: Статические роуты ДОЛЖНЫ быть ВЫШЕ динамических!
-@router.get("/stats/summary")
+@router.get("/stats/summary", dependencies=[Depends(conditional("clients"))])
 def get_clients_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Статистика по клиентам"""
-    query = db.query(Client)
-    
-    # Менеджеры видят только своих
-    if current_user.role == "manager":
-        query = query.filter(Client.manager_id == current_user.id)
-    
-    total = query.count()
-    leads = query.filter(Client.status == "lead").count()
-    clients = query.filter(Client.status == "client").count()
-    archived = query.filter(Client.status == "archive").count()
+    by_status = DashboardAggregator(db, current_user).clients()
     
     return {
-        "total": total,
-        "leads": leads,
-        "clients": clients,
-        "archived": archived,
+        "total": sum(by_status.values()),
+        "leads": by_status.get("lead", 0),
+        "clients": by_status.get("client", 0),
+        "archived": by_status.get("archive", 0),
     }
 
-@router.get("/", response_model=List[ClientResponse])
+@router.get(
+    "/", response_model=List[ClientExpandedResponse], response_model_exclude_unset=True,
+    dependencies=[Depends(conditional("clients", expand=expand_tables(CLIENT_EXPANSIONS)))]
+)
 def list_clients(
     status: Optional[str] = None,
     search: Optional[str] = None,
     manager_id: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    expand: Optional[str] = None,
+    fast: bool = False,
+    response: Response = None,
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
-    """Список клиентов с фильтрами"""
-    query = db.query(Client)
+    """Список клиентов с фильтрами
+
+    Постраничный обход: передайте cursor из заголовка X-Next-Cursor
+    предыдущего ответа. Заголовка нет - это последняя страница.
+    Результаты поиска (search) сортируются по релевантности и
+    листаются через skip. expand=contacts,deals - вложить связанные объекты.
+    fast=true - только колонки ClientResponse без валидации строк (без expand).
+    """
+    names = parse_expand(expand, CLIENT_EXPANSIONS)
+    query = apply_expand(db.query(Client), names, CLIENT_EXPANSIONS)
     
     # Фильтры
     if status:
@@ -55,32 +71,41 @@ def list_clients(
     if manager_id:
         query = query.filter(Client.manager_id == manager_id)
     
-    # Поиск по названию, email, ИНН
-    if search:
-        search_filter = f"%{search}%"
-        query = query.filter(
-            (Client.name.ilike(search_filter)) |
-            (Client.email.ilike(search_filter)) |
-            (Client.inn.ilike(search_filter))
-        )
-    
     # Менеджеры видят только своих клиентов
     if current_user.role == "manager":
         query = query.filter(Client.manager_id == current_user.id)
     
-    clients = query.order_by(Client.created_at.desc()).offset(skip).limit(limit).all()
-    return clients
+    fast = fast and not names
+    
+    # Поиск по названию, email, ИНН, телефону - по релевантности, без курсора
+    if search:
+        query = search_clients(query, search)
+        if fast:
+            query = query.with_entities(*schema_columns(Client, ClientResponse))
+            return fast_response(query.offset(skip).limit(limit).all(), ClientResponse, response)
+        return compose_clients(query.offset(skip).limit(limit).all(), names)
+    
+    if fast:
+        query = query.with_entities(*schema_columns(Client, ClientResponse))
+    
+    clients, next_cursor = paginate_keyset(query, Client.created_at, Client.id, limit, cursor, skip)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if fast:
+        return fast_response(clients, ClientResponse, response)
+    return compose_clients(clients, names)
 
 @router.post("/", response_model=ClientResponse)
 def create_client(
     client: ClientCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Создать клиента"""
     # Если manager_id не указан, назначаем текущего
     if not client.manager_id:
         client.manager_id = current_user.id
+    require_own(db, User, client.manager_id, "Manager not found")
     
     db_client = Client(**client.dict())
     db.add(db_client)
@@ -88,14 +113,19 @@ def create_client(
     db.refresh(db_client)
     return db_client
 
-@router.get("/{client_id}", response_model=ClientResponse)
+@router.get(
+    "/{client_id}", response_model=ClientExpandedResponse, response_model_exclude_unset=True,
+    dependencies=[Depends(conditional("clients", expand=expand_tables(CLIENT_EXPANSIONS)))]
+)
 def get_client(
     client_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    expand: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Получить клиента"""
-    client = db.query(Client).filter(Client.id == client_id).first()
+    names = parse_expand(expand, CLIENT_EXPANSIONS)
+    client = apply_expand(db.query(Client), names, CLIENT_EXPANSIONS).filter(Client.id == client_id).first()
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     
@@ -103,14 +133,14 @@ def get_client(
     if current_user.role == "manager" and client.manager_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    return client
+    return compose_clients([client], names)[0]
 
 @router.put("/{client_id}", response_model=ClientResponse)
 def update_client(
     client_id: int,
     client_update: ClientUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Обновить клиента"""
     db_client = db.query(Client).filter(Client.id == client_id).first()
@@ -121,7 +151,9 @@ def update_client(
     if current_user.role == "manager" and db_client.manager_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    for key, value in client_update.dict(exclude_unset=True).items():
+    changes = client_update.dict(exclude_unset=True)
+    require_own(db, User, changes.get("manager_id"), "Manager not found")
+    for key, value in changes.items():
         setattr(db_client, key, value)
     
     db.commit()
@@ -132,7 +164,7 @@ def update_client(
 def delete_client(
     client_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Удалить клиента"""
     db_client = db.query(Client).filter(Client.id == client_id).first()
@@ -1,103 +1,33 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
-from datetime import datetime, timedelta
-from typing import List, Dict
+from sqlalchemy import extract
+from typing import List, Dict, Optional
 
-from app.database import get_db
+from app.database import get_read_db
+from app.profiling import ProfiledRoute
 from app.auth import get_current_user
-from app.models.user import User
-from app.models.client import Client
-from app.models.deal import Deal, DealStage
-from app.models.task import Task
+from app.user_cache import UserPrincipal
+from app.etag import conditional
 from app.models.activity import Activity
+from app.models.rollup import stage_totals
+from app.reference_cache import reference_cache
+from app.services.dashboard import DashboardAggregator
 
-router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
+router = APIRouter(prefix="/api/dashboard", tags=["dashboard"], route_class=ProfiledRoute)
 
-@router.get("/stats")
+@router.get("/stats", dependencies=[Depends(conditional("deals", "clients", "tasks"))])
 def get_dashboard_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Основная статистика для Dashboard"""
-    
-    # Базовые запросы
-    deals_query = db.query(Deal)
-    clients_query = db.query(Client)
-    tasks_query = db.query(Task)
-    
-    # Менеджеры видят только свои данные
-    if current_user.role == "manager":
-        deals_query = deals_query.filter(Deal.manager_id == current_user.id)
-        clients_query = clients_query.filter(Client.manager_id == current_user.id)
-        tasks_query = tasks_query.filter(Task.assignee_id == current_user.id)
-    
-    # Сделки
-    total_deals = deals_query.count()
-    open_deals = deals_query.filter(Deal.status == "open").count()
-    won_deals = deals_query.filter(Deal.status == "won").count()
-    lost_deals = deals_query.filter(Deal.status == "lost").count()
-    
-    # Выручка
-    total_revenue = db.query(func.sum(Deal.amount)).filter(
-        Deal.status == "won"
-    )
-    if current_user.role == "manager":
-        total_revenue = total_revenue.filter(Deal.manager_id == current_user.id)
-    total_revenue = total_revenue.scalar() or 0
-    
-    # Выручка за текущий месяц
-    current_month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    month_revenue_query = db.query(func.sum(Deal.amount)).filter(
-        Deal.status == "won",
-        Deal.closed_at >= current_month_start
-    )
-    if current_user.role == "manager":
-        month_revenue_query = month_revenue_query.filter(Deal.manager_id == current_user.id)
-    month_revenue = month_revenue_query.scalar() or 0
-    
-    # Клиенты
-    total_clients = clients_query.count()
-    leads_count = clients_query.filter(Client.status == "lead").count()
-    clients_count = clients_query.filter(Client.status == "client").count()
-    
-    # Задачи
-    total_tasks = tasks_query.count()
-    pending_tasks = tasks_query.filter(Task.status == "pending").count()
-    completed_tasks = tasks_query.filter(Task.status == "completed").count()
-    
-    # Конверсия
-    conversion_rate = round((won_deals / total_deals * 100) if total_deals > 0 else 0, 1)
-    
-    return {
-        "deals": {
-            "total": total_deals,
-            "open": open_deals,
-            "won": won_deals,
-            "lost": lost_deals,
-        },
-        "revenue": {
-            "total": float(total_revenue),
-            "month": float(month_revenue),
-        },
-        "clients": {
-            "total": total_clients,
-            "leads": leads_count,
-            "clients": clients_count,
-        },
-        "tasks": {
-            "total": total_tasks,
-            "pending": pending_tasks,
-            "completed": completed_tasks,
-        },
-        "conversion_rate": conversion_rate,
-    }
+    return DashboardAggregator(db, current_user).stats()
 
-@router.get("/recent-activities")
+@router.get("/recent-activities", dependencies=[Depends(conditional("activities"))])
 def get_recent_activities(
     limit: int = 10,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Последние активности"""
     query = db.query(Activity)
@@ -105,7 +35,7 @@ def get_recent_activities(
     if current_user.role == "manager":
         query = query.filter(Activity.user_id == current_user.id)
     
-    activities = query.order_by(Activity.created_at.desc()).limit(limit).all()
+    activities = query.order_by(Activity.created_at.desc(), Activity.id.desc()).limit(limit).all()
     
     return [{
         "id": a.id,
@@ -118,60 +48,47 @@ def get_recent_activities(
         "client_id": a.client_id,
     } for a in activities]
 
-@router.get("/sales-chart")
+@router.get("/sales-chart", dependencies=[Depends(conditional("deals"))])
 def get_sales_chart(
     days: int = 30,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    bucket: str = Query("day", pattern="^(day|week|month|quarter)$"),
+    status: str = Query("won", pattern="^(won|lost)$"),
+    pipeline_id: Optional[int] = None,
+    breakdown: Optional[str] = Query(None, pattern="^(pipeline|stage|manager|currency)$"),
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
-    """Данные для графика продаж"""
-    
-    start_date = datetime.now() - timedelta(days=days)
-    
-    query = db.query(
-        func.date(Deal.closed_at).label('date'),
-        func.count(Deal.id).label('count'),
-        func.sum(Deal.amount).label('amount')
-    ).filter(
-        Deal.status == "won",
-        Deal.closed_at >= start_date
-    ).group_by(func.date(Deal.closed_at))
-    
-    if current_user.role == "manager":
-        query = query.filter(Deal.manager_id == current_user.id)
-    
-    results = query.all()
-    
-    return [{
-        "date": r.date.isoformat() if r.date else None,
-        "count": r.count,
-        "amount": float(r.amount) if r.amount else 0
-    } for r in results]
+    """Данные для графика продаж
 
-@router.get("/pipeline-stats")
+    Строится по дневным итогам deal_daily_facts; bucket укрупняет
+    точки до недель, месяцев или кварталов, breakdown - разрез
+    по воронке, стадии, менеджеру или валюте.
+    """
+    return DashboardAggregator(db, current_user).sales_chart(
+        days=days,
+        bucket=bucket,
+        status=status,
+        pipeline_id=pipeline_id,
+        breakdown=breakdown,
+    )
+
+@router.get("/pipeline-stats", dependencies=[Depends(conditional("deals", "deal_stages", "pipelines"))])
 def get_pipeline_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Статистика по стадиям воронки"""
     
     # Получаем все стадии
-    stages = db.query(DealStage).order_by(DealStage.sort_order).all()
+    stages = reference_cache.get(db).ordered_stages
+    
+    # Итоги берём из stage_rollups, не загружая сделки
+    manager_id = current_user.id if current_user.role == "manager" else None
+    totals = stage_totals(db, manager_id=manager_id)
     
     result = []
     for stage in stages:
-        query = db.query(Deal).filter(
-            Deal.stage_id == stage.id,
-            Deal.status == "open"
-        )
-        
-        if current_user.role == "manager":
-            query = query.filter(Deal.manager_id == current_user.id)
-        
-        deals = query.all()
-        count = len(deals)
-        amount = sum(deal.amount for deal in deals)
-        
+        count, amount = totals.get(stage.id, (0, 0.0))
         result.append({
             "stage_id": stage.id,
             "stage_name": stage.name,
@@ -1,22 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, update
 from typing import List, Optional
 from datetime import datetime
+import asyncio
+import json
 
-from app.database import get_db
-from app.auth import get_current_user
-from app.models.user import User
-from app.models.deal import Deal, DealStage, Pipeline
+from app.database import get_db, get_read_db
+from app.profiling import ProfiledRoute
+from app.auth import get_current_user, get_stream_user
+from app.user_cache import UserPrincipal
+from app.etag import conditional
+from app.models.deal import Deal
 from app.models.client import Client
-from app.models.activity import Activity
-from app.schemas.deal import DealCreate, DealUpdate, DealResponse, DealMove
+from app.models.user import User
+from app.activity_sink import activity_sink
+from app import board_events
+from app.board_events import board_broker, deal_event
+from app.config import settings
+from app.reference_cache import reference_cache
+from app.tenancy import require_own
+from app.fast_json import fast_response, schema_columns
+from app.models.rollup import stage_totals, apply_deal_rows
+from app.schemas.deal import (
+    DealCreate, DealUpdate, DealResponse, DealExpandedResponse, DealMove, DealMoveBatch, DealImportResult,
+    DealCard, StageCardsPage, BoardStage, BoardResponse
+)
+from app.pagination import encode_cursor, decode_cursor, paginate_keyset
+from app.services.expand import DEAL_EXPANSIONS, expand_tables, parse_expand, apply_expand, compose_deals
+from app.services.deal_bulk import DealImporter, export_deals, read_records
+from app.services.export import FORMATS
 
-router = APIRouter(prefix="/api/deals", tags=["deals"])
+router = APIRouter(prefix="/api/deals", tags=["deals"], route_class=ProfiledRoute)
 
 # ================== CRUD ==================
 
-@router.get("/", response_model=List[DealResponse])
+@router.get(
+    "/", response_model=List[DealExpandedResponse], response_model_exclude_unset=True,
+    dependencies=[Depends(conditional("deals", expand=expand_tables(DEAL_EXPANSIONS)))]
+)
 def list_deals(
     pipeline_id: Optional[int] = None,
     stage_id: Optional[int] = None,
@@ -24,11 +47,23 @@ def list_deals(
     manager_id: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    expand: Optional[str] = None,
+    fast: bool = False,
+    response: Response = None,
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
-    """Список сделок с фильтрами"""
-    query = db.query(Deal)
+    """Список сделок с фильтрами
+
+    Постраничный обход: передайте cursor из заголовка X-Next-Cursor
+    предыдущего ответа. Заголовка нет - это последняя страница.
+    expand=client,stage,pipeline,tasks,activities - вложить связанные
+    объекты (загружаются фиксированным числом запросов).
+    fast=true - только колонки DealResponse без валидации строк (без expand).
+    """
+    names = parse_expand(expand, DEAL_EXPANSIONS)
+    query = apply_expand(db.query(Deal), names, DEAL_EXPANSIONS)
     
     # Фильтры
     if pipeline_id:
@@ -44,14 +79,191 @@ def list_deals(
     if current_user.role == "manager":
         query = query.filter(Deal.manager_id == current_user.id)
     
-    deals = query.order_by(Deal.created_at.desc()).offset(skip).limit(limit).all()
-    return deals
+    if fast and not names:
+        query = query.with_entities(*schema_columns(Deal, DealResponse))
+    
+    deals, next_cursor = paginate_keyset(query, Deal.created_at, Deal.id, limit, cursor, skip)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if fast and not names:
+        return fast_response(deals, DealResponse, response)
+    return compose_deals(deals, names)
+
+# ================== BULK ==================
+
+@router.post("/bulk/import", response_model=DealImportResult)
+def import_deals(
+    file: UploadFile = File(...),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Массовый импорт сделок из CSV или NDJSON
+
+    Строки проверяются и вставляются чанками; ошибочные строки
+    пропускаются и перечисляются в ответе.
+    """
+    return DealImporter(db, current_user).run(read_records(file.file, format))
+
+@router.get("/bulk/export")
+def export_deals_file(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    pipeline_id: Optional[int] = None,
+    status: Optional[str] = None,
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Потоковая выгрузка сделок в CSV или NDJSON"""
+    return StreamingResponse(
+        export_deals(current_user, format, pipeline_id, status),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="deals.{format}"'}
+    )
+
+# ================== KANBAN BOARD ==================
+
+# IMPORTANT: /board выше /{deal_id}, иначе путь перехватит get_deal
+
+# expand=client на доске - имя клиента в карточках
+BOARD_EXPAND = {"client": "clients"}
+
+def _stage_cards(
+    db: Session,
+    stage_id: int,
+    manager_id: Optional[int],
+    limit: int,
+    before_id: Optional[int] = None,
+    with_client: bool = False
+) -> StageCardsPage:
+    """Следующие limit карточек стадии (id desc) и курсор продолжения"""
+    columns = [Deal.id, Deal.title, Deal.amount, Deal.client_id, Deal.manager_id]
+    if with_client:
+        columns.append(Client.name.label("client_name"))
+    query = db.query(*columns).filter(
+        Deal.stage_id == stage_id,
+        Deal.status == "open"
+    )
+    if manager_id is not None:
+        query = query.filter(Deal.manager_id == manager_id)
+    if before_id is not None:
+        query = query.filter(Deal.id < before_id)
+    if with_client:
+        # Имя клиента тем же запросом, без отдельного вызова на карточку
+        query = query.join(Client, Client.id == Deal.client_id)
+    
+    # Берём на одну строку больше, чтобы понять, есть ли продолжение
+    rows = query.order_by(Deal.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    return StageCardsPage(
+        stage_id=stage_id,
+        deals=[DealCard(
+            id=row.id,
+            title=row.title,
+            amount=row.amount or 0,
+            client_id=row.client_id,
+            client_name=row.client_name if with_client else None,
+            manager_id=row.manager_id,
+        ) for row in rows],
+        next_cursor=encode_cursor(rows[-1].id) if has_more else None,
+    )
+
+@router.get(
+    "/board", response_model=BoardResponse,
+    dependencies=[Depends(conditional("deals", "deal_stages", expand=BOARD_EXPAND))]
+)
+def get_board(
+    pipeline_id: int,
+    per_stage: int = Query(20, ge=1, le=200),
+    expand: Optional[str] = Query(None, pattern="^client$"),
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Kanban доска: стадии с итогами и первые per_stage карточек в каждой
+
+    expand=client добавляет в карточки имя клиента.
+    """
+    stages = reference_cache.get(db).stages_of(pipeline_id)
+    
+    # Менеджеры видят только свои
+    manager_id = current_user.id if current_user.role == "manager" else None
+    totals = stage_totals(db, pipeline_id=pipeline_id, manager_id=manager_id)
+    
+    result = []
+    for stage in stages:
+        deals_count, total_amount = totals.get(stage.id, (0, 0.0))
+        page = _stage_cards(db, stage.id, manager_id, per_stage, with_client=expand == "client")
+        result.append(BoardStage(
+            stage_id=stage.id,
+            stage_name=stage.name,
+            color=stage.color,
+            sort_order=stage.sort_order,
+            deals_count=deals_count,
+            total_amount=total_amount,
+            deals=page.deals,
+            next_cursor=page.next_cursor,
+        ))
+    
+    return BoardResponse(pipeline_id=pipeline_id, stages=result)
+
+@router.get(
+    "/board/stages/{stage_id}", response_model=StageCardsPage,
+    dependencies=[Depends(conditional("deals", "deal_stages", expand=BOARD_EXPAND))]
+)
+def get_stage_cards(
+    stage_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=200),
+    expand: Optional[str] = Query(None, pattern="^client$"),
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Подгрузка карточек стадии при прокрутке колонки"""
+    if stage_id not in reference_cache.get(db).stages:
+        raise HTTPException(status_code=404, detail="Stage not found")
+    
+    before_id = int(decode_cursor(cursor, 1)[0]) if cursor else None
+    manager_id = current_user.id if current_user.role == "manager" else None
+    return _stage_cards(db, stage_id, manager_id, limit, before_id, with_client=expand == "client")
+
+@router.get("/board/events")
+async def board_events_stream(
+    pipeline_id: int,
+    current_user: UserPrincipal = Depends(get_stream_user)
+):
+    """Поток изменений доски (Server-Sent Events)
+
+    Каждое событие - дельта по одной сделке (created, updated, moved,
+    deleted) или reload, когда доску проще перечитать целиком. Менеджер
+    получает события только по своим сделкам.
+    """
+    subscriber = board_broker.subscribe(pipeline_id, current_user)
+
+    async def stream():
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), settings.BOARD_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    # Keep-alive, чтобы прокси не закрывали соединение
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            board_broker.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.post("/", response_model=DealResponse)
 def create_deal(
     deal: DealCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Создать сделку"""
     # Проверяем что клиент существует
@@ -59,26 +271,26 @@ def create_deal(
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     
-    # Проверяем что воронка и стадия существуют
-    pipeline = db.query(Pipeline).filter(Pipeline.id == deal.pipeline_id).first()
-    if not pipeline:
+    # Проверяем что воронка и стадия существуют (справочники - из кэша)
+    refs = reference_cache.get(db)
+    if deal.pipeline_id not in refs.pipelines:
         raise HTTPException(status_code=404, detail="Pipeline not found")
     
-    stage = db.query(DealStage).filter(DealStage.id == deal.stage_id).first()
-    if not stage:
+    if deal.stage_id not in refs.stages:
         raise HTTPException(status_code=404, detail="Stage not found")
     
     # Если manager_id не указан, назначаем текущего
     if not deal.manager_id:
         deal.manager_id = current_user.id
+    require_own(db, User, deal.manager_id, "Manager not found")
     
     db_deal = Deal(**deal.dict())
     db.add(db_deal)
-    db.commit()
-    db.refresh(db_deal)
+    db.flush()
     
-    # Создаем активность
-    activity = Activity(
+    # Активность - в той же транзакции (или в фоновую очередь), без второго commit
+    activity_sink.record(
+        db,
         type="note",
         deal_id=db_deal.id,
         client_id=deal.client_id,
@@ -86,18 +298,23 @@ def create_deal(
         subject="Сделка создана",
         content=f"Создана новая сделка: {db_deal.title}"
     )
-    db.add(activity)
     db.commit()
+    db.refresh(db_deal)
     
     return db_deal
 
-@router.get("/{deal_id}", response_model=DealResponse)
+@router.get(
+    "/{deal_id}", response_model=DealExpandedResponse, response_model_exclude_unset=True,
+    dependencies=[Depends(conditional("deals", expand=expand_tables(DEAL_EXPANSIONS)))]
+)
 def get_deal(
     deal_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    expand: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
-    deal = db.query(Deal).filter(Deal.id == deal_id).first()
+    names = parse_expand(expand, DEAL_EXPANSIONS)
+    deal = apply_expand(db.query(Deal), names, DEAL_EXPANSIONS).filter(Deal.id == deal_id).first()
     if not deal:
         raise HTTPException(status_code=404, detail="Deal not found")
     
@@ -105,14 +322,14 @@ def get_deal(
     if current_user.role == "manager" and deal.manager_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    return deal
+    return compose_deals([deal], names)[0]
 
 @router.put("/{deal_id}", response_model=DealResponse)
 def update_deal(
     deal_id: int,
     deal_update: DealUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Обновить сделку"""
     db_deal = db.query(Deal).filter(Deal.id == deal_id).first()
@@ -123,7 +340,11 @@ def update_deal(
     if current_user.role == "manager" and db_deal.manager_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    for key, value in deal_update.dict(exclude_unset=True).items():
+    changes = deal_update.dict(exclude_unset=True)
+    if changes.get("stage_id") is not None and changes["stage_id"] not in reference_cache.get(db).stages:
+        raise HTTPException(status_code=404, detail="Stage not found")
+    require_own(db, User, changes.get("manager_id"), "Manager not found")
+    for key, value in changes.items():
         setattr(db_deal, key, value)
     
     db.commit()
@@ -134,7 +355,7 @@ def update_deal(
 def delete_deal(
     deal_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Удалить сделку (только админ/менеджер сделки)"""
     db_deal = db.query(Deal).filter(Deal.id == deal_id).first()
@@ -155,7 +376,7 @@ def move_deal(
     deal_id: int,
     move: DealMove,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Переместить сделку в другую стадию (Kanban drag&drop)"""
     db_deal = db.query(Deal).filter(Deal.id == deal_id).first()
@@ -167,11 +388,12 @@ def move_deal(
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
     # Проверяем новую стадию
-    new_stage = db.query(DealStage).filter(DealStage.id == move.stage_id).first()
+    refs = reference_cache.get(db)
+    new_stage = refs.stages.get(move.stage_id)
     if not new_stage:
         raise HTTPException(status_code=404, detail="Stage not found")
     
-    old_stage = db.query(DealStage).filter(DealStage.id == db_deal.stage_id).first()
+    old_stage = refs.stages.get(db_deal.stage_id)
     
     # Обновляем стадию
     db_deal.stage_id = move.stage_id
@@ -186,10 +408,9 @@ def move_deal(
             if move.reason:
                 db_deal.lost_reason = move.reason
     
-    db.commit()
-    
-    # Создаем активность
-    activity = Activity(
+    # Активность - в той же транзакции (или в фоновую очередь), без второго commit
+    activity_sink.record(
+        db,
         type="note",
         deal_id=db_deal.id,
         client_id=db_deal.client_id,
@@ -197,53 +418,139 @@ def move_deal(
         subject="Сделка перемещена",
         content=f"Стадия изменена: {old_stage.name} → {new_stage.name}"
     )
-    db.add(activity)
     db.commit()
     
     db.refresh(db_deal)
     return db_deal
 
+@router.post("/move-batch", response_model=List[DealResponse])
+def move_deals_batch(
+    batch: DealMoveBatch,
+    db: Session = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Переместить несколько сделок одной транзакцией (мультивыбор на Kanban)
+
+    Либо перемещаются все сделки, либо ни одна.
+    """
+    moves = {move.deal_id: move for move in batch.moves}
+    if len(moves) != len(batch.moves):
+        raise HTTPException(status_code=400, detail="Duplicate deal_id in batch")
+    
+    deals = db.query(
+        Deal.id, Deal.title, Deal.client_id, Deal.pipeline_id, Deal.stage_id,
+        Deal.manager_id, Deal.status, Deal.amount, Deal.currency, Deal.closed_at
+    ).filter(Deal.id.in_(moves)).all()
+    if len(deals) != len(moves):
+        raise HTTPException(status_code=404, detail="Deal not found")
+    
+    # Менеджеры могут перемещать только свои сделки
+    if current_user.role == "manager" and any(d.manager_id != current_user.id for d in deals):
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    # Старые и новые стадии - из кэша справочников
+    stages = reference_cache.get(db).stages
+    if any(move.stage_id not in stages for move in moves.values()):
+        raise HTTPException(status_code=404, detail="Stage not found")
+    
+    now = datetime.utcnow()
+    old_rows, new_rows, updates, activities = [], [], [], []
+    for deal in deals:
+        move = moves[deal.id]
+        new_stage = stages[move.stage_id]
+        values = {"id": deal.id, "stage_id": new_stage.id, "status": deal.status}
+        
+        # Если это конечная стадия - закрываем сделку
+        if new_stage.is_final:
+            values["closed_at"] = now
+            if new_stage.is_won:
+                values["status"] = "won"
+            else:
+                values["status"] = "lost"
+                if move.reason:
+                    values["lost_reason"] = move.reason
+        updates.append(values)
+        
+        old_rows.append(deal._asdict())
+        new_rows.append({
+            **deal._asdict(),
+            "stage_id": new_stage.id,
+            "status": values["status"],
+            "closed_at": values.get("closed_at", deal.closed_at),
+        })
+        
+        old_stage = stages.get(deal.stage_id)
+        activities.append({
+            "type": "note",
+            "deal_id": deal.id,
+            "client_id": deal.client_id,
+            "user_id": current_user.id,
+            "subject": "Сделка перемещена",
+            "content": f"Стадия изменена: {old_stage.name if old_stage else '—'} → {new_stage.name}",
+        })
+    
+    # Массовое обновление по первичному ключу: события ORM не срабатывают,
+    # поэтому итоги (стадии, дневные факты) переносим явно
+    # Разные наборы колонок (closed_at, lost_reason) - разные executemany
+    for keys in {tuple(sorted(values)) for values in updates}:
+        db.execute(update(Deal), [values for values in updates if tuple(sorted(values)) == keys])
+    connection = db.connection()
+    apply_deal_rows(connection, old_rows, sign=-1)
+    apply_deal_rows(connection, new_rows)
+    activity_sink.record_many(db, activities)
+    board_events.collect(db, [
+        deal_event("moved", row, from_stage_id=old["stage_id"])
+        for old, row in zip(old_rows, new_rows)
+    ])
+    db.commit()
+    
+    return db.query(Deal).filter(Deal.id.in_(moves)).order_by(Deal.id).all()
+
 # ================== СТАТИСТИКА ==================
 
-@router.get("/stats/pipeline")
+@router.get("/stats/pipeline", dependencies=[Depends(conditional("deals", "deal_stages"))])
 def get_pipeline_stats(
     pipeline_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Статистика по воронке (для Kanban)"""
     # Получаем все стадии
-    stages = db.query(DealStage).filter(DealStage.pipeline_id == pipeline_id).order_by(DealStage.sort_order).all()
+    stages = reference_cache.get(db).stages_of(pipeline_id)
+    
+    # Менеджеры видят только свои
+    manager_id = current_user.id if current_user.role == "manager" else None
+    
+    # Количество и сумма - из stage_rollups
+    totals = stage_totals(db, pipeline_id=pipeline_id, manager_id=manager_id)
+    
+    # Карточки всех стадий одним запросом, только нужные колонки
+    cards_query = db.query(Deal.id, Deal.title, Deal.amount, Deal.client_id, Deal.stage_id).filter(
+        Deal.pipeline_id == pipeline_id,
+        Deal.status == "open"
+    )
+    if manager_id is not None:
+        cards_query = cards_query.filter(Deal.manager_id == manager_id)
+    
+    cards = {}
+    for deal in cards_query.order_by(Deal.id).all():
+        cards.setdefault(deal.stage_id, []).append({
+            "id": deal.id,
+            "title": deal.title,
+            "amount": deal.amount,
+            "client_id": deal.client_id,
+        })
     
     result = []
     for stage in stages:
-        # Количество сделок в стадии
-        query = db.query(Deal).filter(
-            Deal.pipeline_id == pipeline_id,
-            Deal.stage_id == stage.id,
-            Deal.status == "open"
-        )
-        
-        # Менеджеры видят только свои
-        if current_user.role == "manager":
-            query = query.filter(Deal.manager_id == current_user.id)
-        
-        deals = query.all()
-        deals_count = len(deals)
-        total_amount = sum(deal.amount for deal in deals)
-        
+        deals_count, total_amount = totals.get(stage.id, (0, 0.0))
         result.append({
             "stage_id": stage.id,
             "stage_name": stage.name,
             "color": stage.color,
             "deals_count": deals_count,
             "total_amount": total_amount,
-            "deals": [{
-                "id": deal.id,
-                "title": deal.title,
-                "amount": deal.amount,
-                "client_id": deal.client_id,
-            } for deal in deals]
+            "deals": cards.get(stage.id, [])
         })
     
     return result
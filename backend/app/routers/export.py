@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, Path, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+
+from app.auth import get_current_user
+from app.profiling import ProfiledRoute
+from app.user_cache import UserPrincipal
+from app.services.export import FORMATS, check_export, export_rows
+
+router = APIRouter(prefix="/api/export", tags=["export"], route_class=ProfiledRoute)
+
+@router.get("/{entity}")
+def export_entity(
+    entity: str = Path(..., pattern="^(deals|clients|activities)$"),
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    gzip: bool = False,
+    pipeline_id: Optional[int] = None,
+    stage_id: Optional[int] = None,
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    deal_id: Optional[int] = None,
+    client_id: Optional[int] = None,
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Потоковая выгрузка сделок, клиентов или активностей
+
+    Менеджер выгружает только свои строки. gzip=true - сжатый файл (.gz).
+    Фильтры: deals - pipeline_id, stage_id, status; clients - status;
+    activities - type, deal_id, client_id.
+    """
+    filters = {
+        "pipeline_id": pipeline_id, "stage_id": stage_id, "status": status,
+        "type": type, "deal_id": deal_id, "client_id": client_id,
+    }
+    check_export(entity, format, filters)
+    
+    filename = f"{entity}.{format}"
+    media_type = FORMATS[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    
+    return StreamingResponse(
+        export_rows(entity, current_user, format, filters, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
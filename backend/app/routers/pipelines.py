@@ -2,35 +2,37 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
 
-from app.database import get_db
+from app.database import get_db, get_read_db
+from app.profiling import ProfiledRoute
 from app.auth import get_current_user
-from app.models.user import User
+from app.user_cache import UserPrincipal
+from app.etag import conditional
 from app.models.deal import Pipeline, DealStage
+from app.reference_cache import reference_cache
 from app.schemas.deal import (
     PipelineCreate, PipelineUpdate, PipelineResponse,
     DealStageCreate, DealStageUpdate, DealStageResponse
 )
 
-router = APIRouter(prefix="/api/pipelines", tags=["pipelines"])
+router = APIRouter(prefix="/api/pipelines", tags=["pipelines"], route_class=ProfiledRoute)
 
 # ================== PIPELINES ==================
 
-@router.get("/", response_model=List[PipelineResponse])
+@router.get("/", response_model=List[PipelineResponse], dependencies=[Depends(conditional("pipelines"))])
 def list_pipelines(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Список всех воронок"""
-    pipelines = db.query(Pipeline).filter(Pipeline.is_active == True).order_by(Pipeline.sort_order).offset(skip).limit(limit).all()
-    return pipelines
+    return reference_cache.get(db).active_pipelines[skip:skip + limit]
 
 @router.post("/", response_model=PipelineResponse)
 def create_pipeline(
     pipeline: PipelineCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Создать воронку (только админ)"""
     if current_user.role != "admin":
@@ -42,13 +44,13 @@ def create_pipeline(
     db.refresh(db_pipeline)
     return db_pipeline
 
-@router.get("/{pipeline_id}", response_model=PipelineResponse)
+@router.get("/{pipeline_id}", response_model=PipelineResponse, dependencies=[Depends(conditional("pipelines"))])
 def get_pipeline(
     pipeline_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
-    pipeline = db.query(Pipeline).filter(Pipeline.id == pipeline_id).first()
+    pipeline = reference_cache.get(db).pipelines.get(pipeline_id)
     if not pipeline:
         raise HTTPException(status_code=404, detail="Pipeline not found")
     return pipeline
@@ -58,7 +60,7 @@ def update_pipeline(
     pipeline_id: int,
     pipeline_update: PipelineUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Обновить воронку (только админ)"""
     if current_user.role != "admin":
@@ -77,30 +79,28 @@ def update_pipeline(
 
 # ================== STAGES ==================
 
-@router.get("/{pipeline_id}/stages", response_model=List[DealStageResponse])
+@router.get("/{pipeline_id}/stages", response_model=List[DealStageResponse], dependencies=[Depends(conditional("deal_stages"))])
 def list_stages(
     pipeline_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Список стадий воронки"""
-    stages = db.query(DealStage).filter(DealStage.pipeline_id == pipeline_id).order_by(DealStage.sort_order).all()
-    return stages
+    return reference_cache.get(db).stages_of(pipeline_id)
 
 @router.post("/{pipeline_id}/stages", response_model=DealStageResponse)
 def create_stage(
     pipeline_id: int,
     stage: DealStageCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Создать стадию (только админ)"""
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
     # Проверяем что воронка существует
-    pipeline = db.query(Pipeline).filter(Pipeline.id == pipeline_id).first()
-    if not pipeline:
+    if pipeline_id not in reference_cache.get(db).pipelines:
         raise HTTPException(status_code=404, detail="Pipeline not found")
     
     db_stage = DealStage(**stage.dict())
@@ -114,7 +114,7 @@ def update_stage(
     stage_id: int,
     stage_update: DealStageUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Обновить стадию (только админ)"""
     if current_user.role != "admin":
@@ -135,7 +135,7 @@ def update_stage(
 def delete_stage(
     stage_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Удалить стадию (только админ)"""
     if current_user.role != "admin":
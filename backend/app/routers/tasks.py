@@ -0,0 +1,218 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session
+from sqlalchemy import update
+from typing import List, Optional
+from datetime import date, datetime, timedelta
+
+from app.database import get_db, get_read_db
+from app.profiling import ProfiledRoute
+from app.auth import get_current_user
+from app.user_cache import UserPrincipal
+from app.etag import conditional
+from app.models.user import User
+from app.models.task import Task
+from app.models.deal import Deal
+from app.models.client import Client
+from app.tenancy import require_own
+from app.schemas.task import (
+    TaskCreate, TaskUpdate, TaskResponse,
+    TaskBulkComplete, TaskBulkReassign, TaskBulkResult
+)
+from app.pagination import paginate_keyset
+
+router = APIRouter(prefix="/api/tasks", tags=["tasks"], route_class=ProfiledRoute)
+
+# Незавершённые задачи
+OPEN_STATUSES = ("todo", "in_progress")
+
+def _visible(query, current_user: UserPrincipal):
+    # Менеджеры видят только свои задачи
+    if current_user.role == "manager":
+        query = query.filter(Task.assignee_id == current_user.id)
+    return query
+
+# IMPORTANT: Статические роуты ДОЛЖНЫ быть ВЫШЕ динамических!
+
+# ================== ОЧЕРЕДИ ==================
+
+@router.get("/my", response_model=List[TaskResponse], dependencies=[Depends(conditional("tasks"))])
+def my_tasks(
+    view: str = Query("today", pattern="^(overdue|today|week)$"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    response: Response = None,
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Мои незавершённые задачи: просроченные, на сегодня или на эту неделю
+
+    Сортировка по сроку; следующая страница - cursor из X-Next-Cursor.
+    """
+    today = date.today()
+    query = db.query(Task).filter(
+        Task.assignee_id == current_user.id,
+        Task.status.in_(OPEN_STATUSES)
+    )
+
+    if view == "overdue":
+        query = query.filter(Task.due_date < today)
+    elif view == "today":
+        query = query.filter(Task.due_date == today)
+    else:
+        week_end = today + timedelta(days=6 - today.weekday())
+        query = query.filter(Task.due_date >= today, Task.due_date <= week_end)
+
+    tasks, next_cursor = paginate_keyset(query, Task.due_date, Task.id, limit, cursor, descending=False)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return tasks
+
+# ================== BULK ==================
+
+@router.post("/bulk-complete", response_model=TaskBulkResult)
+def bulk_complete_tasks(
+    bulk: TaskBulkComplete,
+    db: Session = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Завершить несколько задач одним запросом"""
+    stmt = update(Task).where(
+        Task.id.in_(bulk.task_ids),
+        Task.status.in_(OPEN_STATUSES)
+    )
+    if current_user.role == "manager":
+        stmt = stmt.where(Task.assignee_id == current_user.id)
+
+    result = db.execute(
+        stmt.values(status="done", completed_at=datetime.utcnow()),
+        execution_options={"synchronize_session": False}
+    )
+    db.commit()
+    return TaskBulkResult(updated=result.rowcount)
+
+@router.post("/bulk-reassign", response_model=TaskBulkResult)
+def bulk_reassign_tasks(
+    bulk: TaskBulkReassign,
+    db: Session = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Передать несколько задач другому исполнителю"""
+    assignee = db.query(User.id).filter(User.id == bulk.assignee_id, User.is_active == True).first()
+    if not assignee:
+        raise HTTPException(status_code=404, detail="Assignee not found")
+
+    stmt = update(Task).where(Task.id.in_(bulk.task_ids))
+    if current_user.role == "manager":
+        stmt = stmt.where(Task.assignee_id == current_user.id)
+
+    result = db.execute(
+        stmt.values(assignee_id=bulk.assignee_id, updated_at=datetime.utcnow()),
+        execution_options={"synchronize_session": False}
+    )
+    db.commit()
+    return TaskBulkResult(updated=result.rowcount)
+
+# ================== CRUD ==================
+
+@router.get("/", response_model=List[TaskResponse], dependencies=[Depends(conditional("tasks"))])
+def list_tasks(
+    status: Optional[str] = None,
+    assignee_id: Optional[int] = None,
+    deal_id: Optional[int] = None,
+    client_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    response: Response = None,
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Список задач с фильтрами (новые сверху, курсор в X-Next-Cursor)"""
+    query = db.query(Task)
+
+    # Фильтры
+    if status:
+        query = query.filter(Task.status == status)
+    if assignee_id:
+        query = query.filter(Task.assignee_id == assignee_id)
+    if deal_id:
+        query = query.filter(Task.deal_id == deal_id)
+    if client_id:
+        query = query.filter(Task.client_id == client_id)
+
+    query = _visible(query, current_user)
+
+    tasks, next_cursor = paginate_keyset(query, Task.created_at, Task.id, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return tasks
+
+@router.post("/", response_model=TaskResponse)
+def create_task(
+    task: TaskCreate,
+    db: Session = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Создать задачу"""
+    # Если исполнитель не указан, назначаем текущего
+    if not task.assignee_id:
+        task.assignee_id = current_user.id
+    require_own(db, Deal, task.deal_id, "Deal not found")
+    require_own(db, Client, task.client_id, "Client not found")
+    require_own(db, User, task.assignee_id, "Assignee not found")
+
+    db_task = Task(**task.dict())
+    db.add(db_task)
+    db.commit()
+    db.refresh(db_task)
+    return db_task
+
+def _get_task(db: Session, task_id: int, current_user: UserPrincipal) -> Task:
+    task = db.query(Task).filter(Task.id == task_id).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if current_user.role == "manager" and task.assignee_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return task
+
+@router.get("/{task_id}", response_model=TaskResponse, dependencies=[Depends(conditional("tasks"))])
+def get_task(
+    task_id: int,
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    return _get_task(db, task_id, current_user)
+
+@router.put("/{task_id}", response_model=TaskResponse)
+def update_task(
+    task_id: int,
+    task_update: TaskUpdate,
+    db: Session = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Обновить задачу"""
+    db_task = _get_task(db, task_id, current_user)
+
+    changes = task_update.dict(exclude_unset=True)
+    require_own(db, User, changes.get("assignee_id"), "Assignee not found")
+    for key, value in changes.items():
+        setattr(db_task, key, value)
+
+    # Отмечаем время завершения
+    if "status" in changes:
+        db_task.completed_at = datetime.utcnow() if changes["status"] == "done" else None
+
+    db.commit()
+    db.refresh(db_task)
+    return db_task
+
+@router.delete("/{task_id}")
+def delete_task(
+    task_id: int,
+    db: Session = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Удалить задачу"""
+    db_task = _get_task(db, task_id, current_user)
+    db.delete(db_task)
+    db.commit()
+    return {"message": "Task deleted"}
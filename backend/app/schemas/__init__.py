@@ -1,19 +1,28 @@
-from .user import UserCreate, UserUpdate, UserResponse, Token
-from .client import ClientCreate, ClientUpdate, ClientResponse
+from .user import UserCreate, UserUpdate, UserResponse, Token, RefreshRequest, LogoutRequest
+from .client import ClientCreate, ClientUpdate, ClientResponse, ClientBrief, ContactResponse
 from .deal import (
     PipelineCreate, PipelineUpdate, PipelineResponse,
     DealStageCreate, DealStageUpdate, DealStageResponse,
-    DealCreate, DealUpdate, DealResponse, DealMove
+    DealCreate, DealUpdate, DealResponse, DealMove,
+    DealMoveItem, DealMoveBatch,
+    DealImportRow, DealImportResult,
+    PipelineBrief, DealStageBrief, DealExpandedResponse, ClientExpandedResponse,
+    DealCard, StageCardsPage, BoardStage, BoardResponse
 )
-from .task import TaskCreate, TaskUpdate, TaskResponse
+from .task import TaskCreate, TaskUpdate, TaskResponse, TaskBulkComplete, TaskBulkReassign, TaskBulkResult
 from .activity import ActivityCreate, ActivityResponse
 
 __all__ = [
-    'UserCreate', 'UserUpdate', 'UserResponse', 'Token',
-    'ClientCreate', 'ClientUpdate', 'ClientResponse',
+    'UserCreate', 'UserUpdate', 'UserResponse', 'Token', 'RefreshRequest', 'LogoutRequest',
+    'ClientCreate', 'ClientUpdate', 'ClientResponse', 'ClientBrief', 'ContactResponse',
     'PipelineCreate', 'PipelineUpdate', 'PipelineResponse',
     'DealStageCreate', 'DealStageUpdate', 'DealStageResponse',
     'DealCreate', 'DealUpdate', 'DealResponse', 'DealMove',
+    'DealMoveItem', 'DealMoveBatch',
+    'DealImportRow', 'DealImportResult',
+    'PipelineBrief', 'DealStageBrief', 'DealExpandedResponse', 'ClientExpandedResponse',
+    'DealCard', 'StageCardsPage', 'BoardStage', 'BoardResponse',
     'TaskCreate', 'TaskUpdate', 'TaskResponse',
+    'TaskBulkComplete', 'TaskBulkReassign', 'TaskBulkResult',
     'ActivityCreate', 'ActivityResponse',
 ]
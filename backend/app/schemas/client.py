@@ -37,3 +37,27 @@ class ClientResponse(ClientBase):
     
     class Config:
         from_attributes = True
+
+class ClientBrief(BaseModel):
+    """Клиент внутри развёрнутой сделки (?expand=client)"""
+    id: int
+    name: str
+    inn: Optional[str] = None
+    status: str
+    
+    class Config:
+        from_attributes = True
+
+class ContactResponse(BaseModel):
+    id: int
+    client_id: int
+    name: str
+    position: Optional[str] = None
+    phone: str
+    email: Optional[str] = None
+    telegram: Optional[str] = None
+    whatsapp: Optional[str] = None
+    is_primary: bool = False
+    
+    class Config:
+        from_attributes = True
@@ -1,7 +1,11 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional, List
 
+from .client import ClientBrief, ClientResponse, ContactResponse
+from .task import TaskResponse
+from .activity import ActivityResponse
+
 # Pipeline Schemas
 class PipelineBase(BaseModel):
     name: str
@@ -83,11 +87,30 @@ class DealUpdate(BaseModel):
     status: Optional[str] = None
     lost_reason: Optional[str] = None
 
+class DealImportRow(DealCreate):
+    """Строка массового импорта: можно перенести статус и даты из старой CRM"""
+    status: str = "open"
+    closed_at: Optional[datetime] = None
+    lost_reason: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+class DealImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[str]
+
 class DealMove(BaseModel):
     """Перемещение сделки между стадиями"""
     stage_id: int
     reason: Optional[str] = None  # Причина перемещения/закрытия
 
+class DealMoveItem(DealMove):
+    deal_id: int
+
+class DealMoveBatch(BaseModel):
+    """Перемещение нескольких сделок одной транзакцией"""
+    moves: List[DealMoveItem] = Field(..., min_length=1, max_length=500)
+
 class DealResponse(DealBase):
     id: int
     client_id: int
@@ -103,3 +126,63 @@ class DealResponse(DealBase):
     
     class Config:
         from_attributes = True
+
+# Expanded Deal Schemas (?expand=...)
+class PipelineBrief(BaseModel):
+    id: int
+    name: str
+    
+    class Config:
+        from_attributes = True
+
+class DealStageBrief(BaseModel):
+    id: int
+    name: str
+    color: str
+    sort_order: int
+    is_final: bool
+    is_won: bool
+    
+    class Config:
+        from_attributes = True
+
+class DealExpandedResponse(DealResponse):
+    """Сделка со связанными объектами; поля есть только если запрошены в expand"""
+    client: Optional[ClientBrief] = None
+    stage: Optional[DealStageBrief] = None
+    pipeline: Optional[PipelineBrief] = None
+    tasks: Optional[List[TaskResponse]] = None
+    activities: Optional[List[ActivityResponse]] = None
+
+class ClientExpandedResponse(ClientResponse):
+    """Клиент со связанными объектами; поля есть только если запрошены в expand"""
+    contacts: Optional[List[ContactResponse]] = None
+    deals: Optional[List[DealResponse]] = None
+
+# Kanban Board Schemas
+class DealCard(BaseModel):
+    """Карточка сделки на Kanban доске"""
+    id: int
+    title: str
+    amount: float = 0
+    client_id: int
+    client_name: Optional[str] = None  # при expand=client
+    manager_id: Optional[int] = None
+
+class StageCardsPage(BaseModel):
+    """Порция карточек одной стадии"""
+    stage_id: int
+    deals: List[DealCard]
+    next_cursor: Optional[str] = None
+
+class BoardStage(StageCardsPage):
+    """Колонка доски: заголовок стадии с итогами и первые карточки"""
+    stage_name: str
+    color: str
+    sort_order: int
+    deals_count: int
+    total_amount: float
+
+class BoardResponse(BaseModel):
+    pipeline_id: int
+    stages: List[BoardStage]
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime, date
-from typing import Optional
+from typing import Optional, List
 
 class TaskBase(BaseModel):
     title: str
@@ -33,3 +33,12 @@ class TaskResponse(TaskBase):
     
     class Config:
         from_attributes = True
+
+class TaskBulkComplete(BaseModel):
+    task_ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+class TaskBulkReassign(TaskBulkComplete):
+    assignee_id: int
+
+class TaskBulkResult(BaseModel):
+    updated: int
@@ -32,3 +32,15 @@ class UserResponse(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None  # секунд жизни access токена
+
+class StreamTicket(BaseModel):
+    ticket: str
+    expires_in: int  # секунд на открытие потока
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
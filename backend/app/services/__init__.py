@@ -0,0 +1,8 @@
+from .dashboard import DashboardAggregator
+from .client_search import ensure_client_search_index, search_clients
+
+__all__ = [
+    'DashboardAggregator',
+    'ensure_client_search_index',
+    'search_clients',
+]
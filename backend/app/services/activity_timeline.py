@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.models.activity import Activity, ActivityArchive
+from app.pagination import encode_cursor, decode_cursor
+
+ARCHIVE_BATCH_SIZE = 5000
+
+_COLUMNS = [
+    "id", "tenant_id", "type", "deal_id", "client_id", "user_id", "subject",
+    "content", "duration", "activity_date", "created_at",
+]
+
+def _page(db: Session, model, filters: list, limit: int, after: Optional[tuple]) -> list:
+    query = db.query(model).filter(*filters)
+    if after is not None:
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(*after))
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+
+def timeline(
+    db: Session,
+    deal_id: Optional[int] = None,
+    client_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    include_archive: bool = False
+) -> Tuple[list, Optional[str]]:
+    """Лента активностей (новые сверху) с курсором следующей страницы
+
+    Без include_archive читается только горячая таблица activities.
+    С ним - обе таблицы с тем же курсором, результаты сливаются.
+    """
+    after = None
+    if cursor:
+        created_at, last_id = decode_cursor(cursor, 2)
+        try:
+            after = (datetime.fromisoformat(created_at), int(last_id))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    models = [Activity, ActivityArchive] if include_archive else [Activity]
+    rows = []
+    for model in models:
+        filters = []
+        if deal_id is not None:
+            filters.append(model.deal_id == deal_id)
+        if client_id is not None:
+            filters.append(model.client_id == client_id)
+        if user_id is not None:
+            filters.append(model.user_id == user_id)
+        rows.extend(_page(db, model, filters, limit, after))
+
+    rows.sort(key=lambda row: (row.created_at, row.id), reverse=True)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at.isoformat(), rows[-1].id)
+
+def archive_activities(db: Session, older_than_days: int) -> int:
+    """Перенести активности старше N дней в activities_archive пачками"""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    source = [getattr(Activity, name) for name in _COLUMNS]
+    moved = 0
+    while True:
+        ids: List[int] = [row[0] for row in db.execute(
+            select(Activity.id).where(Activity.created_at < cutoff).order_by(Activity.id).limit(ARCHIVE_BATCH_SIZE)
+        ).all()]
+        if not ids:
+            break
+        db.execute(insert(ActivityArchive).from_select(_COLUMNS, select(*source).where(Activity.id.in_(ids))))
+        db.execute(delete(Activity).where(Activity.id.in_(ids)))
+        db.commit()
+        moved += len(ids)
+    return moved
@@ -0,0 +1,195 @@
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import Float, Integer, column, event, func, literal_column, or_, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Query, Session
+
+from app.models.client import Client
+
+# Полнотекстовый поиск клиентов:
+#   postgresql - GIN индекс по to_tsvector(name, email) + префиксные
+#                индексы по ИНН и цифрам телефона
+#   sqlite     - виртуальная таблица FTS5, синхронизируется событиями сессии
+#   прочее     - ILIKE по name, email, inn (как раньше)
+#
+# Бэкенд определяется по движку сессии при первом обращении: слушатель
+# сессии работает и в скриптах, которые не вызывали
+# ensure_client_search_index (generate_data.py, create_tenant.py).
+
+# Движок -> "postgresql" / "fts5" / "like"
+_backends: Dict[Engine, str] = {}
+
+_PG_DOCUMENT = "to_tsvector('simple', coalesce(clients.name, '') || ' ' || coalesce(clients.email, ''))"
+_PG_PHONE = "regexp_replace(coalesce(clients.phone, ''), '[^0-9]', '', 'g')"
+
+_PG_INDEXES = [
+    f"CREATE INDEX IF NOT EXISTS ix_clients_search_tsv ON clients USING gin ({_PG_DOCUMENT})",
+    "CREATE INDEX IF NOT EXISTS ix_clients_inn_prefix ON clients (inn text_pattern_ops)",
+    f"CREATE INDEX IF NOT EXISTS ix_clients_phone_prefix ON clients (({_PG_PHONE}) text_pattern_ops)",
+]
+
+_FTS_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS clients_fts USING fts5(
+    name, email, inn, phone,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3 4'
+)
+"""
+
+def _tokens(term: str) -> List[str]:
+    return re.findall(r"\w+", term.lower())
+
+def _digits(value: Optional[str]) -> str:
+    return re.sub(r"\D", "", value or "")
+
+def _phone_prefixes(digits: str) -> List[str]:
+    """Варианты префикса телефона: как набрано, через 7 или 8, без кода страны"""
+    if digits[0] in "78":
+        return [digits, ("8" if digits[0] == "7" else "7") + digits[1:]]
+    return [digits, "7" + digits, "8" + digits]
+
+def _is_numeric(term: str) -> bool:
+    """Строка похожа на ИНН или телефон: только цифры и разделители"""
+    return bool(_digits(term)) and not re.search(r"[^\d\s()+\-.]", term)
+
+def create_pg_search_indexes(conn) -> None:
+    """Индексы поиска PostgreSQL в текущем search_path (в том числе в схеме компании)"""
+    for ddl in _PG_INDEXES:
+        conn.execute(text(ddl))
+
+def ensure_client_search_index(engine: Engine) -> str:
+    """Создать поисковый индекс для текущей СУБД; вернуть тип бэкенда"""
+    dialect = engine.dialect.name
+
+    if dialect == "postgresql":
+        with engine.begin() as conn:
+            create_pg_search_indexes(conn)
+        backend = "postgresql"
+    elif dialect == "sqlite":
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(_FTS_TABLE))
+                # Клиенты могли измениться в обход сессии приложения (скрипты, SQL)
+                _reconcile_fts(conn)
+            backend = "fts5"
+        except OperationalError:
+            # SQLite собран без FTS5
+            backend = "like"
+    else:
+        backend = "like"
+    _backends[engine] = backend
+    return backend
+
+def _fts_exists(conn) -> bool:
+    return conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'clients_fts'"
+    )).first() is not None
+
+def _backend_of(engine: Engine, conn=None) -> str:
+    """Бэкенд поиска движка: индекс мог создать другой процесс
+
+    conn - уже открытое соединение (внутри flush второе не открываем).
+    """
+    backend = _backends.get(engine)
+    if backend is None:
+        if engine.dialect.name == "postgresql":
+            backend = "postgresql"
+        elif engine.dialect.name == "sqlite":
+            if conn is not None:
+                exists = _fts_exists(conn)
+            else:
+                with engine.connect() as new_conn:
+                    exists = _fts_exists(new_conn)
+            backend = "fts5" if exists else "like"
+        else:
+            backend = "like"
+        _backends[engine] = backend
+    return backend
+
+def _fts_row(client_id, name, email, inn, phone) -> dict:
+    return {"id": client_id, "name": name, "email": email, "inn": inn, "phone": _digits(phone)}
+
+def _reconcile_fts(conn) -> None:
+    """Привести clients_fts к clients по содержимому строк, а не по количеству"""
+    expected = {
+        r[0]: _fts_row(*r) for r in conn.execute(text("SELECT id, name, email, inn, phone FROM clients"))
+    }
+    indexed = {
+        r[0]: {"id": r[0], "name": r[1], "email": r[2], "inn": r[3], "phone": r[4]}
+        for r in conn.execute(text("SELECT rowid, name, email, inn, phone FROM clients_fts"))
+    }
+    stale = [client_id for client_id, row in indexed.items() if expected.get(client_id) != row]
+    missing = [row for client_id, row in expected.items() if indexed.get(client_id) != row]
+    if stale:
+        conn.execute(text("DELETE FROM clients_fts WHERE rowid = :id"), [{"id": client_id} for client_id in stale])
+    if missing:
+        conn.execute(
+            text("INSERT INTO clients_fts (rowid, name, email, inn, phone) VALUES (:id, :name, :email, :inn, :phone)"),
+            missing
+        )
+
+@event.listens_for(Session, "after_flush")
+def _sync_clients_fts(session, flush_context):
+    changed = [obj for obj in list(session.new) + list(session.dirty) if isinstance(obj, Client)]
+    removed = [obj.id for obj in session.deleted if isinstance(obj, Client)]
+    if not changed and not removed:
+        return
+
+    conn = session.connection()
+    if _backend_of(conn.engine, conn) != "fts5":
+        return
+    ids = [obj.id for obj in changed] + removed
+    conn.execute(
+        text("DELETE FROM clients_fts WHERE rowid = :id"),
+        [{"id": client_id} for client_id in ids]
+    )
+    if changed:
+        conn.execute(
+            text("INSERT INTO clients_fts (rowid, name, email, inn, phone) VALUES (:id, :name, :email, :inn, :phone)"),
+            [_fts_row(obj.id, obj.name, obj.email, obj.inn, obj.phone) for obj in changed]
+        )
+
+def search_clients(query: Query, term: str) -> Query:
+    """Отфильтровать запрос по поисковой строке и отсортировать по релевантности
+
+    Слова ищутся по префиксу (ИНН и телефон тоже: "7701" найдёт 7701234567).
+    """
+    tokens = _tokens(term)
+    if not tokens:
+        return query
+
+    backend = _backend_of(query.session.get_bind())
+    if backend == "postgresql":
+        tsquery = func.to_tsquery("simple", " & ".join(f"{token}:*" for token in tokens))
+        document = literal_column(_PG_DOCUMENT)
+        conditions = [document.op("@@")(tsquery)]
+        if _is_numeric(term):
+            digits = _digits(term)
+            conditions.append(Client.inn.like(f"{digits}%"))
+            phone = literal_column(_PG_PHONE)
+            conditions.extend(phone.like(f"{prefix}%") for prefix in _phone_prefixes(digits))
+        return query.filter(or_(*conditions)).order_by(
+            func.ts_rank(document, tsquery).desc(), Client.id.desc()
+        )
+
+    if backend == "fts5":
+        match = " ".join(f'"{token}"*' for token in tokens)
+        if _is_numeric(term):
+            digits = _digits(term)
+            numeric = [f'inn : "{digits}"*'] + [f'phone : "{prefix}"*' for prefix in _phone_prefixes(digits)]
+            match = f"({match}) OR " + " OR ".join(numeric)
+        hits = text(
+            "SELECT rowid AS client_id, bm25(clients_fts) AS rank FROM clients_fts WHERE clients_fts MATCH :match"
+        ).bindparams(match=match).columns(
+            column("client_id", Integer), column("rank", Float)
+        ).subquery("hits")
+        return query.join(hits, hits.c.client_id == Client.id).order_by(hits.c.rank, Client.id.desc())
+
+    search_filter = f"%{term}%"
+    return query.filter(
+        (Client.name.ilike(search_filter)) |
+        (Client.email.ilike(search_filter)) |
+        (Client.inn.ilike(search_filter))
+    ).order_by(Client.created_at.desc(), Client.id.desc())
@@ -0,0 +1,178 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+
+from app.user_cache import UserPrincipal
+from app.models.client import Client
+from app.models.deal import Deal
+from app.models.task import Task
+from app.models.rollup import DealDailyFact
+
+
+SALES_BUCKETS = ("day", "week", "month", "quarter")
+
+# Разрезы графика продаж: параметр breakdown -> колонка deal_daily_facts
+SALES_BREAKDOWNS = {
+    "pipeline": DealDailyFact.pipeline_id,
+    "stage": DealDailyFact.stage_id,
+    "manager": DealDailyFact.manager_id,
+    "currency": DealDailyFact.currency,
+}
+
+def bucket_start(day: date, bucket: str) -> date:
+    """Первый день недели/месяца/квартала, в который попадает day"""
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    if bucket == "quarter":
+        return date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+    return day
+
+class DashboardAggregator:
+    """Агрегаты для Dashboard: один GROUP BY запрос на таблицу
+
+    Каждый метод возвращает счётчики по всем статусам сразу,
+    поэтому новые статусы не добавляют запросов.
+    """
+
+    def __init__(self, db: Session, user: UserPrincipal):
+        self.db = db
+        self.user = user
+
+    @property
+    def _manager_id(self) -> Optional[int]:
+        # Менеджеры видят только свои данные
+        return self.user.id if self.user.role == "manager" else None
+
+    def deals(self, month_start: Optional[datetime] = None) -> Dict[str, dict]:
+        """Количество и выручка сделок по статусам"""
+        if month_start is None:
+            month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+        query = self.db.query(
+            Deal.status,
+            func.count(Deal.id).label("count"),
+            func.coalesce(func.sum(Deal.amount), 0).label("amount"),
+            func.coalesce(func.sum(
+                case((Deal.closed_at >= month_start, Deal.amount), else_=0)
+            ), 0).label("month_amount"),
+        )
+        if self._manager_id is not None:
+            query = query.filter(Deal.manager_id == self._manager_id)
+
+        return {
+            row.status: {
+                "count": row.count,
+                "amount": float(row.amount),
+                "month_amount": float(row.month_amount),
+            }
+            for row in query.group_by(Deal.status).all()
+        }
+
+    def clients(self) -> Dict[str, int]:
+        """Количество клиентов по статусам"""
+        query = self.db.query(Client.status, func.count(Client.id))
+        if self._manager_id is not None:
+            query = query.filter(Client.manager_id == self._manager_id)
+        return dict(query.group_by(Client.status).all())
+
+    def tasks(self) -> Dict[str, int]:
+        """Количество задач по статусам"""
+        query = self.db.query(Task.status, func.count(Task.id))
+        if self._manager_id is not None:
+            query = query.filter(Task.assignee_id == self._manager_id)
+        return dict(query.group_by(Task.status).all())
+
+    def stats(self) -> dict:
+        """Сводка в формате /api/dashboard/stats"""
+        deals = self.deals()
+        clients = self.clients()
+        tasks = self.tasks()
+
+        total_deals = sum(bucket["count"] for bucket in deals.values())
+        won = deals.get("won", {"count": 0, "amount": 0.0, "month_amount": 0.0})
+        won_deals = won["count"]
+
+        # Конверсия
+        conversion_rate = round((won_deals / total_deals * 100) if total_deals > 0 else 0, 1)
+
+        return {
+            "deals": {
+                "total": total_deals,
+                "open": deals.get("open", {}).get("count", 0),
+                "won": won_deals,
+                "lost": deals.get("lost", {}).get("count", 0),
+            },
+            "revenue": {
+                "total": won["amount"],
+                "month": won["month_amount"],
+            },
+            "clients": {
+                "total": sum(clients.values()),
+                "leads": clients.get("lead", 0),
+                "clients": clients.get("client", 0),
+            },
+            "tasks": {
+                "total": sum(tasks.values()),
+                "pending": tasks.get("pending", 0),
+                "completed": tasks.get("completed", 0),
+            },
+            "conversion_rate": conversion_rate,
+        }
+
+    def sales_chart(
+        self,
+        days: int = 30,
+        bucket: str = "day",
+        status: str = "won",
+        pipeline_id: Optional[int] = None,
+        breakdown: Optional[str] = None,
+    ) -> List[dict]:
+        """График закрытых сделок из deal_daily_facts
+
+        SQL группирует по дням (не больше одной строки на день и разрез),
+        недели/месяцы/кварталы собираются уже из дневных итогов.
+        """
+        start_day = (datetime.now() - timedelta(days=days)).date()
+        dimension = SALES_BREAKDOWNS.get(breakdown)
+
+        columns = [
+            DealDailyFact.day,
+            func.sum(DealDailyFact.deals_count).label("count"),
+            func.sum(DealDailyFact.total_amount).label("amount"),
+        ]
+        group_by = [DealDailyFact.day]
+        if dimension is not None:
+            columns.append(dimension.label("key"))
+            group_by.append(dimension)
+
+        query = self.db.query(*columns).filter(
+            DealDailyFact.status == status,
+            DealDailyFact.day >= start_day
+        )
+        if pipeline_id:
+            query = query.filter(DealDailyFact.pipeline_id == pipeline_id)
+        if self._manager_id is not None:
+            query = query.filter(DealDailyFact.manager_id == self._manager_id)
+
+        buckets: Dict[tuple, list] = {}
+        for row in query.group_by(*group_by).all():
+            key = (bucket_start(row.day, bucket), row.key if dimension is not None else None)
+            totals = buckets.setdefault(key, [0, 0.0])
+            totals[0] += int(row.count or 0)
+            totals[1] += float(row.amount or 0)
+
+        result = []
+        for (day, key), (count, amount) in sorted(buckets.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+            point = {
+                "date": day.isoformat(),
+                "count": count,
+                "amount": amount,
+            }
+            if dimension is not None:
+                point[breakdown] = key
+            result.append(point)
+        return result
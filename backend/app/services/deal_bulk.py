@@ -0,0 +1,154 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import IO, Iterable, Iterator, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.activity_sink import activity_sink
+from app import board_events
+from app.board_events import reload_event
+from app.models.client import Client
+from app.models.deal import Deal
+from app.models.rollup import apply_deal_rows
+from app.reference_cache import reference_cache
+from app.models.user import User
+from app.schemas.deal import DealImportRow, DealImportResult
+from app.services.export import export_rows
+from app.user_cache import UserPrincipal
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+# ================== ФОРМАТЫ ==================
+
+def read_records(stream: IO[bytes], fmt: str) -> Iterator[dict]:
+    """Построчное чтение CSV (с заголовком) или NDJSON из бинарного потока"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        for row in csv.DictReader(text):
+            # Пустая ячейка CSV - отсутствующее значение
+            yield {key: value for key, value in row.items() if key and value != ""}
+    else:
+        for line in text:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+# ================== ИМПОРТ ==================
+
+class DealImporter:
+    """Массовый импорт сделок чанками через executemany
+
+    Справочники (воронки, стадии, пользователи) загружаются один раз,
+    клиенты проверяются одним запросом на чанк.
+    """
+
+    def __init__(self, db: Session, user: UserPrincipal):
+        self.db = db
+        self.user = user
+        refs = reference_cache.get(db)
+        self.pipeline_ids = set(refs.pipelines)
+        self.stage_pipeline = {stage.id: stage.pipeline_id for stage in refs.stages.values()}
+        self.user_ids = {row[0] for row in db.query(User.id).all()}
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[str] = []
+
+    def _error(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"row {line}: {message}")
+
+    def _validate(self, line: int, record: dict) -> Optional[dict]:
+        try:
+            row = DealImportRow.model_validate(record)
+        except ValidationError as e:
+            self._error(line, "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            ))
+            return None
+
+        if row.pipeline_id not in self.pipeline_ids:
+            self._error(line, "Pipeline not found")
+            return None
+        if self.stage_pipeline.get(row.stage_id) != row.pipeline_id:
+            self._error(line, "Stage not found in pipeline")
+            return None
+        if row.manager_id is None:
+            row.manager_id = self.user.id
+        elif row.manager_id not in self.user_ids:
+            self._error(line, "Manager not found")
+            return None
+
+        # Все поля, включая пустые: executemany берёт набор колонок из
+        # первой строки чанка, строки с другим набором ломают вставку
+        values = row.model_dump()
+        if values["created_at"] is None:
+            values["created_at"] = datetime.utcnow()
+        values["_line"] = line
+        return values
+
+    def _flush(self, chunk: List[dict]) -> None:
+        if not chunk:
+            return
+        client_ids = {row["client_id"] for row in chunk}
+        existing = {row[0] for row in self.db.query(Client.id).filter(Client.id.in_(client_ids)).all()}
+
+        rows = []
+        for row in chunk:
+            line = row.pop("_line")
+            if row["client_id"] not in existing:
+                self._error(line, "Client not found")
+                continue
+            rows.append(row)
+
+        if rows:
+            self.db.execute(insert(Deal.__table__), rows)
+            apply_deal_rows(self.db.connection(), rows)
+            # Карточек может быть тысячи - доске проще перечитаться
+            board_events.collect(self.db, [reload_event(pipeline_id) for pipeline_id in {row["pipeline_id"] for row in rows}])
+            self.db.commit()
+            self.imported += len(rows)
+
+    def run(self, records: Iterable[dict]) -> DealImportResult:
+        chunk: List[dict] = []
+        line = 0
+        try:
+            for line, record in enumerate(records, start=1):
+                values = self._validate(line, record)
+                if values is not None:
+                    chunk.append(values)
+                if len(chunk) >= IMPORT_CHUNK_SIZE:
+                    self._flush(chunk)
+                    chunk = []
+        except (ValueError, csv.Error) as e:
+            # Битый файл: импортированное ранее остаётся, остаток отбрасываем
+            self._error(line + 1, f"Malformed input: {e}")
+        self._flush(chunk)
+
+        if self.imported:
+            activity_sink.record(
+                self.db,
+                type="note",
+                user_id=self.user.id,
+                subject="Импорт сделок",
+                content=f"Импортировано сделок: {self.imported}"
+            )
+            self.db.commit()
+
+        return DealImportResult(imported=self.imported, failed=self.failed, errors=self.errors)
+
+# ================== ЭКСПОРТ ==================
+
+def export_deals(
+    user: UserPrincipal,
+    fmt: str,
+    pipeline_id: Optional[int] = None,
+    status: Optional[str] = None
+) -> Iterator[bytes]:
+    """Потоковая выгрузка сделок (общая выгрузка - services/export.py)"""
+    return export_rows("deals", user, fmt, {"pipeline_id": pipeline_id, "status": status})
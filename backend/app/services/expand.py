@@ -0,0 +1,84 @@
+from typing import Dict, List, Optional, Set, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import Query, joinedload, selectinload
+
+from app.models.client import Client
+from app.models.deal import Deal
+from app.schemas.activity import ActivityResponse
+from app.schemas.client import ClientBrief, ClientResponse, ContactResponse
+from app.schemas.deal import (
+    DealResponse, DealExpandedResponse, ClientExpandedResponse,
+    DealStageBrief, PipelineBrief
+)
+from app.schemas.task import TaskResponse
+
+# План загрузки для ?expand=...: связь -> (стратегия, схема, коллекция?)
+#   many-to-one - joinedload: тот же SELECT, без лишних запросов
+#   коллекции   - selectinload: один дополнительный SELECT ... IN на связь
+# Итого число запросов не зависит от количества строк.
+
+class Expansion:
+    def __init__(self, attribute, strategy, schema: Type[BaseModel], many: bool = False):
+        self.loader = strategy(attribute)
+        self.schema = schema
+        self.many = many
+        # Таблица связи - для ETag ответа с этой связью
+        self.table = attribute.property.mapper.local_table.name
+
+DEAL_EXPANSIONS: Dict[str, Expansion] = {
+    "client": Expansion(Deal.client, joinedload, ClientBrief),
+    "stage": Expansion(Deal.stage, joinedload, DealStageBrief),
+    "pipeline": Expansion(Deal.pipeline, joinedload, PipelineBrief),
+    "tasks": Expansion(Deal.tasks, selectinload, TaskResponse, many=True),
+    "activities": Expansion(Deal.activities, selectinload, ActivityResponse, many=True),
+}
+
+CLIENT_EXPANSIONS: Dict[str, Expansion] = {
+    "contacts": Expansion(Client.contacts, selectinload, ContactResponse, many=True),
+    "deals": Expansion(Client.deals, selectinload, DealResponse, many=True),
+}
+
+def expand_tables(plan: Dict[str, Expansion]) -> Dict[str, str]:
+    """Имя связи -> таблица (для conditional(expand=...))"""
+    return {name: expansion.table for name, expansion in plan.items()}
+
+def parse_expand(expand: Optional[str], plan: Dict[str, Expansion]) -> Set[str]:
+    """Разобрать ?expand=a,b; 400 на неизвестные связи"""
+    if not expand:
+        return set()
+    names = {name.strip() for name in expand.split(",") if name.strip()}
+    unknown = names - plan.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown expand: {', '.join(sorted(unknown))}. Allowed: {', '.join(plan)}"
+        )
+    return names
+
+def apply_expand(query: Query, names: Set[str], plan: Dict[str, Expansion]) -> Query:
+    """Добавить в запрос стратегии загрузки для запрошенных связей"""
+    if not names:
+        return query
+    return query.options(*[plan[name].loader for name in names])
+
+def _compose(obj, names: Set[str], plan: Dict[str, Expansion], base: Type[BaseModel], expanded: Type[BaseModel]):
+    # Читаем только запрошенные связи: остальные не трогаем, иначе lazy load
+    if not names:
+        return base.model_validate(obj)
+    data = base.model_validate(obj).model_dump()
+    for name in names:
+        expansion = plan[name]
+        value = getattr(obj, name)
+        if expansion.many:
+            data[name] = [expansion.schema.model_validate(item) for item in value]
+        else:
+            data[name] = expansion.schema.model_validate(value) if value is not None else None
+    return expanded(**data)
+
+def compose_deals(deals: list, names: Set[str]) -> List[BaseModel]:
+    return [_compose(deal, names, DEAL_EXPANSIONS, DealResponse, DealExpandedResponse) for deal in deals]
+
+def compose_clients(clients: list, names: Set[str]) -> List[BaseModel]:
+    return [_compose(client, names, CLIENT_EXPANSIONS, ClientResponse, ClientExpandedResponse) for client in clients]
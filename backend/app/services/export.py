@@ -0,0 +1,204 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, select
+
+from app.database import read_session
+from app.models.activity import Activity
+from app.models.client import Client
+from app.models.deal import Deal
+from app.user_cache import UserPrincipal
+
+# Потоковая выгрузка сущностей серверным курсором (yield_per).
+# Строки читаются и кодируются пачками по EXPORT_BATCH_SIZE, поэтому
+# память не зависит от объёма выгрузки.
+
+EXPORT_BATCH_SIZE = 1000
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+class ExportEntity:
+    def __init__(self, model, fields: List[str], owner: str, filters: tuple = ()):
+        self.model = model
+        self.fields = fields
+        # Колонка владельца: менеджер выгружает только свои строки
+        self.owner = owner
+        self.filters = filters
+
+ENTITIES: Dict[str, ExportEntity] = {
+    "deals": ExportEntity(
+        Deal,
+        [
+            "id", "title", "description", "client_id", "pipeline_id", "stage_id",
+            "manager_id", "amount", "currency", "status", "expected_close_date",
+            "closed_at", "lost_reason", "created_at", "updated_at",
+        ],
+        owner="manager_id",
+        filters=("pipeline_id", "stage_id", "status"),
+    ),
+    "clients": ExportEntity(
+        Client,
+        [
+            "id", "name", "inn", "website", "email", "phone", "address", "source",
+            "status", "manager_id", "notes", "created_at", "updated_at", "last_contact",
+        ],
+        owner="manager_id",
+        filters=("status",),
+    ),
+    "activities": ExportEntity(
+        Activity,
+        [
+            "id", "type", "deal_id", "client_id", "user_id", "subject", "content",
+            "duration", "activity_date", "created_at",
+        ],
+        owner="user_id",
+        filters=("type", "deal_id", "client_id"),
+    ),
+}
+
+# ================== ФОРМАТЫ ==================
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _csv(partitions: Iterable[list], fields: List[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for rows in partitions:
+        writer.writerows(["" if value is None else _plain(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Только заголовок - выгрузка пустая
+        yield buffer.getvalue().encode()
+
+def _ndjson(partitions: Iterable[list], fields: List[str]) -> Iterator[bytes]:
+    for rows in partitions:
+        yield "".join(
+            json.dumps({field: _plain(value) for field, value in zip(fields, row)}, ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode()
+
+class _ChunkSink(io.RawIOBase):
+    """Файл для ParquetWriter, который отдаёт записанное порциями"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+def _arrow_type(column):
+    import pyarrow as pa
+
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column.type, Date):
+        return pa.date32()
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    return pa.string()
+
+def _parquet(partitions: Iterable[list], fields: List[str], columns: list) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(field, _arrow_type(column)) for field, column in zip(fields, columns)])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        # Одна пачка строк - одна row group
+        for rows in partitions:
+            writer.write_table(pa.Table.from_pylist([dict(zip(fields, row)) for row in rows], schema=schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # формат gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+# ================== ВЫГРУЗКА ==================
+
+def check_export(entity: str, fmt: str, filters: Dict[str, object]) -> None:
+    """Проверить параметры до начала потока (потом код ответа не сменить)"""
+    unsupported = [name for name, value in filters.items() if value is not None and name not in ENTITIES[entity].filters]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported filter for {entity}: {', '.join(unsupported)}")
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401 - опциональная зависимость
+        except ImportError:
+            raise HTTPException(status_code=400, detail="Parquet export requires pyarrow")
+
+def export_rows(
+    entity: str,
+    user: UserPrincipal,
+    fmt: str,
+    filters: Optional[Dict[str, object]] = None,
+    compress: bool = False
+) -> Iterator[bytes]:
+    """Поток байт выгрузки сущности в формате fmt (csv, ndjson, parquet)
+
+    Генератор открывает свою сессию (чтение с реплики): ответ стримится
+    уже после выхода из зависимостей роута.
+    """
+    spec = ENTITIES[entity]
+    columns = [getattr(spec.model, field) for field in spec.fields]
+    query = select(*columns).order_by(spec.model.id)
+    for name, value in (filters or {}).items():
+        if value is not None:
+            query = query.where(getattr(spec.model, name) == value)
+    if user.role == "manager":
+        query = query.where(getattr(spec.model, spec.owner) == user.id)
+
+    def stream() -> Iterator[bytes]:
+        db = read_session()
+        try:
+            result = db.execute(query.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE))
+            partitions = result.partitions()
+            if fmt == "csv":
+                yield from _csv(partitions, spec.fields)
+            elif fmt == "ndjson":
+                yield from _ndjson(partitions, spec.fields)
+            else:
+                yield from _parquet(partitions, spec.fields, columns)
+        finally:
+            db.close()
+
+    return _gzip(stream()) if compress else stream()
@@ -0,0 +1,192 @@
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, insert, select, text
+from sqlalchemy.orm import Session, with_loader_criteria
+from starlette.responses import JSONResponse
+
+from app.config import settings
+from app.database import Base, SessionLocal
+from app.models.tenant import (
+    DEFAULT_TENANT_ID, Tenant, TenantScoped, current_tenant_id, current_tenant_schema, tenant_scope, tenant_scoped_tables
+)
+from app.services.client_search import create_pg_search_indexes
+
+# Несколько компаний в одном процессе.
+#
+#   TenantMiddleware  - определяет компанию запроса по заголовку
+#                       TENANT_HEADER или поддомену TENANT_DOMAIN и кладёт
+#                       её в ContextVar (MULTI_TENANT=false - всегда
+#                       компания по умолчанию, без обращения к БД)
+#   do_orm_execute    - каждый SELECT/UPDATE/DELETE через ORM получает
+#                       условие tenant_id = <компания запроса> для всех
+#                       моделей TenantScoped, включая join и подзапросы
+#   TENANT_SCHEMAS    - (только PostgreSQL) данные компании в своей схеме:
+#                       в начале транзакции SET LOCAL search_path
+#
+# Вне запроса (скрипты, фоновые потоки) компании нет и запросы не
+# ограничиваются; нужную компанию задаёт tenant_scope().
+
+@dataclass(frozen=True)
+class TenantRef:
+    id: int
+    slug: str
+    schema_name: Optional[str]
+    is_active: bool
+
+_DEFAULT = TenantRef(id=DEFAULT_TENANT_ID, slug=settings.DEFAULT_TENANT, schema_name=None, is_active=True)
+
+class TenantRegistry:
+    """Компании по slug с коротким TTL: middleware не ходит в БД на каждый запрос"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[Optional[TenantRef], float]] = {}
+        self._lock = threading.Lock()
+
+    def peek(self, slug: str) -> Tuple[bool, Optional[TenantRef]]:
+        """(найдено в кэше, компания) без обращения к БД"""
+        with self._lock:
+            entry = self._entries.get(slug)
+        if entry is None or time.monotonic() - entry[1] >= self.ttl:
+            return False, None
+        return True, entry[0]
+
+    def load(self, slug: str) -> Optional[TenantRef]:
+        db = SessionLocal()
+        try:
+            tenant = db.query(Tenant).filter(Tenant.slug == slug).first()
+            ref = None if tenant is None else TenantRef(
+                id=tenant.id, slug=tenant.slug, schema_name=tenant.schema_name, is_active=bool(tenant.is_active)
+            )
+        finally:
+            db.close()
+        with self._lock:
+            self._entries[slug] = (ref, time.monotonic())
+        return ref
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+tenant_registry = TenantRegistry(settings.TENANT_CACHE_TTL)
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def resolve_slug(scope) -> str:
+    """Slug компании: заголовок, затем поддомен, иначе компания по умолчанию"""
+    slug = _header(scope, settings.TENANT_HEADER.lower().encode())
+    if slug:
+        return slug.strip().lower()
+    host = (_header(scope, b"host") or "").split(":")[0].lower()
+    domain = settings.TENANT_DOMAIN.lower()
+    if domain and host.endswith("." + domain):
+        return host[:-len(domain) - 1].rsplit(".", 1)[-1]
+    return settings.DEFAULT_TENANT
+
+class TenantMiddleware:
+    """ASGI middleware: компания запроса в ContextVar; неизвестная - 404"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if settings.MULTI_TENANT:
+            slug = resolve_slug(scope)
+            cached, tenant = tenant_registry.peek(slug)
+            if not cached:
+                tenant = await run_in_threadpool(tenant_registry.load, slug)
+            if tenant is None or not tenant.is_active:
+                await JSONResponse({"detail": "Tenant not found"}, status_code=404)(scope, receive, send)
+                return
+        else:
+            tenant = _DEFAULT
+
+        schema = tenant.schema_name if settings.TENANT_SCHEMAS else None
+        with tenant_scope(tenant.id, schema):
+            await self.app(scope, receive, send)
+
+# ================== ОГРАНИЧЕНИЕ ЗАПРОСОВ ==================
+
+@event.listens_for(Session, "do_orm_execute")
+def _scope_to_tenant(orm_execute_state):
+    tenant_id = current_tenant_id()
+    if tenant_id is None or orm_execute_state.is_column_load or orm_execute_state.is_relationship_load:
+        # Ленивые загрузки наследуют условие от исходного запроса
+        return
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        # Массовый UPDATE по первичному ключу (executemany) не принимает
+        # WHERE; id в таких пачках уже прочитаны запросом компании
+        if isinstance(orm_execute_state.parameters, list):
+            return
+    elif not orm_execute_state.is_select:
+        return
+    orm_execute_state.statement = orm_execute_state.statement.options(
+        with_loader_criteria(TenantScoped, lambda cls: cls.tenant_id == tenant_id, include_aliases=True)
+    )
+
+@event.listens_for(Session, "after_begin")
+def _set_search_path(session, transaction, connection):
+    schema = current_tenant_schema()
+    if schema is not None and connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f'SET LOCAL search_path TO "{schema}", public')
+
+# ================== СОЗДАНИЕ ==================
+
+_SCHEMA_NAME = re.compile(r"^[a-z_][a-z0-9_]{0,62}$")
+
+def tenant_tables():
+    """Таблицы с данными компаний (в режиме схем - в схеме компании)"""
+    scoped = tenant_scoped_tables()
+    return [table for table in Base.metadata.sorted_tables if table in scoped]
+
+def ensure_default_tenant(engine) -> None:
+    """Компания по умолчанию (id=1): ей принадлежат данные до разделения"""
+    with engine.begin() as connection:
+        exists = connection.execute(select(Tenant.id).where(Tenant.id == DEFAULT_TENANT_ID)).first()
+        if exists is None:
+            connection.execute(insert(Tenant).values(
+                id=DEFAULT_TENANT_ID, slug=settings.DEFAULT_TENANT, name=settings.DEFAULT_TENANT, is_active=True
+            ))
+            if connection.dialect.name == "postgresql":
+                connection.execute(text(
+                    "SELECT setval(pg_get_serial_sequence('tenants', 'id'), (SELECT MAX(id) FROM tenants))"
+                ))
+
+def create_tenant_schema(engine, schema: str) -> None:
+    """Схема PostgreSQL компании с таблицами TenantScoped и индексами поиска"""
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("Schema per tenant requires PostgreSQL")
+    if not _SCHEMA_NAME.match(schema):
+        raise ValueError(f"Invalid schema name: {schema!r}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+        Base.metadata.create_all(
+            connection.execution_options(schema_translate_map={None: schema}), tables=tenant_tables()
+        )
+        connection.exec_driver_sql(f'SET LOCAL search_path TO "{schema}"')
+        create_pg_search_indexes(connection)
+
+# ================== ССЫЛКИ ИЗ ЗАПРОСА ==================
+
+def require_own(db: Session, model, row_id: Optional[int], detail: str) -> None:
+    """id из тела запроса указывает на строку своей компании, иначе 404
+
+    Внешний ключ проверяет только существование строки, а запрос через
+    ORM ограничен компанией запроса - чужие строки для него не существуют.
+    """
+    if row_id is not None and db.query(model.id).filter(model.id == row_id).first() is None:
+        raise HTTPException(status_code=404, detail=detail)
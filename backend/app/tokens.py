@@ -0,0 +1,328 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from jose import JWTError, jwt
+from sqlalchemy import and_, event, func, or_
+from sqlalchemy.orm import Session, attributes
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.change_counter import table_versions
+from app.models.revoked_token import RevokedToken
+from app.models.tenant import DEFAULT_TENANT_ID, active_tenant_id
+from app.models.user import User
+from app.user_cache import UserPrincipal
+
+logger = logging.getLogger(__name__)
+
+# Токены без обращения к БД.
+#
+#   access  - короткий (ACCESS_TOKEN_EXPIRE_MINUTES), несёт user_id,
+#             username, role и active: авторизации хватает самого токена.
+#             Оба токена несут tid - компанию пользователя: с токеном
+#             одной компании в другую не войти
+#   refresh - долгий (REFRESH_TOKEN_EXPIRE_DAYS), одноразовый: при обмене
+#             на новую пару отзывается, роль перечитывается из БД
+#   stream  - тикет на открытие потока событий (EventSource не шлёт
+#             заголовков): STREAM_TICKET_TTL секунд, одноразовый
+#
+# Подпись - ключом из кольца JWT_KEYS по kid в заголовке: новый ключ
+# добавляется в кольцо, становится активным (JWT_ACTIVE_KID), а старый
+# удаляется, когда истекут подписанные им токены.
+#
+# Отзыв (выход, блокировка, смена роли) пишется в revoked_tokens. Каждый
+# процесс держит отозванные jti в Bloom-фильтре и раз в
+# REVOCATION_SYNC_INTERVAL сверяет версию таблицы в change_counters.
+# Промах фильтра - токен точно не отозван; попадание (редкое, в том числе
+# ложное) проверяется запросом к БД.
+
+# ================== КЛЮЧИ ==================
+
+class KeyRing:
+    def __init__(self, keys: Dict[str, str], active: str):
+        if active not in keys:
+            raise RuntimeError(f"JWT_ACTIVE_KID {active!r} is not in JWT_KEYS")
+        self.keys = keys
+        self.active = active
+
+    @classmethod
+    def from_settings(cls) -> "KeyRing":
+        """JWT_KEYS="kid1:secret1,kid2:secret2"; пусто - один ключ SECRET_KEY"""
+        keys = {}
+        for item in settings.JWT_KEYS.split(","):
+            kid, _, secret = item.strip().partition(":")
+            if kid and secret:
+                keys[kid] = secret
+        if not keys:
+            keys = {"default": settings.SECRET_KEY}
+        return cls(keys, settings.JWT_ACTIVE_KID or next(iter(keys)))
+
+    def encode(self, claims: dict) -> str:
+        return jwt.encode(claims, self.keys[self.active], algorithm=settings.ALGORITHM, headers={"kid": self.active})
+
+    def decode(self, token: str) -> dict:
+        kid = jwt.get_unverified_header(token).get("kid")
+        # Токены без kid выпущены до кольца ключей и подписаны SECRET_KEY
+        key = self.keys.get(kid) if kid else settings.SECRET_KEY
+        if key is None:
+            raise JWTError("Unknown key id")
+        return jwt.decode(token, key, algorithms=[settings.ALGORITHM])
+
+key_ring = KeyRing.from_settings()
+
+# ================== ВЫДАЧА ==================
+
+def _claims(user_id: int, tenant_id: int, typ: str, lifetime: timedelta) -> dict:
+    now = time.time()
+    return {
+        "user_id": user_id,
+        "tid": tenant_id,
+        "typ": typ,
+        "jti": uuid.uuid4().hex,
+        "iat": now,
+        "exp": int(now + lifetime.total_seconds()),
+    }
+
+def issue_tokens(user: User) -> dict:
+    """Пара access + refresh для пользователя"""
+    access_lifetime = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access = _claims(user.id, user.tenant_id, "access", access_lifetime)
+    access.update(username=user.username, role=user.role, active=bool(user.is_active))
+    refresh = _claims(user.id, user.tenant_id, "refresh", timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS))
+    return {
+        "access_token": key_ring.encode(access),
+        "refresh_token": key_ring.encode(refresh),
+        "token_type": "bearer",
+        "expires_in": int(access_lifetime.total_seconds()),
+    }
+
+def issue_stream_ticket(user: UserPrincipal, tenant_id: int) -> dict:
+    """Одноразовый тикет потока событий вместо access токена в URL"""
+    lifetime = timedelta(seconds=settings.STREAM_TICKET_TTL)
+    claims = _claims(user.id, tenant_id, "stream", lifetime)
+    claims.update(username=user.username, role=user.role, active=bool(user.is_active))
+    return {"ticket": key_ring.encode(claims), "expires_in": int(lifetime.total_seconds())}
+
+def token_tenant(claims: dict) -> int:
+    """Компания токена; токены без tid выпущены до разделения на компании"""
+    return claims.get("tid", DEFAULT_TENANT_ID)
+
+def decode_token(token: str, typ: str = "access") -> dict:
+    """Проверить подпись, срок, тип и компанию токена; JWTError при ошибке"""
+    claims = key_ring.decode(token)
+    # У токенов, выпущенных до refresh, typ нет - это access
+    if claims.get("typ", "access") != typ:
+        raise JWTError("Wrong token type")
+    if claims.get("user_id") is None:
+        raise JWTError("Missing user_id")
+    if token_tenant(claims) != active_tenant_id():
+        raise JWTError("Token of another tenant")
+    return claims
+
+# ================== ОТЗЫВ ==================
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+def _timestamp(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+_TABLE = "revoked_tokens"
+_PURGE_INTERVAL = 3600  # секунд между удалениями истёкших строк
+
+# id пользователей у каждой компании свои (в режиме схем - свои
+# последовательности): отсечки хранятся по (tid, user_id)
+UserKey = Tuple[int, int]
+
+class RevocationList:
+    """Отозванные jti (Bloom-фильтр) и отсечки по пользователям (точно)"""
+
+    def __init__(self, sync_interval: float, error_rate: float):
+        self.sync_interval = sync_interval
+        self.error_rate = error_rate
+        self._filter = BloomFilter(1024, error_rate)
+        self._cutoffs: Dict[UserKey, float] = {}
+        self._version: Optional[int] = None
+        self._loaded = False
+        self._purged = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def is_revoked(self, claims: dict) -> Optional[bool]:
+        """Ответ без БД; None - возможно отозван, нужен confirm()"""
+        if not self._loaded:
+            return None
+        cutoff = self._cutoffs.get((token_tenant(claims), claims["user_id"]))
+        if cutoff is not None and claims.get("iat", 0) < cutoff:
+            return True
+        return None if claims.get("jti", "") in self._filter else False
+
+    def confirm(self, db: Session, claims: dict) -> bool:
+        """Точная проверка по БД: совпадение в фильтре бывает ложным"""
+        if not self._loaded:
+            self.sync(db)
+        issued = datetime.utcfromtimestamp(claims.get("iat", 0))
+        return db.query(RevokedToken.id).filter(or_(
+            RevokedToken.jti == claims.get("jti"),
+            and_(
+                RevokedToken.jti.is_(None),
+                RevokedToken.tenant_id == token_tenant(claims),
+                RevokedToken.user_id == claims["user_id"],
+                RevokedToken.not_before > issued,
+            ),
+        )).first() is not None
+
+    def sync(self, db: Session) -> None:
+        """Перечитать отзывы, если версия таблицы изменилась"""
+        version = table_versions(db, [_TABLE]).get(_TABLE, 0)
+        if self._loaded and version == self._version:
+            return
+        rows = db.query(RevokedToken.jti, RevokedToken.tenant_id, RevokedToken.user_id, RevokedToken.not_before).filter(
+            RevokedToken.expires_at > datetime.utcnow()
+        ).all()
+        # С запасом под отзывы этого процесса до следующей синхронизации
+        bloom = BloomFilter(max(2 * len(rows), 1024), self.error_rate)
+        cutoffs: Dict[UserKey, float] = {}
+        for jti, tenant_id, user_id, not_before in rows:
+            if jti:
+                bloom.add(jti)
+            elif not_before is not None:
+                key = (tenant_id, user_id)
+                cutoffs[key] = max(cutoffs.get(key, 0.0), _timestamp(not_before))
+        with self._lock:
+            self._filter, self._cutoffs, self._version, self._loaded = bloom, cutoffs, version, True
+
+    def add(self, jtis=(), cutoffs: Dict[UserKey, float] = None) -> None:
+        """Отзывы этого процесса - сразу, не дожидаясь синхронизации"""
+        with self._lock:
+            for jti in jtis:
+                self._filter.add(jti)
+            for key, cutoff in (cutoffs or {}).items():
+                self._cutoffs[key] = max(self._cutoffs.get(key, 0.0), cutoff)
+
+    def _purge(self, db: Session) -> None:
+        if time.monotonic() - self._purged < _PURGE_INTERVAL:
+            return
+        self._purged = time.monotonic()
+        db.query(RevokedToken).filter(RevokedToken.expires_at <= datetime.utcnow()).delete(synchronize_session=False)
+        db.commit()
+
+    def _sync_once(self) -> None:
+        db = SessionLocal()
+        try:
+            self._purge(db)
+            self.sync(db)
+        except Exception:
+            logger.exception("Revocation list sync failed")
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.sync_interval):
+            self._sync_once()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._sync_once()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="revocation-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+revocation_list = RevocationList(settings.REVOCATION_SYNC_INTERVAL, settings.REVOCATION_ERROR_RATE)
+
+def revoke_token(db: Session, claims: dict) -> RevokedToken:
+    """Отозвать один токен; вступает в силу после commit"""
+    row = RevokedToken(
+        jti=claims["jti"], tenant_id=token_tenant(claims), user_id=claims["user_id"],
+        expires_at=datetime.utcfromtimestamp(claims["exp"])
+    )
+    db.add(row)
+    db.info.setdefault("revoked_jti", set()).add(claims["jti"])
+    return row
+
+def redeem_once(db: Session, claims: dict) -> bool:
+    """Погасить одноразовый токен; False - его уже предъявили
+
+    Одновременные погашения (в том числе в разных процессах) оба
+    записывают jti; выигрывает строка с меньшим id.
+    """
+    row = revoke_token(db, claims)
+    db.commit()
+    first = db.query(func.min(RevokedToken.id)).filter(RevokedToken.jti == claims["jti"]).scalar()
+    return first == row.id
+
+def revoke_user_tokens(db: Session, tenant_id: int, user_id: int) -> None:
+    """Отозвать все выданные пользователю токены; вступает в силу после commit"""
+    now = datetime.utcnow()
+    db.add(RevokedToken(
+        tenant_id=tenant_id, user_id=user_id, not_before=now,
+        expires_at=now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    db.info.setdefault("revoked_users", {})[(tenant_id, user_id)] = _timestamp(now)
+
+# Смена роли, пароля, блокировка или удаление пользователя отзывают его
+# токены: в access токене роль и active зашиты до конца срока, а после
+# смены пароля старые сессии не должны работать. Перехэширование при
+# входе (authenticate_user, "rehashed_users") пароль не меняет.
+
+_WATCHED = ("role", "is_active", "username", "hashed_password")
+
+@event.listens_for(Session, "before_flush")
+def _revoke_changed_users(session, flush_context, instances):
+    for obj in list(session.deleted):
+        if isinstance(obj, User):
+            revoke_user_tokens(session, obj.tenant_id, obj.id)
+    for obj in list(session.dirty):
+        if isinstance(obj, User):
+            state = attributes.instance_state(obj)
+            changed = {name for name in _WATCHED if state.attrs[name].history.has_changes()}
+            if changed == {"hashed_password"} and obj.id in session.info.get("rehashed_users", ()):
+                continue
+            if changed:
+                revoke_user_tokens(session, obj.tenant_id, obj.id)
+
+@event.listens_for(Session, "after_commit")
+def _apply_revocations(session):
+    jtis = session.info.pop("revoked_jti", None)
+    users = session.info.pop("revoked_users", None)
+    session.info.pop("rehashed_users", None)
+    if jtis or users:
+        revocation_list.add(jtis or (), users)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_revocations(session):
+    session.info.pop("revoked_jti", None)
+    session.info.pop("revoked_users", None)
+    session.info.pop("rehashed_users", None)
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes
+
+from app.config import settings
+from app.models.user import User
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """Облегчённый текущий пользователь для авторизации в роутерах"""
+    id: int
+    username: str
+    role: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserPrincipal":
+        return cls(id=user.id, username=user.username, role=user.role, is_active=bool(user.is_active))
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+class MemoryUserCache:
+    """TTL + LRU кэш в памяти процесса"""
+
+    def __init__(self, ttl: int, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._items: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, token: str) -> Optional[UserPrincipal]:
+        key = (user_id, _token_key(token))
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, principal = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return principal
+
+    def set(self, user_id: int, token: str, principal: UserPrincipal) -> None:
+        key = (user_id, _token_key(token))
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, principal)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            for key in [key for key in self._items if key[0] == user_id]:
+                del self._items[key]
+
+class RedisUserCache:
+    """Кэш в Redis-совместимом хранилище: общий для всех воркеров"""
+
+    def __init__(self, url: str, ttl: int, prefix: str = "nocto:user:"):
+        import redis  # опциональная зависимость
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, user_id: int, token: str) -> Optional[UserPrincipal]:
+        raw = self.client.hget(f"{self.prefix}{user_id}", _token_key(token))
+        if raw is None:
+            return None
+        return UserPrincipal(**json.loads(raw))
+
+    def set(self, user_id: int, token: str, principal: UserPrincipal) -> None:
+        key = f"{self.prefix}{user_id}"
+        pipe = self.client.pipeline()
+        pipe.hset(key, _token_key(token), json.dumps(asdict(principal)))
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def invalidate(self, user_id: int) -> None:
+        self.client.delete(f"{self.prefix}{user_id}")
+
+class NullUserCache:
+    """Кэш выключен: каждый запрос читает пользователя из БД"""
+
+    def get(self, user_id: int, token: str) -> Optional[UserPrincipal]:
+        return None
+
+    def set(self, user_id: int, token: str, principal: UserPrincipal) -> None:
+        pass
+
+    def invalidate(self, user_id: int) -> None:
+        pass
+
+def _create_cache():
+    if settings.USER_CACHE_BACKEND == "redis":
+        return RedisUserCache(settings.REDIS_URL, settings.USER_CACHE_TTL)
+    if settings.USER_CACHE_BACKEND == "memory":
+        return MemoryUserCache(settings.USER_CACHE_TTL, settings.USER_CACHE_MAXSIZE)
+    return NullUserCache()
+
+user_cache = _create_cache()
+
+# ================== ИНВАЛИДАЦИЯ ==================
+# Смена роли, блокировка или удаление пользователя сбрасывают его записи
+# после commit, чтобы параллельный запрос не закэшировал старые данные.
+
+_WATCHED = ("role", "is_active", "username")
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed: Set[int] = session.info.setdefault("user_cache_invalidate", set())
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            state = attributes.instance_state(obj)
+            if any(state.attrs[name].history.has_changes() for name in _WATCHED):
+                changed.add(obj.id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop("user_cache_invalidate", set()):
+        user_cache.invalidate(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop("user_cache_invalidate", None)
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Скрипт для переноса старых активностей в архив (activities_archive).
+Запускайте по расписанию, например раз в сутки:
+
+    python archive_activities.py 180
+"""
+import sys
+from app.database import SessionLocal, Base, engine
+from app.models.activity import ActivityArchive
+from app.services.activity_timeline import archive_activities
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 180
+    Base.metadata.create_all(bind=engine, tables=[ActivityArchive.__table__])
+    db = SessionLocal()
+    try:
+        print(f"\n=== Архивация активностей старше {days} дней ===")
+        moved = archive_activities(db, days)
+        print(f"✅ Перенесено в архив: {moved}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
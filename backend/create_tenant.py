@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Скрипт для создания компании (workspace), её администратора и воронки
+
+    python create_tenant.py acme "ООО Акме"
+    python create_tenant.py acme "ООО Акме" --schema   # отдельная схема PostgreSQL
+
+Компания доступна по заголовку X-Tenant: acme или поддомену
+acme.<TENANT_DOMAIN> при MULTI_TENANT=true.
+"""
+import argparse
+import re
+import sys
+from app.database import SessionLocal, Base, engine
+from app.models.tenant import Tenant, tenant_scope
+from app.tenancy import create_tenant_schema, ensure_default_tenant
+from create_admin import create_admin
+from init_pipeline import create_default_pipeline
+
+_SLUG = re.compile(r"^[a-z0-9][a-z0-9-]{0,39}$")
+
+def create_tenant(slug: str, name: str, schema: bool) -> Tenant:
+    Base.metadata.create_all(bind=engine)
+    ensure_default_tenant(engine)
+    db = SessionLocal()
+    try:
+        if db.query(Tenant).filter(Tenant.slug == slug).first():
+            raise SystemExit(f"ERROR: Компания {slug!r} уже существует")
+        tenant = Tenant(slug=slug, name=name, is_active=True)
+        if schema:
+            tenant.schema_name = "tenant_" + slug.replace("-", "_")
+            create_tenant_schema(engine, tenant.schema_name)
+        db.add(tenant)
+        db.commit()
+        db.refresh(tenant)
+        return tenant
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Создание компании")
+    parser.add_argument("slug", help="латиница, цифры и дефис: поддомен и X-Tenant")
+    parser.add_argument("name", help="название компании")
+    parser.add_argument("--schema", action="store_true", help="данные в отдельной схеме PostgreSQL")
+    args = parser.parse_args()
+
+    slug = args.slug.lower()
+    if not _SLUG.match(slug):
+        print("ERROR: Slug: латиница, цифры и дефис, до 40 символов")
+        sys.exit(1)
+
+    print(f"\n=== noctoCRM - Создание компании {slug} ===")
+    tenant = create_tenant(slug, args.name, args.schema)
+    print(f"✅ Компания создана (ID: {tenant.id}{', схема ' + tenant.schema_name if tenant.schema_name else ''})")
+
+    # Администратор и воронка создаются уже внутри компании
+    with tenant_scope(tenant.id, tenant.schema_name):
+        create_admin()
+        create_default_pipeline()
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\nCancelled")
+        sys.exit(0)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Скрипт перевода существующей базы на несколько компаний.
+
+Добавляет tenant_id во все таблицы с данными (существующие строки
+достаются компании по умолчанию, id=1), пересоздаёт индексы с tenant_id
+впереди и делает логин и email уникальными в пределах компании.
+Отзывы токенов (revoked_tokens) тоже получают tenant_id.
+Запускать один раз перед обновлением; повторный запуск ничего не меняет.
+"""
+from sqlalchemy import inspect, text
+from app.database import Base, engine
+from app.models import RevokedToken, Tenant
+from app.models.tenant import DEFAULT_TENANT_ID
+from app.tenancy import ensure_default_tenant, tenant_tables
+
+# Индексы, заменённые составными с tenant_id (имена изменились)
+_REPLACED = {
+    "users": ["ix_users_username", "ix_users_email"],
+    "clients": ["ix_clients_created_at_id"],
+    "deals": ["ix_deals_created_at_id"],
+    "tasks": ["ix_tasks_created_at_id"],
+    "activities": ["ix_activities_created_at_id"],
+}
+
+def migrate(connection) -> None:
+    inspector = inspect(connection)
+    # revoked_tokens - общая таблица, но отзыв всех токенов пользователя
+    # хранится по (tenant_id, user_id)
+    for table in tenant_tables() + [RevokedToken.__table__]:
+        if not inspector.has_table(table.name):
+            continue  # новую таблицу создаст create_all
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        if "tenant_id" not in columns:
+            connection.execute(text(
+                f"ALTER TABLE {table.name} ADD COLUMN tenant_id INTEGER NOT NULL DEFAULT {DEFAULT_TENANT_ID}"
+            ))
+            print(f"  + {table.name}.tenant_id")
+
+        existing = {index["name"]: index["column_names"] for index in inspector.get_indexes(table.name)}
+        for name in _REPLACED.get(table.name, []):
+            if name in existing:
+                connection.execute(text(f"DROP INDEX {name}"))
+                print(f"  - {name}")
+        for index in table.indexes:
+            columns = [column.name for column in index.columns]
+            if index.name in existing and existing[index.name] != columns:
+                # То же имя, но без tenant_id впереди
+                connection.execute(text(f"DROP INDEX {index.name}"))
+                existing.pop(index.name)
+            if index.name not in existing:
+                index.create(connection)
+                print(f"  + {index.name} ({', '.join(columns)})")
+
+def main():
+    print("\n=== Переход на несколько компаний ===")
+    Base.metadata.create_all(bind=engine, tables=[Tenant.__table__])
+    ensure_default_tenant(engine)
+    with engine.begin() as connection:
+        migrate(connection)
+    print("✅ Готово")
+
+if __name__ == "__main__":
+    main()
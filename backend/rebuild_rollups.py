@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Скрипт для пересчёта итоговых таблиц по существующим сделкам:
+stage_rollups (Kanban) и deal_daily_facts (графики продаж)
+"""
+from app.database import SessionLocal, Base, engine
+from app.models.rollup import StageRollup, DealDailyFact, rebuild_stage_rollups, rebuild_deal_daily_facts
+
+def main():
+    Base.metadata.create_all(bind=engine, tables=[StageRollup.__table__, DealDailyFact.__table__])
+    db = SessionLocal()
+    try:
+        print("\n=== Пересчёт итогов по сделкам ===")
+        rows = rebuild_stage_rollups(db)
+        print(f"✅ stage_rollups: {rows} строк")
+        rows = rebuild_deal_daily_facts(db)
+        print(f"✅ deal_daily_facts: {rows} строк")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Настройки читаются при импорте app: отдельная БД и дешёвый bcrypt
+_DB_DIR = tempfile.mkdtemp(prefix="nocto-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ["BCRYPT_ROUNDS"] = "4"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app.auth import get_password_hash
+from app.database import SessionLocal
+from app.main import app
+from app.models import Client, Deal, DealStage, Pipeline, User
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+@pytest.fixture(scope="session")
+def seed():
+    """Админ, воронка со стадией и клиент"""
+    db = SessionLocal()
+    try:
+        admin = User(
+            username="admin", email="admin@example.com", full_name="Admin",
+            hashed_password=get_password_hash("password"), role="admin", is_active=True
+        )
+        pipeline = Pipeline(name="Основная", sort_order=0, is_active=True)
+        db.add_all([admin, pipeline])
+        db.flush()
+        stage = DealStage(pipeline_id=pipeline.id, name="Новый лид", sort_order=0)
+        company = Client(name="ООО Ромашка", status="lead")
+        db.add_all([stage, company])
+        db.commit()
+        return {"admin_id": admin.id, "pipeline_id": pipeline.id, "stage_id": stage.id, "client_id": company.id}
+    finally:
+        db.close()
+
+def login(client, username: str, password: str = "password") -> dict:
+    response = client.post("/api/auth/login", data={"username": username, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture(scope="session")
+def auth_headers(client, seed):
+    return login(client, "admin")
+
+@pytest.fixture(scope="session")
+def manager(client, seed):
+    """Менеджер: видит только свои сделки и задачи"""
+    db = SessionLocal()
+    try:
+        user = User(
+            username="manager", email="manager@example.com", full_name="Manager",
+            hashed_password=get_password_hash("password"), role="manager", is_active=True
+        )
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    finally:
+        db.close()
+    return {"id": user_id, "headers": login(client, "manager")}
+
+@pytest.fixture(scope="session")
+def board(seed):
+    """Воронка доски: две рабочие стадии и две конечные"""
+    db = SessionLocal()
+    try:
+        pipeline = Pipeline(name="Продажи", sort_order=1, is_active=True)
+        db.add(pipeline)
+        db.flush()
+        stages = {
+            "lead": DealStage(pipeline_id=pipeline.id, name="Лид", sort_order=0),
+            "talks": DealStage(pipeline_id=pipeline.id, name="Переговоры", sort_order=1),
+            "won": DealStage(pipeline_id=pipeline.id, name="Выиграна", sort_order=2, is_final=True, is_won=True),
+            "lost": DealStage(pipeline_id=pipeline.id, name="Проиграна", sort_order=3, is_final=True),
+        }
+        db.add_all(stages.values())
+        db.commit()
+        return {"pipeline_id": pipeline.id, **{name: stage.id for name, stage in stages.items()}}
+    finally:
+        db.close()
+
+@pytest.fixture
+def new_deal(client, auth_headers, seed, board):
+    """Создать сделку на доске через API"""
+    def create(stage: str = "lead", **fields) -> dict:
+        body = {
+            "title": "Сделка", "amount": 100, "client_id": seed["client_id"],
+            "pipeline_id": board["pipeline_id"], "stage_id": board[stage], **fields,
+        }
+        response = client.post("/api/deals/", json=body, headers=auth_headers)
+        assert response.status_code == 200, response.text
+        return response.json()
+    return create
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
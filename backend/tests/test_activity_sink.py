@@ -0,0 +1,51 @@
+import pytest
+
+from app import activity_sink as sink_module
+from app.database import SessionLocal
+from app.models import Activity
+from app.routers import deals as deals_router
+
+def _activities(db, deal_id: int) -> list:
+    return [row.subject for row in db.query(Activity.subject).filter(Activity.deal_id == deal_id).order_by(Activity.id)]
+
+@pytest.fixture
+def buffered(monkeypatch):
+    """Буферная запись с большим интервалом: пишет только stop() или переполнение"""
+    def install(max_queue: int = 100):
+        sink = sink_module.BufferedActivitySink(batch_size=100, interval=3600, max_queue=max_queue)
+        monkeypatch.setattr(sink_module, "activity_sink", sink)
+        monkeypatch.setattr(deals_router, "activity_sink", sink)
+        return sink
+    yield install
+    sink_module.activity_sink.stop()
+
+def test_records_are_written_after_commit(buffered, new_deal, board, seed, db):
+    sink = buffered()
+    deal = new_deal()
+    assert _activities(db, deal["id"]) == []
+
+    sink.stop()
+    assert _activities(db, deal["id"]) == ["Сделка создана"]
+
+def test_rollback_discards_records(buffered, new_deal, seed, db):
+    sink = buffered()
+    deal = new_deal()
+    session = SessionLocal()
+    try:
+        sink.record(session, type="note", deal_id=deal["id"], user_id=seed["admin_id"], subject="Отменена")
+        session.rollback()
+        sink.record(session, type="note", deal_id=deal["id"], user_id=seed["admin_id"], subject="Записана")
+        session.commit()
+    finally:
+        session.close()
+
+    sink.stop()
+    assert _activities(db, deal["id"]) == ["Сделка создана", "Записана"]
+
+def test_full_queue_writes_synchronously(buffered, new_deal, db):
+    buffered(max_queue=1)
+    deal = new_deal()
+    second = new_deal()
+    # Очередь занята первой записью - вторая пишется сразу
+    assert _activities(db, deal["id"]) == []
+    assert _activities(db, second["id"]) == ["Сделка создана"]
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Activity, ActivityArchive
+from app.services.activity_timeline import archive_activities
+
+@pytest.fixture
+def deal_history(client, auth_headers, new_deal, db):
+    """Сделка с пятью активностями: три старые уходят в архив"""
+    deal = new_deal()
+    now = datetime.utcnow()
+    ids = []
+    for days in (400, 300, 200, 2, 1):
+        response = client.post(
+            "/api/activities/", json={"type": "call", "deal_id": deal["id"], "subject": f"{days}"}, headers=auth_headers
+        )
+        assert response.status_code == 200, response.text
+        ids.append(response.json()["id"])
+        db.query(Activity).filter(Activity.id == ids[-1]).update({"created_at": now - timedelta(days=days)})
+        db.commit()
+    assert archive_activities(db, older_than_days=90) >= 3
+    # Новые сверху
+    return {"deal_id": deal["id"], "ids": ids[::-1]}
+
+def _timeline(client, headers, deal_id: int, **params) -> list:
+    ids, cursor = [], None
+    while True:
+        response = client.get(
+            f"/api/activities/deals/{deal_id}", params={**params, **({"cursor": cursor} if cursor else {})}, headers=headers
+        )
+        assert response.status_code == 200, response.text
+        ids += [activity["id"] for activity in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids
+
+def test_archived_activities_leave_hot_table(deal_history, db):
+    archived = {row.id for row in db.query(ActivityArchive.id).filter(ActivityArchive.deal_id == deal_history["deal_id"])}
+    assert archived == set(deal_history["ids"][2:])
+    assert not db.query(Activity).filter(Activity.id.in_(archived)).count()
+
+@pytest.mark.parametrize("limit", [1, 2, 50])
+def test_timeline_merges_archive(client, auth_headers, deal_history, limit):
+    hot = _timeline(client, auth_headers, deal_history["deal_id"], limit=limit)
+    full = _timeline(client, auth_headers, deal_history["deal_id"], limit=limit, include_archive=True)
+    # Активность "Сделка создана" в ленте тоже есть - её не считаем
+    assert [activity_id for activity_id in hot if activity_id in deal_history["ids"]] == deal_history["ids"][:2]
+    assert [activity_id for activity_id in full if activity_id in deal_history["ids"]] == deal_history["ids"]
+    assert len(full) == len(set(full))
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from app import database
+from app.models.tenant import tenant_scope
+from app.services.dashboard import DashboardAggregator
+from app.user_cache import UserPrincipal
+
+pytest.importorskip("aiosqlite")
+
+def test_get_async_db_runs_sync_services(seed, db, monkeypatch):
+    """Сервисы на sync Session работают через async драйвер (run_sync)"""
+    async_engine, session_factory = database.create_async_database(database.DATABASE_URL)
+    monkeypatch.setattr(database, "AsyncSessionLocal", session_factory)
+    admin = UserPrincipal(id=seed["admin_id"], username="admin", role="admin", is_active=True)
+
+    async def run():
+        try:
+            async for db in database.get_async_db():
+                return await db.run_sync(lambda session: DashboardAggregator(session, admin).stats())
+        finally:
+            await async_engine.dispose()
+
+    with tenant_scope(1):
+        stats = asyncio.run(run())
+        expected = DashboardAggregator(db, admin).stats()
+    assert stats == expected
+    assert stats["clients"]["total"] >= 1
+
+def test_get_async_db_disabled(monkeypatch):
+    monkeypatch.setattr(database, "AsyncSessionLocal", None)
+
+    async def run():
+        async for _ in database.get_async_db():
+            pass
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
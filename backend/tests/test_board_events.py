@@ -0,0 +1,52 @@
+import asyncio
+
+from app.board_events import board_broker
+from app.user_cache import UserPrincipal
+
+def _principal(user_id: int, role: str) -> UserPrincipal:
+    return UserPrincipal(id=user_id, username=role, role=role, is_active=True)
+
+def _drain(subscriber) -> list:
+    events = []
+    while not subscriber.queue.empty():
+        event = subscriber.queue.get_nowait()
+        events.append((event["type"], event["deal"]["id"]))
+    return events
+
+def test_subscribers_see_only_visible_deals(client, auth_headers, manager, seed, board, new_deal):
+    def write() -> tuple:
+        own = new_deal(manager_id=manager["id"])["id"]
+        foreign = new_deal()["id"]
+        client.post(f"/api/deals/{foreign}/move", json={"stage_id": board["talks"]}, headers=auth_headers)
+        client.post(
+            "/api/deals/move-batch", json={"moves": [{"deal_id": own, "stage_id": board["won"]}]}, headers=auth_headers
+        )
+        # Неудачная транзакция событий не порождает
+        client.post(
+            "/api/deals/move-batch", json={"moves": [{"deal_id": own, "stage_id": 10 ** 9}]}, headers=auth_headers
+        )
+        client.put(f"/api/deals/{own}", json={"manager_id": seed["admin_id"]}, headers=auth_headers)
+        client.delete(f"/api/deals/{foreign}", headers=auth_headers)
+        return own, foreign
+
+    async def scenario():
+        admin = board_broker.subscribe(board["pipeline_id"], _principal(seed["admin_id"], "admin"))
+        watcher = board_broker.subscribe(board["pipeline_id"], _principal(manager["id"], "manager"))
+        other_board = board_broker.subscribe(seed["pipeline_id"], _principal(seed["admin_id"], "admin"))
+        try:
+            own, foreign = await asyncio.to_thread(write)
+            # События приходят через call_soon_threadsafe
+            await asyncio.sleep(0)
+            return own, foreign, _drain(admin), _drain(watcher), _drain(other_board)
+        finally:
+            for subscriber in (admin, watcher, other_board):
+                board_broker.unsubscribe(subscriber)
+
+    own, foreign, admin_events, manager_events, other_events = asyncio.run(scenario())
+    assert admin_events == [
+        ("created", own), ("created", foreign), ("moved", foreign),
+        ("moved", own), ("updated", own), ("deleted", foreign),
+    ]
+    # Менеджер видит и передачу своей сделки другому (previous_manager_id)
+    assert manager_events == [("created", own), ("moved", own), ("updated", own)]
+    assert other_events == []
@@ -0,0 +1,39 @@
+from sqlalchemy import event
+
+from app.database import engine
+from app.models import Activity, Deal
+from app.models.change_counter import table_versions
+
+def _counter_writes(statements):
+    return [params for statement, params in statements if statement.startswith("UPDATE change_counters")]
+
+def test_counters_bumped_once_at_commit_in_name_order(db, seed):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    before = table_versions(db, ["deals", "activities"])
+    db.rollback()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        # Активность раньше сделки - как в move_deal
+        db.add(Activity(type="note", user_id=seed["admin_id"], subject="counter"))
+        db.flush()
+        db.add(Deal(
+            title="counter", client_id=seed["client_id"], pipeline_id=seed["pipeline_id"],
+            stage_id=seed["stage_id"], manager_id=seed["admin_id"]
+        ))
+        db.flush()
+        # До commit строки счётчиков не блокируются
+        assert _counter_writes(statements) == []
+        db.commit()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    names = [params[-1] for params in _counter_writes(statements)]
+    assert names == sorted(names)
+    assert len(names) == len(set(names))
+    after = table_versions(db, ["deals", "activities"])
+    assert after["deals"] == before.get("deals", 0) + 1
+    assert after["activities"] == before.get("activities", 0) + 1
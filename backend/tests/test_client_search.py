@@ -0,0 +1,33 @@
+from sqlalchemy import text
+
+from app.database import engine
+from app.models import Client
+from app.services import client_search
+from app.services.client_search import ensure_client_search_index
+
+def _indexed_name(db, client_id):
+    return db.execute(text("SELECT name FROM clients_fts WHERE rowid = :id"), {"id": client_id}).scalar()
+
+def test_listener_detects_fts_without_startup_call(db, monkeypatch):
+    """Скрипт не вызывал ensure_client_search_index - индекс всё равно обновляется"""
+    monkeypatch.setattr(client_search, "_backends", {})
+    company = Client(name="Скриптовая компания", status="lead")
+    db.add(company)
+    db.commit()
+    assert _indexed_name(db, company.id) == "Скриптовая компания"
+
+def test_reconcile_repairs_rows_changed_outside_session(db):
+    """Количество строк совпадает, но содержимое разошлось"""
+    company = Client(name="Старое название", status="lead")
+    db.add(company)
+    db.commit()
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE clients SET name = 'Новое название' WHERE id = :id"), {"id": company.id})
+
+    ensure_client_search_index(engine)
+    assert _indexed_name(db, company.id) == "Новое название"
+
+def test_search_finds_client(client, auth_headers, seed):
+    response = client.get("/api/clients/?search=Ромашка", headers=auth_headers)
+    assert response.status_code == 200
+    assert [row["id"] for row in response.json()] == [seed["client_id"]]
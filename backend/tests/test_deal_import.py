@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app.models import Deal
+
+def _import(client, auth_headers, fmt: str, body: str):
+    return client.post(
+        f"/api/deals/bulk/import?format={fmt}",
+        files={"file": (f"deals.{fmt}", body.encode(), "text/plain")},
+        headers=auth_headers,
+    )
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+def test_import_rows_with_different_optional_fields(client, auth_headers, seed, db, fmt):
+    """Строки чанка с заполненными и пустыми необязательными полями"""
+    prefix = f"mixed-{fmt}"
+    rows = [
+        {"title": f"{prefix}-1", "description": "с описанием", "amount": 100},
+        {"title": f"{prefix}-2", "amount": 200},
+        {"title": f"{prefix}-3", "created_at": "2024-01-15T10:00:00", "currency": "USD"},
+    ]
+    for row in rows:
+        row.update(client_id=seed["client_id"], pipeline_id=seed["pipeline_id"], stage_id=seed["stage_id"])
+
+    if fmt == "csv":
+        columns = ["title", "description", "amount", "currency", "created_at", "client_id", "pipeline_id", "stage_id"]
+        lines = [",".join(columns)] + [",".join(str(row.get(column, "")) for column in columns) for row in rows]
+        body = "\n".join(lines) + "\n"
+    else:
+        body = "\n".join(json.dumps(row) for row in rows) + "\n"
+
+    response = _import(client, auth_headers, fmt, body)
+    assert response.status_code == 200, response.text
+    assert response.json() == {"imported": 3, "failed": 0, "errors": []}
+
+    deals = {deal.title: deal for deal in db.query(Deal).filter(Deal.title.like(f"{prefix}-%")).all()}
+    assert sorted(deals) == [f"{prefix}-1", f"{prefix}-2", f"{prefix}-3"]
+    assert deals[f"{prefix}-1"].description == "с описанием"
+    assert deals[f"{prefix}-2"].description is None
+    assert deals[f"{prefix}-2"].created_at is not None
+    assert deals[f"{prefix}-3"].created_at.year == 2024
+    assert deals[f"{prefix}-3"].currency == "USD"
+
+def test_export_then_import_round_trip(client, auth_headers, board, new_deal, db):
+    """Выгрузка сделок воронки загружается обратно тем же импортом"""
+    new_deal(title="round-trip-1", amount=10, description="первая")
+    new_deal(title="round-trip-2", amount=20, currency="EUR")
+    exported = client.get(
+        "/api/deals/bulk/export", params={"format": "csv", "pipeline_id": board["pipeline_id"]}, headers=auth_headers
+    )
+    assert exported.status_code == 200
+    assert exported.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(exported.text)))
+    assert {"round-trip-1", "round-trip-2"} <= {row["title"] for row in rows}
+
+    result = _import(client, auth_headers, "csv", exported.text)
+    assert result.json() == {"imported": len(rows), "failed": 0, "errors": []}
+    copies = db.query(Deal).filter(Deal.title == "round-trip-2").all()
+    assert len(copies) == 2
+    assert {(deal.amount, deal.currency) for deal in copies} == {(20, "EUR")}
@@ -0,0 +1,44 @@
+def _get(client, headers, url: str, etag: str = None, **params):
+    if etag:
+        headers = {**headers, "If-None-Match": etag}
+    return client.get(url, params=params, headers=headers)
+
+def test_unchanged_resource_answers_304(client, auth_headers, new_deal):
+    url = f"/api/deals/{new_deal()['id']}"
+    first = _get(client, auth_headers, url)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    cached = _get(client, auth_headers, url, etag)
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+    assert _get(client, auth_headers, url, f'"other", {etag}').status_code == 304
+    assert _get(client, auth_headers, url, "*").status_code == 304
+
+def test_write_changes_etag(client, auth_headers, new_deal):
+    url = f"/api/deals/{new_deal()['id']}"
+    etag = _get(client, auth_headers, url).headers["ETag"]
+
+    assert client.put(url, json={"title": "Обновлена"}, headers=auth_headers).status_code == 200
+    fresh = _get(client, auth_headers, url, etag)
+    assert fresh.status_code == 200
+    assert fresh.json()["title"] == "Обновлена"
+    assert fresh.headers["ETag"] != etag
+
+def test_etag_depends_on_user_and_params(client, auth_headers, manager, new_deal):
+    new_deal(manager_id=manager["id"])
+    admin = _get(client, auth_headers, "/api/deals/").headers["ETag"]
+    assert _get(client, manager["headers"], "/api/deals/", admin).status_code == 200
+    assert _get(client, auth_headers, "/api/deals/", admin, limit=5).status_code == 200
+
+def test_expand_tracks_related_table(client, auth_headers, seed, new_deal):
+    new_deal()
+    plain = _get(client, auth_headers, "/api/deals/").headers["ETag"]
+    expanded = _get(client, auth_headers, "/api/deals/", expand="client").headers["ETag"]
+
+    response = client.put(f"/api/clients/{seed['client_id']}", json={"notes": "Перезвонить"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert _get(client, auth_headers, "/api/deals/", plain).status_code == 304
+    assert _get(client, auth_headers, "/api/deals/", expanded, expand="client").status_code == 200
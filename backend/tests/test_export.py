@@ -0,0 +1,56 @@
+import csv
+import gzip
+import io
+import json
+
+from app.services.export import ENTITIES
+
+def _export(client, headers, entity: str, **params):
+    response = client.get(f"/api/export/{entity}", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response
+
+def _csv_rows(text: str) -> list:
+    return list(csv.DictReader(io.StringIO(text)))
+
+def test_csv_and_ndjson_export_same_rows(client, auth_headers, board, new_deal):
+    new_deal(title="export-csv", amount=150)
+    params = {"pipeline_id": board["pipeline_id"]}
+    csv_rows = _csv_rows(_export(client, auth_headers, "deals", format="csv", **params).text)
+    ndjson = _export(client, auth_headers, "deals", format="ndjson", **params)
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    json_rows = [json.loads(line) for line in ndjson.text.splitlines()]
+
+    assert [row["id"] for row in csv_rows] == [str(row["id"]) for row in json_rows]
+    exported = next(row for row in json_rows if row["title"] == "export-csv")
+    assert exported["amount"] == 150
+    assert exported["pipeline_id"] == board["pipeline_id"]
+
+def test_gzip_export(client, auth_headers, board, new_deal):
+    new_deal(title="export-gzip")
+    params = {"format": "csv", "pipeline_id": board["pipeline_id"]}
+    plain = _export(client, auth_headers, "deals", **params)
+    packed = _export(client, auth_headers, "deals", gzip=True, **params)
+    assert packed.headers["content-type"] == "application/gzip"
+    assert 'filename="deals.csv.gz"' in packed.headers["content-disposition"]
+    assert gzip.decompress(packed.content) == plain.content
+
+def test_manager_exports_only_own_rows(client, auth_headers, manager, board, new_deal):
+    own = new_deal(title="export-own", manager_id=manager["id"])
+    new_deal(title="export-foreign")
+    rows = _csv_rows(_export(client, manager["headers"], "deals", pipeline_id=board["pipeline_id"]).text)
+    assert {row["manager_id"] for row in rows} == {str(manager["id"])}
+    assert str(own["id"]) in {row["id"] for row in rows}
+
+    admin_rows = _csv_rows(_export(client, auth_headers, "deals", pipeline_id=board["pipeline_id"]).text)
+    assert len(admin_rows) > len(rows)
+
+def test_empty_csv_export_has_header(client, auth_headers):
+    response = _export(client, auth_headers, "activities", type="meeting", deal_id=-1)
+    assert response.text.splitlines() == [",".join(ENTITIES["activities"].fields)]
+
+def test_unsupported_filter_is_rejected(client, auth_headers):
+    response = client.get("/api/export/clients", params={"pipeline_id": 1}, headers=auth_headers)
+    assert response.status_code == 400
+    response = client.get("/api/export/invoices", headers=auth_headers)
+    assert response.status_code == 422
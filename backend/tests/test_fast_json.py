@@ -0,0 +1,32 @@
+import pytest
+
+@pytest.mark.parametrize("url, params", [
+    ("/api/deals/", {"limit": 3}),
+    ("/api/clients/", {"limit": 3}),
+    ("/api/clients/", {"search": "Ромашка"}),
+])
+def test_fast_list_matches_validated_list(client, auth_headers, new_deal, url, params):
+    new_deal(title="fast-1", description="с описанием")
+    new_deal(title="fast-2", currency="USD")
+    normal = client.get(url, params=params, headers=auth_headers)
+    fast = client.get(url, params={**params, "fast": "true"}, headers=auth_headers)
+    assert normal.status_code == fast.status_code == 200
+    assert fast.json() == normal.json()
+    # Заголовки зависимостей (ETag) и курсор доходят до быстрого ответа
+    assert fast.headers["ETag"]
+    assert ("X-Next-Cursor" in fast.headers) == ("X-Next-Cursor" in normal.headers)
+
+def test_fast_pages_follow_cursor(client, auth_headers, new_deal):
+    for _ in range(3):
+        new_deal()
+    first = client.get("/api/deals/", params={"limit": 2, "fast": "true"}, headers=auth_headers)
+    cursor = first.headers["X-Next-Cursor"]
+    fast = client.get("/api/deals/", params={"limit": 2, "fast": "true", "cursor": cursor}, headers=auth_headers)
+    normal = client.get("/api/deals/", params={"limit": 2, "cursor": cursor}, headers=auth_headers)
+    assert fast.json() == normal.json()
+    assert {deal["id"] for deal in fast.json()}.isdisjoint(deal["id"] for deal in first.json())
+
+def test_expand_ignores_fast(client, auth_headers, new_deal):
+    new_deal()
+    response = client.get("/api/deals/", params={"limit": 1, "fast": "true", "expand": "client"}, headers=auth_headers)
+    assert response.json()[0]["client"]["name"] == "ООО Ромашка"
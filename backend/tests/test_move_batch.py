@@ -0,0 +1,66 @@
+from app.models import Deal
+
+def _move(client, headers, *moves):
+    return client.post("/api/deals/move-batch", json={"moves": list(moves)}, headers=headers)
+
+def _stages(db, *deals) -> list:
+    db.expire_all()
+    return [db.get(Deal, deal["id"]).stage_id for deal in deals]
+
+def test_batch_moves_and_closes_deals(client, auth_headers, board, new_deal, db):
+    first, second, third = new_deal(), new_deal(), new_deal()
+    response = _move(
+        client, auth_headers,
+        {"deal_id": first["id"], "stage_id": board["talks"]},
+        {"deal_id": second["id"], "stage_id": board["won"]},
+        {"deal_id": third["id"], "stage_id": board["lost"], "reason": "Дорого"},
+    )
+    assert response.status_code == 200, response.text
+    moved = {deal["id"]: deal for deal in response.json()}
+    assert moved[first["id"]]["status"] == "open"
+    assert moved[first["id"]]["closed_at"] is None
+    assert moved[second["id"]]["status"] == "won"
+    assert moved[second["id"]]["closed_at"] is not None
+    assert moved[third["id"]]["status"] == "lost"
+    assert db.get(Deal, third["id"]).lost_reason == "Дорого"
+    assert _stages(db, first, second, third) == [board["talks"], board["won"], board["lost"]]
+
+def test_missing_deal_moves_nothing(client, auth_headers, board, new_deal, db):
+    deal = new_deal()
+    response = _move(
+        client, auth_headers,
+        {"deal_id": deal["id"], "stage_id": board["talks"]},
+        {"deal_id": 10 ** 9, "stage_id": board["talks"]},
+    )
+    assert response.status_code == 404
+    assert _stages(db, deal) == [board["lead"]]
+
+def test_unknown_stage_moves_nothing(client, auth_headers, board, new_deal, db):
+    first, second = new_deal(), new_deal()
+    response = _move(
+        client, auth_headers,
+        {"deal_id": first["id"], "stage_id": board["talks"]},
+        {"deal_id": second["id"], "stage_id": 10 ** 9},
+    )
+    assert response.status_code == 404
+    assert _stages(db, first, second) == [board["lead"], board["lead"]]
+
+def test_duplicate_deal_is_rejected(client, auth_headers, board, new_deal, db):
+    deal = new_deal()
+    response = _move(
+        client, auth_headers,
+        {"deal_id": deal["id"], "stage_id": board["talks"]},
+        {"deal_id": deal["id"], "stage_id": board["won"]},
+    )
+    assert response.status_code == 400
+    assert _stages(db, deal) == [board["lead"]]
+
+def test_manager_cannot_move_foreign_deal(client, manager, board, new_deal, db):
+    own, foreign = new_deal(manager_id=manager["id"]), new_deal()
+    response = _move(
+        client, manager["headers"],
+        {"deal_id": own["id"], "stage_id": board["talks"]},
+        {"deal_id": foreign["id"], "stage_id": board["talks"]},
+    )
+    assert response.status_code == 403
+    assert _stages(db, own, foreign) == [board["lead"], board["lead"]]
@@ -0,0 +1,71 @@
+from datetime import datetime
+
+import pytest
+
+from app.database import SessionLocal
+from app.models import Deal, DealStage, Pipeline
+
+@pytest.fixture(scope="module")
+def tied_deals(seed):
+    """Шесть сделок отдельной воронки, четыре - с одинаковым created_at"""
+    db = SessionLocal()
+    try:
+        pipeline = Pipeline(name="Пагинация", sort_order=9, is_active=True)
+        db.add(pipeline)
+        db.flush()
+        stage = DealStage(pipeline_id=pipeline.id, name="Лид", sort_order=0)
+        db.add(stage)
+        db.flush()
+        stamps = [datetime(2024, 1, 1)] * 4 + [datetime(2024, 1, 2), datetime(2023, 12, 31)]
+        deals = [
+            Deal(title=f"page-{i}", client_id=seed["client_id"], pipeline_id=pipeline.id,
+                 stage_id=stage.id, manager_id=seed["admin_id"], created_at=stamp)
+            for i, stamp in enumerate(stamps)
+        ]
+        db.add_all(deals)
+        db.commit()
+        expected = [d.id for d in sorted(deals, key=lambda d: (d.created_at, d.id), reverse=True)]
+        return pipeline.id, expected
+    finally:
+        db.close()
+
+def _walk(client, headers, params, limit):
+    ids, pages, cursor = [], 0, None
+    while True:
+        page = {**params, "limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/deals/", params=page, headers=headers)
+        assert response.status_code == 200
+        ids += [row["id"] for row in response.json()]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids, pages
+
+@pytest.mark.parametrize("limit,pages", [(1, 6), (2, 3), (4, 2), (6, 1)])
+def test_cursor_walk_is_stable_with_ties(client, auth_headers, tied_deals, limit, pages):
+    """Одинаковый created_at: порядок по id, без пропусков и повторов;
+    полная последняя страница не отдаёт курсор на пустую
+    """
+    pipeline_id, expected = tied_deals
+    ids, walked = _walk(client, auth_headers, {"pipeline_id": pipeline_id}, limit)
+    assert ids == expected
+    assert walked == pages
+
+def test_cursor_survives_inserts_before_it(client, auth_headers, seed, tied_deals, db):
+    """Новые сделки (выше курсора) не сдвигают следующую страницу"""
+    pipeline_id, expected = tied_deals
+    first = client.get("/api/deals/", params={"pipeline_id": pipeline_id, "limit": 3}, headers=auth_headers)
+    cursor = first.headers["X-Next-Cursor"]
+
+    stage_id = db.query(Deal.stage_id).filter(Deal.id == expected[0]).scalar()
+    db.add(Deal(title="page-new", client_id=seed["client_id"], pipeline_id=pipeline_id,
+                stage_id=stage_id, manager_id=seed["admin_id"]))
+    db.commit()
+
+    second = client.get(
+        "/api/deals/", params={"pipeline_id": pipeline_id, "limit": 3, "cursor": cursor}, headers=auth_headers
+    )
+    assert [row["id"] for row in second.json()] == expected[3:]
+
+def test_invalid_cursor(client, auth_headers):
+    assert client.get("/api/deals/?cursor=not-a-cursor", headers=auth_headers).status_code == 400
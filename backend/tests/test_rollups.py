@@ -0,0 +1,56 @@
+from app.models import DealDailyFact, StageRollup
+from app.models.rollup import rebuild_deal_daily_facts, rebuild_stage_rollups
+
+def _snapshot(db):
+    """Ненулевые строки итогов: ключ -> (количество, сумма)"""
+    db.expire_all()
+    stage_rows = {
+        (r.tenant_id, r.pipeline_id, r.stage_id, r.manager_id, r.status): (r.deals_count, round(r.total_amount, 2))
+        for r in db.query(StageRollup).all() if r.deals_count
+    }
+    fact_rows = {
+        (r.tenant_id, r.day, r.pipeline_id, r.stage_id, r.manager_id, r.currency, r.status):
+            (r.deals_count, round(r.total_amount, 2))
+        for r in db.query(DealDailyFact).all() if r.deals_count
+    }
+    return stage_rows, fact_rows
+
+def test_incremental_rollups_match_rebuild(client, auth_headers, board, manager, new_deal, db):
+    """Итоги после создания, правки, move, move-batch и удаления = пересчёт с нуля"""
+    deals = [new_deal(amount=100 * (i + 1), manager_id=manager["id"] if i % 2 else None) for i in range(6)]
+    ids = [deal["id"] for deal in deals]
+
+    assert client.put(f"/api/deals/{ids[0]}", json={"amount": 777}, headers=auth_headers).status_code == 200
+    assert client.post(f"/api/deals/{ids[1]}/move", json={"stage_id": board["talks"]}, headers=auth_headers).status_code == 200
+    assert client.post(f"/api/deals/{ids[2]}/move", json={"stage_id": board["won"]}, headers=auth_headers).status_code == 200
+    response = client.post("/api/deals/move-batch", json={"moves": [
+        {"deal_id": ids[3], "stage_id": board["lost"], "reason": "дорого"},
+        {"deal_id": ids[4], "stage_id": board["won"]},
+        {"deal_id": ids[1], "stage_id": board["lead"]},
+    ]}, headers=auth_headers)
+    assert response.status_code == 200
+    assert client.delete(f"/api/deals/{ids[5]}", headers=auth_headers).status_code == 200
+    assert client.delete(f"/api/deals/{ids[4]}", headers=auth_headers).status_code == 200
+
+    incremental = _snapshot(db)
+    rebuild_stage_rollups(db)
+    rebuild_deal_daily_facts(db)
+    assert _snapshot(db) == incremental
+
+def test_pipeline_stats_follow_moves(client, auth_headers, board, new_deal):
+    def open_totals():
+        response = client.get(f"/api/deals/stats/pipeline?pipeline_id={board['pipeline_id']}", headers=auth_headers)
+        assert response.status_code == 200
+        rows = response.json()
+        # Итоги из stage_rollups сходятся с карточками из deals
+        for row in rows:
+            assert row["deals_count"] == len(row["deals"])
+            assert row["total_amount"] == sum(card["amount"] for card in row["deals"])
+        return {row["stage_id"]: (row["deals_count"], row["total_amount"]) for row in rows}
+
+    before = open_totals()
+    deal = new_deal(amount=50)
+    client.post(f"/api/deals/{deal['id']}/move", json={"stage_id": board["talks"]}, headers=auth_headers)
+    after = open_totals()
+    assert after[board["talks"]] == (before[board["talks"]][0] + 1, before[board["talks"]][1] + 50)
+    assert after[board["lead"]] == before[board["lead"]]
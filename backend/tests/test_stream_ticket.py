@@ -0,0 +1,28 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.auth import get_stream_user
+
+def _stream_user(db, ticket):
+    return asyncio.run(get_stream_user(token=None, ticket=ticket, db=db))
+
+def test_ticket_is_single_use(client, auth_headers, seed, db):
+    response = client.post("/api/auth/stream-ticket", headers=auth_headers)
+    assert response.status_code == 200
+    ticket = response.json()["ticket"]
+
+    assert _stream_user(db, ticket).id == seed["admin_id"]
+    with pytest.raises(HTTPException) as error:
+        _stream_user(db, ticket)
+    assert error.value.status_code == 401
+
+def test_access_token_is_not_a_ticket(auth_headers, db):
+    access_token = auth_headers["Authorization"].split(" ", 1)[1]
+    with pytest.raises(HTTPException) as error:
+        _stream_user(db, access_token)
+    assert error.value.status_code == 401
+
+def test_ticket_requires_authentication(client):
+    assert client.post("/api/auth/stream-ticket").status_code == 401
@@ -0,0 +1,75 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app.models import Task
+
+@pytest.fixture
+def new_task(client, auth_headers, manager):
+    """Создать задачу менеджера со сроком через API"""
+    def create(due_date=None, **fields) -> int:
+        body = {"title": "Позвонить", "assignee_id": manager["id"], **fields}
+        if due_date:
+            body["due_date"] = due_date.isoformat()
+        response = client.post("/api/tasks/", json=body, headers=auth_headers)
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+    return create
+
+def _queue(client, headers, view: str) -> set:
+    response = client.get("/api/tasks/my", params={"view": view}, headers=headers)
+    assert response.status_code == 200, response.text
+    return {task["id"] for task in response.json()}
+
+def test_my_queues(client, auth_headers, manager, new_task):
+    today = date.today()
+    week_end = today + timedelta(days=6 - today.weekday())
+    overdue = new_task(today - timedelta(days=1))
+    due_today = new_task(today)
+    this_week = new_task(week_end)
+    next_week = new_task(week_end + timedelta(days=1))
+    done = new_task(today)
+    assert client.put(f"/api/tasks/{done}", json={"status": "done"}, headers=auth_headers).status_code == 200
+    foreign = new_task(today, assignee_id=None)
+
+    created = {overdue, due_today, this_week, next_week, done, foreign}
+    assert _queue(client, manager["headers"], "overdue") & created == {overdue}
+    # В воскресенье конец недели - сегодня
+    assert _queue(client, manager["headers"], "today") & created == ({due_today, this_week} if week_end == today else {due_today})
+    assert _queue(client, manager["headers"], "week") & created == {due_today, this_week}
+
+def test_queue_pages_follow_due_date(client, manager, new_task):
+    today = date.today()
+    ids = [new_task(today - timedelta(days=days)) for days in (30, 20, 10)]
+    seen, cursor = [], None
+    while True:
+        params = {"view": "overdue", "limit": 1, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/tasks/my", params=params, headers=manager["headers"])
+        seen += [task["id"] for task in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert [task_id for task_id in seen if task_id in ids] == ids
+
+def test_bulk_complete_skips_foreign_tasks(client, manager, new_task, db):
+    own, foreign = new_task(date.today()), new_task(date.today(), assignee_id=None)
+    response = client.post("/api/tasks/bulk-complete", json={"task_ids": [own, foreign]}, headers=manager["headers"])
+    assert response.json() == {"updated": 1}
+    assert db.get(Task, own).status == "done"
+    assert db.get(Task, own).completed_at is not None
+    assert db.get(Task, foreign).status == "todo"
+    assert own not in _queue(client, manager["headers"], "today")
+
+def test_bulk_reassign(client, auth_headers, manager, seed, new_task, db):
+    first, second = new_task(date.today()), new_task(date.today())
+    body = {"task_ids": [first, second], "assignee_id": seed["admin_id"]}
+    response = client.post("/api/tasks/bulk-reassign", json=body, headers=manager["headers"])
+    assert response.json() == {"updated": 2}
+    assert {db.get(Task, task_id).assignee_id for task_id in (first, second)} == {seed["admin_id"]}
+
+    # Чужие задачи менеджер не передаёт
+    response = client.post("/api/tasks/bulk-reassign", json={**body, "assignee_id": manager["id"]}, headers=manager["headers"])
+    assert response.json() == {"updated": 0}
+
+    response = client.post("/api/tasks/bulk-reassign", json={**body, "assignee_id": 10 ** 9}, headers=auth_headers)
+    assert response.status_code == 404
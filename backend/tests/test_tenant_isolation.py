@@ -0,0 +1,95 @@
+import pytest
+
+from app.auth import get_password_hash
+from app.database import SessionLocal
+from app.models import Client, Deal, DealStage, Pipeline, Task, User
+from app.models.tenant import tenant_scope
+
+OTHER_TENANT_ID = 2
+
+@pytest.fixture(scope="module")
+def foreign(seed):
+    """Пользователь, клиент и сделка другой компании"""
+    db = SessionLocal()
+    try:
+        with tenant_scope(OTHER_TENANT_ID):
+            user = User(
+                username="other-admin", email="other@example.com", full_name="Other",
+                hashed_password=get_password_hash("password"), role="admin", is_active=True
+            )
+            pipeline = Pipeline(name="Чужая", sort_order=0, is_active=True)
+            company = Client(name="ООО Чужая", status="lead")
+            db.add_all([user, pipeline, company])
+            db.flush()
+            stage = DealStage(pipeline_id=pipeline.id, name="Чужая стадия", sort_order=0)
+            db.add(stage)
+            db.flush()
+            deal = Deal(title="Чужая сделка", client_id=company.id, pipeline_id=pipeline.id, stage_id=stage.id, manager_id=user.id)
+            db.add(deal)
+            db.commit()
+            return {"user_id": user.id, "client_id": company.id, "deal_id": deal.id, "stage_id": stage.id}
+    finally:
+        db.close()
+
+@pytest.mark.parametrize("field,key,detail", [
+    ("deal_id", "deal_id", "Deal not found"),
+    ("client_id", "client_id", "Client not found"),
+    ("assignee_id", "user_id", "Assignee not found"),
+])
+def test_task_cannot_reference_other_tenant(client, auth_headers, foreign, db, field, key, detail):
+    response = client.post(
+        "/api/tasks/", json={"title": f"cross-{field}", field: foreign[key]}, headers=auth_headers
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == detail
+    assert db.query(Task).filter(Task.title == f"cross-{field}").count() == 0
+
+def test_task_with_own_references(client, auth_headers, seed):
+    response = client.post(
+        "/api/tasks/", json={"title": "own", "client_id": seed["client_id"], "assignee_id": seed["admin_id"]},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+
+def test_activity_cannot_reference_other_tenant(client, auth_headers, foreign):
+    response = client.post(
+        "/api/activities/", json={"type": "note", "subject": "cross", "deal_id": foreign["deal_id"]},
+        headers=auth_headers
+    )
+    assert response.status_code == 404
+
+def test_deal_update_cannot_reference_other_tenant(client, auth_headers, seed, foreign):
+    created = client.post("/api/deals/", json={
+        "title": "own deal", "client_id": seed["client_id"],
+        "pipeline_id": seed["pipeline_id"], "stage_id": seed["stage_id"],
+    }, headers=auth_headers)
+    assert created.status_code == 200
+    deal_id = created.json()["id"]
+
+    for changes, detail in (({"stage_id": foreign["stage_id"]}, "Stage not found"),
+                            ({"manager_id": foreign["user_id"]}, "Manager not found")):
+        response = client.put(f"/api/deals/{deal_id}", json=changes, headers=auth_headers)
+        assert response.status_code == 404
+        assert response.json()["detail"] == detail
+
+@pytest.mark.parametrize("target", ["deal", "stage"])
+def test_move_batch_cannot_touch_other_tenant(client, auth_headers, board, new_deal, foreign, db, target):
+    own = new_deal()
+    moves = [{"deal_id": own["id"], "stage_id": board["talks"]}]
+    if target == "deal":
+        moves.append({"deal_id": foreign["deal_id"], "stage_id": board["talks"]})
+    else:
+        moves[0]["stage_id"] = foreign["stage_id"]
+    response = client.post("/api/deals/move-batch", json={"moves": moves}, headers=auth_headers)
+    assert response.status_code == 404
+
+    assert db.get(Deal, own["id"]).stage_id == board["lead"]
+    with tenant_scope(OTHER_TENANT_ID):
+        assert db.get(Deal, foreign["deal_id"]).stage_id == foreign["stage_id"]
+
+def test_other_tenant_deal_is_invisible(client, auth_headers, foreign):
+    assert client.get(f"/api/deals/{foreign['deal_id']}", headers=auth_headers).status_code == 404
+    listed = client.get("/api/deals/", params={"limit": 1000}, headers=auth_headers).json()
+    assert foreign["deal_id"] not in {deal["id"] for deal in listed}
+    exported = client.get("/api/export/deals", params={"format": "ndjson"}, headers=auth_headers)
+    assert "Чужая сделка" not in exported.text
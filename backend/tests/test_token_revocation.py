@@ -0,0 +1,156 @@
+import time
+
+import pytest
+from jose import JWTError, jwt
+
+from app.auth import get_password_hash
+from app.config import settings
+from app.database import ReplicaRouter, engine, set_request_user
+from app.models import User
+from app.models.tenant import tenant_scope
+from app.password_hasher import password_hasher
+from app import tokens
+from app.tokens import KeyRing, RevocationList, decode_token, revoke_user_tokens
+
+def _claims(tenant_id: int, user_id: int) -> dict:
+    return {"user_id": user_id, "tid": tenant_id, "jti": f"jti-{tenant_id}-{user_id}", "iat": time.time() - 60}
+
+def test_user_revocation_is_per_tenant(db):
+    """Отзыв пользователя 7 второй компании не задевает пользователя 7 первой"""
+    revoke_user_tokens(db, 2, 7)
+    db.commit()
+
+    revocations = RevocationList(sync_interval=60, error_rate=0.01)
+    revocations.sync(db)
+    assert revocations.is_revoked(_claims(2, 7)) is True
+    assert revocations.is_revoked(_claims(1, 7)) is False
+    assert revocations.confirm(db, _claims(2, 7)) is True
+    assert revocations.confirm(db, _claims(1, 7)) is False
+
+    # Отзыв в этом процессе до синхронизации
+    revocations.add(cutoffs={(3, 7): time.time()})
+    assert revocations.is_revoked(_claims(3, 7)) is True
+    assert revocations.is_revoked(_claims(1, 7)) is False
+
+def test_revocation_in_tenant_scope_reaches_other_processes(client, seed, db):
+    """Отзыв внутри запроса компании виден после sync() в другом процессе
+
+    Фоновая синхронизация работает без компании и читает только общий
+    счётчик revoked_tokens.
+    """
+    login = client.post("/api/auth/login", data={"username": "admin", "password": "password"})
+    token = login.json()["access_token"]
+    other_process = RevocationList(sync_interval=60, error_rate=0.01)
+    other_process.sync(db)
+
+    with tenant_scope(1):
+        claims = decode_token(token)
+        revoke_user_tokens(db, 1, 8)
+        db.commit()
+    assert other_process.is_revoked(claims) is False
+    response = client.post("/api/auth/logout", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 204
+
+    other_process.sync(db)
+    # Попадание в Bloom-фильтр - None, точный ответ даёт confirm()
+    assert other_process.is_revoked(claims) is None
+    assert other_process.confirm(db, claims) is True
+    assert other_process.is_revoked(_claims(1, 8)) is True
+
+def test_read_your_writes_is_per_tenant():
+    router = ReplicaRouter([engine], max_lag=5, check_interval=60, sticky_seconds=60)
+    router.mark_write((2, 7))
+
+    set_request_user(2, 7)
+    assert router.pick() is None
+    set_request_user(1, 7)
+    assert router.pick() is engine
+
+def _login(client, username, password):
+    response = client.post("/api/auth/login", data={"username": username, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def test_password_change_revokes_tokens(client, db):
+    user = User(
+        username="pw-change", email="pw-change@example.com", full_name="Pw",
+        hashed_password=get_password_hash("old-password"), role="sales", is_active=True
+    )
+    db.add(user)
+    db.commit()
+    headers = _login(client, "pw-change", "old-password")
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+
+    user.hashed_password = get_password_hash("new-password")
+    db.commit()
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+    assert client.get("/api/auth/me", headers=_login(client, "pw-change", "new-password")).status_code == 200
+
+def test_rehash_on_login_keeps_tokens(client, db, monkeypatch):
+    user = User(
+        username="pw-rehash", email="pw-rehash@example.com", full_name="Pw",
+        hashed_password=get_password_hash("password"), role="sales", is_active=True
+    )
+    db.add(user)
+    db.commit()
+    headers = _login(client, "pw-rehash", "password")
+
+    async def verify_and_upgrade(password, hashed):
+        return True, get_password_hash(password)
+
+    monkeypatch.setattr(password_hasher, "verify", verify_and_upgrade)
+    fresh = _login(client, "pw-rehash", "password")
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+    assert client.get("/api/auth/me", headers=fresh).status_code == 200
+
+def test_key_rotation_keeps_old_tokens_until_key_is_dropped(client, seed, monkeypatch):
+    old_ring = KeyRing({"old": "old-secret"}, "old")
+    monkeypatch.setattr(tokens, "key_ring", old_ring)
+    old_headers = _login(client, "admin", "password")
+
+    monkeypatch.setattr(tokens, "key_ring", KeyRing({"new": "new-secret", "old": "old-secret"}, "new"))
+    new_headers = _login(client, "admin", "password")
+    assert jwt.get_unverified_header(new_headers["Authorization"].split()[1])["kid"] == "new"
+    assert client.get("/api/auth/me", headers=old_headers).status_code == 200
+    assert client.get("/api/auth/me", headers=new_headers).status_code == 200
+
+    monkeypatch.setattr(tokens, "key_ring", KeyRing({"new": "new-secret"}, "new"))
+    assert client.get("/api/auth/me", headers=old_headers).status_code == 401
+    assert client.get("/api/auth/me", headers=new_headers).status_code == 200
+
+def test_key_ring_rejects_forged_and_unknown_keys():
+    ring = KeyRing({"a": "secret-a", "b": "secret-b"}, "a")
+    claims = {"user_id": 1, "typ": "access"}
+    assert ring.decode(ring.encode(claims))["user_id"] == 1
+    # Токен до кольца ключей: без kid, подписан SECRET_KEY
+    assert ring.decode(jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM))["user_id"] == 1
+
+    forged = jwt.encode(claims, "secret-a", algorithm=settings.ALGORITHM, headers={"kid": "b"})
+    with pytest.raises(JWTError):
+        ring.decode(forged)
+    with pytest.raises(JWTError):
+        ring.decode(jwt.encode(claims, "secret-c", algorithm=settings.ALGORITHM, headers={"kid": "c"}))
+    with pytest.raises(RuntimeError):
+        KeyRing({"a": "secret-a"}, "b")
+
+def _refresh(client, refresh_token: str):
+    return client.post("/api/auth/refresh", json={"refresh_token": refresh_token})
+
+def test_refresh_reuse_revokes_all_tokens(client, db):
+    db.add(User(
+        username="refresh-reuse", email="refresh-reuse@example.com", full_name="Refresh",
+        hashed_password=get_password_hash("password"), role="sales", is_active=True
+    ))
+    db.commit()
+    first = client.post("/api/auth/login", data={"username": "refresh-reuse", "password": "password"}).json()
+
+    rotated = _refresh(client, first["refresh_token"])
+    assert rotated.status_code == 200
+    second = rotated.json()
+    assert client.get("/api/auth/me", headers={"Authorization": f"Bearer {second['access_token']}"}).status_code == 200
+
+    # Старый refresh предъявлен повторно - отзываются все токены пользователя
+    assert _refresh(client, first["refresh_token"]).status_code == 401
+    assert client.get("/api/auth/me", headers={"Authorization": f"Bearer {second['access_token']}"}).status_code == 401
+    assert _refresh(client, second["refresh_token"]).status_code == 401
+    assert _refresh(client, second["access_token"]).status_code == 401
@@ -19,6 +19,7 @@ export default function LoginPage() {
     try {
       const response = await authApi.login({ username, password });
       localStorage.setItem('token', response.access_token);
+      localStorage.setItem('refresh_token', response.refresh_token);
       
       const user = await authApi.getMe();
       localStorage.setItem('user', JSON.stringify(user));
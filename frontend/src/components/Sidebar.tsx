@@ -3,6 +3,7 @@
 import Link from 'next/link';
 import { usePathname, useRouter } from 'next/navigation';
 import { useState } from 'react';
+import { authApi } from '@/lib/api';
 
 interface SidebarProps {
   user: {
@@ -17,8 +18,11 @@ export default function Sidebar({ user }: SidebarProps) {
   const router = useRouter();
   const [isCollapsed, setIsCollapsed] = useState(false);
 
-  const handleLogout = () => {
+  const handleLogout = async () => {
+    // Отзываем токены на сервере; выходим даже если запрос не удался
+    await authApi.logout().catch(() => {});
     localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
     localStorage.removeItem('user');
     router.push('/login');
   };
@@ -2,10 +2,15 @@ import axios from 'axios';
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://127.0.0.1:8000';
 
+// Компания (workspace) для API без поддоменов; с TENANT_DOMAIN не нужна
+const TENANT = process.env.NEXT_PUBLIC_TENANT;
+const tenantHeaders: Record<string, string> = TENANT ? { 'X-Tenant': TENANT } : {};
+
 const api = axios.create({
   baseURL: API_URL,
   headers: {
     'Content-Type': 'application/json',
+    ...tenantHeaders,
   },
 });
 
@@ -19,11 +24,43 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+// Access токен живёт недолго: на 401 один раз обмениваем refresh токен
+// на новую пару и повторяем запрос. Параллельные 401 ждут один обмен.
+let refreshing: Promise<string | null> | null = null;
+
+const refreshAccessToken = async (): Promise<string | null> => {
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (!refreshToken) return null;
+  try {
+    const response = await axios.post(
+      `${API_URL}/api/auth/refresh`,
+      { refresh_token: refreshToken },
+      { headers: tenantHeaders },
+    );
+    localStorage.setItem('token', response.data.access_token);
+    localStorage.setItem('refresh_token', response.data.refresh_token);
+    return response.data.access_token;
+  } catch {
+    return null;
+  }
+};
+
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const original = error.config;
     if (error.response?.status === 401 && typeof window !== 'undefined') {
+      if (original && !original._retried) {
+        original._retried = true;
+        refreshing = refreshing || refreshAccessToken().finally(() => { refreshing = null; });
+        const token = await refreshing;
+        if (token) {
+          original.headers.Authorization = `Bearer ${token}`;
+          return api(original);
+        }
+      }
       localStorage.removeItem('token');
+      localStorage.removeItem('refresh_token');
       localStorage.removeItem('user');
       window.location.href = '/login';
     }
@@ -51,6 +88,8 @@ export interface LoginRequest {
 export interface LoginResponse {
   access_token: string;
   token_type: string;
+  refresh_token: string;
+  expires_in: number;
 }
 
 export interface Client {
@@ -174,6 +213,10 @@ export const authApi = {
     const response = await api.get('/api/auth/me');
     return response.data;
   },
+
+  logout: async (): Promise<void> => {
+    await api.post('/api/auth/logout', { refresh_token: localStorage.getItem('refresh_token') });
+  },
 };
 
 // ========== DASHBOARD API ==========